@@ -0,0 +1,404 @@
+"""Read backends for MCP Git Server.
+
+Read-only operations go through a backend so that they can run in-process
+with pygit2 (libgit2) or dulwich when one of them is installed, instead of
+spawning a git process per call. The command line backend is always
+available and is used as the fallback for anything the in-process backends
+cannot answer.
+"""
+
+import logging
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Union, cast
+
+import git
+
+from mcp_git_server.config import config
+from mcp_git_server.results import CommitLog, StatusResult
+from mcp_git_server.spill import iter_process_chunks
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pygit2
+except ImportError:
+    pygit2 = None  # type: ignore[assignment]
+
+try:
+    import dulwich.repo
+    import dulwich.objects
+    import dulwich.objectspec
+    import dulwich.diff_tree
+    import dulwich.porcelain
+    from dulwich.object_store import tree_lookup_path
+except ImportError:
+    dulwich = None  # type: ignore[assignment]
+
+if TYPE_CHECKING:
+    # Typed aliases of bytes in recent dulwich versions
+    from dulwich.objects import ObjectID
+    from dulwich.refs import Ref
+
+# Any in-process failure (including library-specific error types) hands the
+# call to the command line, which produces the canonical error message
+FALLBACK_ERRORS = (Exception,)
+
+DIFF_STATUS = {"add": "A", "delete": "D", "modify": "M"}
+
+NULL_SHA = "0" * 40
+
+def decode_text(value: Union[str, bytes]) -> str:
+    """Decode a path or message that a library may return as bytes."""
+    return value.decode("utf-8", errors="replace") if isinstance(value, bytes) else value
+
+class CliBackend:
+    """Reads repositories through the git command line via GitPython."""
+
+    name = "cli"
+
+    def __init__(self, repo: git.Repo) -> None:
+        """Initialize the backend for a repository."""
+        self.repo = repo
+
+    def status(self) -> StatusResult:
+        """Get the current branch and changed, staged and untracked files."""
+        repo = self.repo
+        # A rename is reported under both paths, like the library backends do
+        changed_files = {path for item in repo.index.diff(None) for path in (item.a_path, item.b_path) if path}
+        staged_files = {path for item in repo.index.diff('HEAD') for path in (item.a_path, item.b_path) if path}
+        untracked_files = repo.untracked_files
+
+        try:
+            current_branch = repo.active_branch.name
+        except TypeError:
+            # Handle detached HEAD state
+            current_branch = f"HEAD detached at {repo.head.commit.hexsha[:7]}"
+
+        return StatusResult(current_branch, changed_files, staged_files, untracked_files)
+
+    def log(self, max_count: Optional[int] = 10, exclude: Optional[List[str]] = None) -> CommitLog:
+        """List commits reachable from HEAD but not from `exclude`, newest first."""
+        rev = ["HEAD"] + [f"^{sha}" for sha in exclude or []]
+        logs = CommitLog()
+        # GitPython passes a list of revisions through to rev-list
+        for commit in self.repo.iter_commits(rev, max_count=max_count):  # type: ignore[arg-type]
+            # GitPython stores the offset in seconds west of UTC
+            logs.append(
+                commit.hexsha, f"{commit.author.name} <{commit.author.email}>",
+                int(commit.committed_date), -int(commit.committer_tz_offset), decode_text(commit.message)
+            )
+        return logs
+
+    def show_stream(self, revision: str) -> Iterator[bytes]:
+        """Render a commit, tag, tree or blob like `git show`, as output chunks."""
+        proc = self.repo.git.show(revision, as_process=True)
+        try:
+            yield from iter_process_chunks(proc)
+        except git.GitCommandError as e:
+            raise ValueError(f"Invalid revision: {revision}. Error: {str(e)}")
+
+    def resolve_ref(self, ref: str) -> str:
+        """Resolve a revision expression to a full object ID."""
+        try:
+            return str(self.repo.git.rev_parse("--verify", ref))
+        except git.GitCommandError:
+            raise ValueError(f"Invalid revision: {ref}")
+
+    def read_blob(self, blob_sha: str) -> bytes:
+        """Read the raw contents of a blob."""
+        _sha, _type, _size, data = self.repo.git.get_object_data(blob_sha)
+        return data
+
+    def diff_trees(self, old_tree: str, new_tree: str) -> List[Dict[str, str]]:
+        """List changed blobs between two trees without rename detection."""
+        output = self.repo.git.diff_tree("-r", "-z", "--no-renames", old_tree, new_tree)
+        fields = output.split("\0")
+        changes = []
+        for i in range(0, len(fields) - 1, 2):
+            if not fields[i]:
+                break
+            old_mode, new_mode, old_sha, new_sha, status = fields[i].lstrip(":").split(" ")
+            changes.append({
+                "status": status,
+                "path": fields[i + 1],
+                "old_mode": old_mode,
+                "new_mode": new_mode,
+                "old_sha": old_sha,
+                "new_sha": new_sha
+            })
+        return sorted(changes, key=lambda change: change["path"])
+
+class Pygit2Backend(CliBackend):
+    """Reads repositories in-process through libgit2."""
+
+    name = "pygit2"
+
+    def __init__(self, repo: git.Repo) -> None:
+        """Open the repository with libgit2."""
+        super().__init__(repo)
+        self.lib_repo = pygit2.Repository(str(repo.git_dir))
+
+    def status(self) -> StatusResult:
+        """Get the current branch and changed, staged and untracked files."""
+        try:
+            flags = self.lib_repo.status(untracked_files="all", ignored=False)
+        except FALLBACK_ERRORS as e:
+            logger.debug(f"pygit2 status failed, falling back to git: {str(e)}")
+            return super().status()
+
+        changed_mask = (
+            pygit2.GIT_STATUS_WT_MODIFIED | pygit2.GIT_STATUS_WT_DELETED
+            | pygit2.GIT_STATUS_WT_TYPECHANGE | pygit2.GIT_STATUS_WT_RENAMED
+        )
+        staged_mask = (
+            pygit2.GIT_STATUS_INDEX_NEW | pygit2.GIT_STATUS_INDEX_MODIFIED
+            | pygit2.GIT_STATUS_INDEX_DELETED | pygit2.GIT_STATUS_INDEX_RENAMED
+            | pygit2.GIT_STATUS_INDEX_TYPECHANGE
+        )
+        changed_files = [path for path, flag in flags.items() if flag & changed_mask]
+        staged_files = [path for path, flag in flags.items() if flag & staged_mask]
+        untracked_files = [path for path, flag in flags.items() if flag & pygit2.GIT_STATUS_WT_NEW]
+
+        if self.lib_repo.head_is_detached:
+            current_branch = f"HEAD detached at {str(self.lib_repo.head.target)[:7]}"
+        else:
+            current_branch = self.lib_repo.head.shorthand
+
+        return StatusResult(current_branch, changed_files, staged_files, untracked_files)
+
+    def log(self, max_count: Optional[int] = 10, exclude: Optional[List[str]] = None) -> CommitLog:
+        """List commits reachable from HEAD but not from `exclude`, newest first."""
+        try:
+            # The SortMode enum only exists in recent pygit2 versions
+            walker = self.lib_repo.walk(
+                self.lib_repo.head.target,
+                pygit2.GIT_SORT_TOPOLOGICAL | pygit2.GIT_SORT_TIME  # type: ignore[arg-type]
+            )
+            for sha in exclude or []:
+                walker.hide(sha)
+            logs = CommitLog()
+            for commit in walker:
+                if max_count is not None and len(logs) >= max_count:
+                    break
+                logs.append(
+                    str(commit.id), f"{commit.author.name} <{commit.author.email}>",
+                    commit.commit_time, commit.commit_time_offset * 60, commit.message
+                )
+            return logs
+        except FALLBACK_ERRORS as e:
+            logger.debug(f"pygit2 log failed, falling back to git: {str(e)}")
+            return super().log(max_count, exclude)
+
+    def show_stream(self, revision: str) -> Iterator[bytes]:
+        """Render blobs in-process; commits and trees still go through `git show`."""
+        data = None
+        try:
+            obj = self.lib_repo.revparse_single(revision)
+            if isinstance(obj, pygit2.Blob):
+                data = obj.data
+        except FALLBACK_ERRORS as e:
+            logger.debug(f"pygit2 show failed, falling back to git: {str(e)}")
+        if data is None:
+            yield from super().show_stream(revision)
+        else:
+            yield data
+
+    def resolve_ref(self, ref: str) -> str:
+        """Resolve a revision expression to a full object ID."""
+        try:
+            return str(self.lib_repo.revparse_single(ref).id)
+        except FALLBACK_ERRORS:
+            return super().resolve_ref(ref)
+
+    def read_blob(self, blob_sha: str) -> bytes:
+        """Read the raw contents of a blob."""
+        try:
+            return self.lib_repo[blob_sha].peel(pygit2.Blob).data
+        except FALLBACK_ERRORS:
+            return super().read_blob(blob_sha)
+
+    def diff_trees(self, old_tree: str, new_tree: str) -> List[Dict[str, str]]:
+        """List changed blobs between two trees without rename detection."""
+        try:
+            diff = self.lib_repo[old_tree].peel(pygit2.Tree).diff_to_tree(self.lib_repo[new_tree].peel(pygit2.Tree))
+            changes = []
+            for delta in diff.deltas:
+                status = delta.status_char()
+                path = delta.new_file.path if status != "D" else delta.old_file.path
+                changes.append({
+                    "status": status,
+                    "path": path,
+                    "old_mode": f"{delta.old_file.mode:06o}",
+                    "new_mode": f"{delta.new_file.mode:06o}",
+                    "old_sha": str(delta.old_file.id),
+                    "new_sha": str(delta.new_file.id)
+                })
+            return sorted(changes, key=lambda change: change["path"])
+        except FALLBACK_ERRORS as e:
+            logger.debug(f"pygit2 tree diff failed, falling back to git: {str(e)}")
+            return super().diff_trees(old_tree, new_tree)
+
+class DulwichBackend(CliBackend):
+    """Reads repositories in-process through dulwich."""
+
+    name = "dulwich"
+
+    def __init__(self, repo: git.Repo) -> None:
+        """Open the repository with dulwich."""
+        super().__init__(repo)
+        self.lib_repo = dulwich.repo.Repo(repo.working_tree_dir or repo.git_dir)
+
+    def status(self) -> StatusResult:
+        """Get the current branch and changed, staged and untracked files."""
+        try:
+            result = dulwich.porcelain.status(self.lib_repo, untracked_files="all")
+            refs = self.lib_repo.refs
+            head_target, head_sha = refs.follow(cast("Ref", b"HEAD"))
+        except FALLBACK_ERRORS as e:
+            logger.debug(f"dulwich status failed, falling back to git: {str(e)}")
+            return super().status()
+
+        def decode(paths: List[Any]) -> List[str]:
+            return [decode_text(path) for path in paths]
+
+        staged = [path for paths in result.staged.values() for path in paths]
+        branch_ref = head_target[-1] if len(head_target) > 1 else None
+        if branch_ref is not None and branch_ref.startswith(b"refs/heads/"):
+            current_branch = branch_ref[len(b"refs/heads/"):].decode("utf-8")
+        elif head_sha is not None:
+            current_branch = f"HEAD detached at {head_sha.decode('ascii')[:7]}"
+        else:
+            return super().status()
+
+        return StatusResult(current_branch, decode(result.unstaged), decode(staged), decode(result.untracked))
+
+    def log(self, max_count: Optional[int] = 10, exclude: Optional[List[str]] = None) -> CommitLog:
+        """List commits reachable from HEAD but not from `exclude`, newest first."""
+        try:
+            walker = self.lib_repo.get_walker(
+                max_entries=max_count, exclude=[cast("ObjectID", sha.encode("ascii")) for sha in exclude or []]
+            )
+            logs = CommitLog()
+            for entry in walker:
+                commit = entry.commit
+                logs.append(
+                    commit.id.decode("ascii"), commit.author.decode("utf-8", errors="replace"),
+                    commit.commit_time, commit.commit_timezone, commit.message.decode("utf-8", errors="replace")
+                )
+            return logs
+        except FALLBACK_ERRORS as e:
+            logger.debug(f"dulwich log failed, falling back to git: {str(e)}")
+            return super().log(max_count, exclude)
+
+    def show_stream(self, revision: str) -> Iterator[bytes]:
+        """Render blobs in-process; commits and trees still go through `git show`."""
+        data = None
+        try:
+            blob_sha = self._blob_path_lookup(revision)
+            if blob_sha is not None:
+                data = self._blob(blob_sha).data
+        except FALLBACK_ERRORS as e:
+            logger.debug(f"dulwich show failed, falling back to git: {str(e)}")
+        if data is None:
+            yield from super().show_stream(revision)
+        else:
+            yield data
+
+    def resolve_ref(self, ref: str) -> str:
+        """Resolve a revision expression to a full object ID."""
+        try:
+            return dulwich.objectspec.parse_object(self.lib_repo, ref.encode("utf-8")).id.decode("ascii")
+        except FALLBACK_ERRORS:
+            return super().resolve_ref(ref)
+
+    def read_blob(self, blob_sha: str) -> bytes:
+        """Read the raw contents of a blob."""
+        try:
+            return self._blob(blob_sha.encode("ascii")).data
+        except FALLBACK_ERRORS:
+            return super().read_blob(blob_sha)
+
+    def diff_trees(self, old_tree: str, new_tree: str) -> List[Dict[str, str]]:
+        """List changed blobs between two trees without rename detection."""
+        try:
+            changes = []
+            for change in dulwich.diff_tree.tree_changes(
+                self.lib_repo.object_store, cast("ObjectID", old_tree.encode("ascii")),
+                cast("ObjectID", new_tree.encode("ascii"))
+            ):
+                # Recent dulwich versions report the missing side of an add or delete as None
+                old, new = change.old, change.new
+                old_mode = old.mode if old is not None and old.mode is not None else 0
+                new_mode = new.mode if new is not None and new.mode is not None else 0
+                entry = new if change.type != "delete" else old
+                if entry is None or entry.path is None:
+                    raise ValueError(f"Tree change without a path: {change}")
+                status = DIFF_STATUS[change.type]
+                if status == "M" and old_mode and (old_mode & 0o170000) != (new_mode & 0o170000):
+                    status = "T"
+                changes.append({
+                    "status": status,
+                    "path": entry.path.decode("utf-8", errors="replace"),
+                    "old_mode": f"{old_mode:06o}",
+                    "new_mode": f"{new_mode:06o}",
+                    "old_sha": old.sha.decode("ascii") if old is not None and old.sha else NULL_SHA,
+                    "new_sha": new.sha.decode("ascii") if new is not None and new.sha else NULL_SHA
+                })
+            return sorted(changes, key=lambda change: change["path"])
+        except FALLBACK_ERRORS as e:
+            logger.debug(f"dulwich tree diff failed, falling back to git: {str(e)}")
+            return super().diff_trees(old_tree, new_tree)
+
+    def _blob(self, sha: bytes) -> "dulwich.objects.Blob":
+        """Look up a blob by its ID."""
+        obj = self.lib_repo[cast("ObjectID", sha)]
+        if not isinstance(obj, dulwich.objects.Blob):
+            raise ValueError(f"Not a blob: {sha.decode('ascii', errors='replace')}")
+        return obj
+
+    def _blob_path_lookup(self, revision: str) -> Optional[bytes]:
+        """Resolve a `<commit>:<path>` revision to a blob ID without spawning git."""
+        if ":" not in revision:
+            return None
+        commit_ref, path = revision.split(":", 1)
+        commit = dulwich.objectspec.parse_commit(self.lib_repo, (commit_ref or "HEAD").encode("utf-8"))
+        mode, sha = tree_lookup_path(self.lib_repo.__getitem__, commit.tree, path.encode("utf-8"))
+        return sha if (mode & 0o170000) == 0o100000 else None
+
+BACKENDS = {
+    "cli": CliBackend,
+    "pygit2": Pygit2Backend,
+    "dulwich": DulwichBackend
+}
+
+def available_backends() -> List[str]:
+    """List the backends that can be used in this environment."""
+    names = ["cli"]
+    if pygit2 is not None:
+        names.append("pygit2")
+    if dulwich is not None:
+        names.append("dulwich")
+    return names
+
+def get_backend(repo: git.Repo) -> CliBackend:
+    """Get the configured read backend for a repository.
+
+    The `read_backend` setting may be "auto" (pygit2, then dulwich, then the
+    command line), or name one backend explicitly.
+    """
+    requested = config.get("read_backend", "auto")
+    available = available_backends()
+    if requested == "auto":
+        candidates = [name for name in ("pygit2", "dulwich") if name in available]
+    elif requested in available:
+        candidates = [requested]
+    else:
+        if requested not in BACKENDS:
+            logger.warning(f"Unknown read backend '{requested}', using git command line")
+        candidates = []
+
+    for name in candidates:
+        try:
+            return BACKENDS[name](repo)
+        except Exception as e:
+            logger.warning(f"Could not open {repo.git_dir} with {name}: {str(e)}")
+    return CliBackend(repo)
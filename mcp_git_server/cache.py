@@ -0,0 +1,48 @@
+"""In-memory caches for MCP Git Server."""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+class LRUCache:
+    """Thread-safe least-recently-used cache with a fixed number of entries."""
+
+    def __init__(self, max_entries: int = 256) -> None:
+        """Initialize an empty cache."""
+        self.max_entries = max(1, int(max_entries))
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """Get a cached value and mark it as recently used."""
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting the least recently used entry if full."""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """Remove a value from the cache and return it."""
+        with self._lock:
+            return self._entries.pop(key, default)
+
+    def clear(self) -> None:
+        """Remove all cached values."""
+        with self._lock:
+            self._entries.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
@@ -0,0 +1,230 @@
+"""Classification of generated, binary and oversized files in diffs.
+
+Lockfiles, minified bundles, generated sources and binaries make patches
+huge without telling the reader much. Before a patch is rendered, the
+changed files are listed cheaply with `--raw` (no content is diffed) and
+classified by their `.gitattributes` (linguist-generated, binary, -diff), by
+blob size and by the `summarize_diff_globs` setting. Classified files are
+excluded from the patch with pathspecs and reported with numstat counts in a
+trailer instead. Attribute and glob rules become one pathspec each, with
+`attr:` and `glob` magic, so the command line stays short however many files
+they match; file lists are passed to git on stdin.
+"""
+
+import os
+import re
+import logging
+import subprocess
+from typing import Dict, List, Optional, Tuple
+
+import git
+
+from mcp_git_server.config import config
+
+logger = logging.getLogger(__name__)
+
+NULL_SHA = "0" * 40
+
+SUBMODULE_MODE = "160000"
+
+ATTRIBUTES = ("linguist-generated", "binary", "diff")
+
+# Attribute pathspec magic for the files summarized because of their attributes
+RULE_ATTRIBUTES = ("linguist-generated", "linguist-generated=true", "binary", "-diff")
+
+# Oversized files are excluded one pathspec each, up to this many
+MAX_LARGE_PATHS = 1000
+
+def parse_raw(output: str) -> List[Tuple[str, str, str, str]]:
+    """Parse `--raw -z --no-abbrev` output into (old SHA, new SHA, new mode, path) per path.
+
+    Renames and copies yield both the old and the new path. Combined (merge)
+    records report the first parent as the old side.
+    """
+    changes = []
+    fields = output.split("\0")
+    i = 0
+    while i < len(fields) - 1:
+        header = fields[i]
+        if not header.startswith(":"):
+            break
+        parents = len(header) - len(header.lstrip(":"))
+        parts = header[parents:].split(" ")
+        modes, shas, status = parts[:parents + 1], parts[parents + 1:2 * parents + 2], parts[-1]
+        paths = fields[i + 1:i + 3] if status[0] in "RC" else fields[i + 1:i + 2]
+        for path in paths:
+            changes.append((shas[0], shas[-1], modes[-1], path))
+        i += 1 + len(paths)
+    return changes
+
+def _glob_pathspec(pattern: str) -> str:
+    """Glob relative to the repository root; globs without a slash match the file name anywhere."""
+    return pattern if "/" in pattern else f"**/{pattern}"
+
+def _glob_regex(pattern: str) -> "re.Pattern[str]":
+    """Compile a glob with the semantics of git's :(glob) pathspec magic."""
+    regex = ""
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == len(pattern):
+            regex += "/.*"
+            i += 3
+        elif pattern[i] == "*":
+            regex += "[^/]*"
+            i += 1
+        elif pattern[i] == "?":
+            regex += "[^/]"
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 2:]:
+            end = pattern.index("]", i + 2)
+            body = pattern[i + 1:end]
+            if body.startswith("!"):
+                body = "^" + body[1:]
+            regex += f"[{body}]"
+            i = end + 1
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
+    return re.compile(regex + r"\Z")
+
+def _run_with_input(repo: git.Repo, command: str, args: List[str], data: bytes) -> str:
+    """Run a git command with data on stdin, so inputs never go on the command line."""
+    proc = getattr(repo.git, command)(*args, as_process=True, istream=subprocess.PIPE)
+    stdout: bytes
+    stdout, stderr = proc.communicate(data)
+    if proc.returncode:
+        raise git.GitCommandError(["git", command] + args, proc.returncode, stderr)
+    return stdout.decode("utf-8", errors="replace")
+
+def _check_attributes(repo: git.Repo, paths: List[str]) -> Dict[str, str]:
+    """Find paths whose attributes mark them as generated or not diffable."""
+    reasons: Dict[str, str] = {}
+    if not paths:
+        return reasons
+    data = "".join(f"{path}\0" for path in paths).encode("utf-8")
+    output = _run_with_input(repo, "check_attr", ["-z", "--stdin", *ATTRIBUTES], data)
+    fields = output.split("\0")
+    for i in range(0, len(fields) - 2, 3):
+        path, attribute, value = fields[i:i + 3]
+        if path in reasons:
+            continue
+        if attribute == "linguist-generated" and value in ("set", "true"):
+            reasons[path] = "generated"
+        elif attribute == "binary" and value == "set":
+            reasons[path] = "binary"
+        elif attribute == "diff" and value == "unset":
+            reasons[path] = "no diff"
+    return reasons
+
+def _blob_sizes(repo: git.Repo, shas: List[str]) -> Dict[str, int]:
+    """Sizes of many blobs in one `cat-file --batch-check` pass."""
+    if not shas:
+        return {}
+    data = "".join(f"{sha}\n" for sha in shas).encode("ascii")
+    output = _run_with_input(repo, "cat_file", ["--batch-check=%(objectname) %(objectsize)"], data)
+    sizes = {}
+    for line in output.splitlines():
+        sha, _, size = line.partition(" ")
+        if size.isdigit():
+            sizes[sha] = int(size)
+    return sizes
+
+def _worktree_size(repo: git.Repo, path: str) -> int:
+    """Size of a working tree file; working tree sides of a change have a null SHA."""
+    if not repo.working_tree_dir:
+        return 0
+    try:
+        return os.path.getsize(os.path.join(repo.working_tree_dir, path))
+    except OSError:
+        return 0
+
+def classify(repo: git.Repo, raw_output: str) -> Dict[str, str]:
+    """Map each changed path that should only be summarized to the reason why."""
+    changes = [change for change in parse_raw(raw_output) if change[2] != SUBMODULE_MODE]
+    if not changes:
+        return {}
+
+    globs = [_glob_regex(_glob_pathspec(pattern)) for pattern in config.get("summarize_diff_globs", [])]
+    reasons: Dict[str, str] = {}
+    for _old_sha, _new_sha, _mode, path in changes:
+        if any(glob.match(path) for glob in globs):
+            reasons[path] = "matches summarize_diff_globs"
+
+    remaining = sorted({change[3] for change in changes} - set(reasons))
+    try:
+        reasons.update(_check_attributes(repo, remaining))
+    except git.GitCommandError as e:
+        logger.warning(f"Could not check attributes: {str(e)}")
+
+    max_bytes = config.get("summarize_diff_max_bytes", 512 * 1024)
+    if max_bytes:
+        candidates = [change for change in changes if change[3] not in reasons]
+        sizes = _blob_sizes(repo, sorted({sha for change in candidates for sha in change[:2] if sha != NULL_SHA}))
+        large = []
+        for old_sha, new_sha, _mode, path in candidates:
+            size = max(
+                sizes.get(old_sha, 0) if old_sha != NULL_SHA else _worktree_size(repo, path),
+                sizes.get(new_sha, 0) if new_sha != NULL_SHA else _worktree_size(repo, path)
+            )
+            if size > max_bytes and path not in large:
+                large.append(path)
+        if len(large) > MAX_LARGE_PATHS:
+            # Each large file is one pathspec; keep the command line bounded
+            logger.warning(f"{len(large)} large files changed, summarizing the first {MAX_LARGE_PATHS}")
+        for path in large[:MAX_LARGE_PATHS]:
+            reasons[path] = "large"
+    return reasons
+
+def _rule_pathspecs(magic: str) -> List[str]:
+    """Pathspecs matching every file the attribute and glob rules summarize.
+
+    One pathspec per rule instead of one per file keeps the command line
+    short however many files match.
+    """
+    pathspecs = [f":({magic}attr:{attribute})" for attribute in RULE_ATTRIBUTES]
+    pathspecs += [f":({magic}glob){_glob_pathspec(pattern)}" for pattern in config.get("summarize_diff_globs", [])]
+    return pathspecs
+
+def exclude_pathspecs(reasons: Dict[str, str]) -> List[str]:
+    """Pathspec arguments that leave the summarized files out of a diff."""
+    large = sorted(path for path, reason in reasons.items() if reason == "large")
+    return ["--", "."] + _rule_pathspecs("exclude,") + [f":(exclude,literal){path}" for path in large]
+
+def include_pathspecs(reasons: Dict[str, str]) -> List[str]:
+    """Pathspec arguments that select exactly the summarized files."""
+    large = sorted(path for path, reason in reasons.items() if reason == "large")
+    return ["--"] + _rule_pathspecs("") + [f":(literal){path}" for path in large]
+
+def format_trailer(numstat_output: str, reasons: Dict[str, str]) -> str:
+    """Describe the summarized files below a patch, with their numstat counts."""
+    counts: Dict[str, Tuple[str, str]] = {}
+    fields = numstat_output.split("\0")
+    i = 0
+    while i < len(fields):
+        entry = fields[i]
+        if not entry:
+            i += 1
+            continue
+        added, deleted, path = entry.split("\t", 2)
+        if path:
+            counts[path] = (added, deleted)
+        else:
+            # Rename: the old and new paths follow as separate fields
+            counts[fields[i + 1]] = counts[fields[i + 2]] = (added, deleted)
+            i += 2
+        i += 1
+
+    lines = ["", f"# {len(reasons)} files summarized, their patches are not shown:"]
+    for path in sorted(reasons):
+        count = counts.get(path)
+        if count is None:
+            stat = "changed"
+        elif count[0] == "-":
+            stat = "binary"
+        else:
+            stat = f"+{count[0]} -{count[1]}"
+        lines.append(f"#   {path} | {stat} | {reasons[path]}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,458 @@
+"""SQLite-backed commit metadata index with full-text search.
+
+Commits are indexed from the tips of branches, tags, remote branches and
+HEAD. When a tip disappears or moves to a commit that does not contain it
+(a deleted branch, a rebase or a force-push), the commits no longer reachable
+from any tip are pruned, so searches never return commits that are gone.
+Where SQLite lacks FTS5, searches run on `git log` instead of the index.
+"""
+
+import os
+import re
+import codecs
+import sqlite3
+import logging
+import subprocess
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import git
+
+from mcp_git_server.config import config
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE_NAME = "commits.sqlite"
+SCHEMA_VERSION = 1
+
+# Commits inserted per transaction while indexing
+INSERT_BATCH_SIZE = 500
+
+# Commits deleted per statement while pruning
+DELETE_BATCH_SIZE = 500
+
+# Bytes read from `git log` at a time
+READ_CHUNK_SIZE = 65536
+
+# Field and record separators used in the `git log` format
+FIELD_SEPARATOR = "\x1f"
+RECORD_SEPARATOR = "\x1e"
+LOG_FORMAT = "%x1e%H%x1f%an%x1f%ae%x1f%ct%x1f%cI%x1f%B"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS commits (
+    id INTEGER PRIMARY KEY,
+    sha TEXT NOT NULL UNIQUE,
+    author_name TEXT,
+    author_email TEXT,
+    committer_time INTEGER,
+    date TEXT,
+    subject TEXT,
+    body TEXT
+);
+CREATE INDEX IF NOT EXISTS commits_committer_time ON commits (committer_time);
+CREATE TABLE IF NOT EXISTS commit_paths (
+    commit_id INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    added INTEGER,
+    deleted INTEGER
+);
+CREATE INDEX IF NOT EXISTS commit_paths_path ON commit_paths (path);
+CREATE INDEX IF NOT EXISTS commit_paths_commit ON commit_paths (commit_id);
+CREATE TABLE IF NOT EXISTS tips (
+    sha TEXT PRIMARY KEY
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS commits_fts USING fts5 (
+    subject, body, author_name, author_email,
+    content='commits', content_rowid='id'
+);
+"""
+
+def iter_numstat_log(repo: git.Repo, revisions: List[str], extra_args: Optional[List[str]] = None) -> Iterator[Tuple[List[str], List[Tuple[Optional[int], Optional[int], str]]]]:
+    """Stream `git log --numstat -z` for revisions passed on stdin.
+
+    Yields (fields, numstat) per commit, where fields are hash, author name,
+    author email, committer timestamp, committer ISO date and raw message, and
+    numstat holds (added, deleted, path) with None counts for binary files.
+    """
+    args = ["-z", "--numstat", "--no-renames", f"--format={LOG_FORMAT}", "--stdin"]
+    proc = repo.git.log(*(args + (extra_args or [])), as_process=True, istream=subprocess.PIPE)
+    proc.stdin.write("".join(f"{revision}\n" for revision in revisions).encode("utf-8"))
+    proc.stdin.close()
+
+    def parse_record(record: str) -> Tuple[List[str], List[Tuple[Optional[int], Optional[int], str]]]:
+        header, _, stats = record.partition("\0")
+        fields = header.split(FIELD_SEPARATOR, 5)
+        numstat = []
+        for entry in stats.lstrip("\n").split("\0"):
+            if not entry:
+                continue
+            added, deleted, path = entry.split("\t", 2)
+            numstat.append((
+                None if added == "-" else int(added),
+                None if deleted == "-" else int(deleted),
+                path
+            ))
+        return fields, numstat
+
+    # Characters can be split across chunks, so decode incrementally
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    buffer = ""
+    try:
+        while True:
+            chunk = proc.stdout.read(READ_CHUNK_SIZE)
+            buffer += decoder.decode(chunk, final=not chunk)
+            if not chunk:
+                break
+            records = buffer.split(RECORD_SEPARATOR)
+            buffer = records.pop()
+            for record in records:
+                if record:
+                    yield parse_record(record)
+        if buffer:
+            yield parse_record(buffer)
+        proc.wait()
+    finally:
+        proc.stdout.close()
+
+def current_tips(repo: git.Repo) -> Set[str]:
+    """Get the commits that branches, tags and HEAD point to."""
+    output = repo.git.for_each_ref(
+        "--format=%(objecttype) %(objectname) %(*objectname)",
+        "refs/heads", "refs/remotes", "refs/tags"
+    )
+    tips = set()
+    for line in output.splitlines():
+        obj_type, sha, peeled = (line.split(" ") + [""])[:3]
+        if obj_type == "commit":
+            tips.add(sha)
+        elif peeled:
+            tips.add(peeled)
+    try:
+        tips.add(repo.head.commit.hexsha)
+    except ValueError:
+        pass  # No commits yet
+    return tips
+
+def _rev_list(repo: git.Repo, revisions: List[str]) -> List[str]:
+    """List the commits reachable from revisions passed on stdin, which may be ^-excluded."""
+    if not any(not revision.startswith("^") for revision in revisions):
+        return []
+    proc = repo.git.rev_list("--stdin", as_process=True, istream=subprocess.PIPE)
+    stdout: bytes
+    stdout, stderr = proc.communicate("".join(f"{revision}\n" for revision in revisions).encode("ascii"))
+    if proc.returncode:
+        raise git.GitCommandError(["git", "rev-list", "--stdin"], proc.returncode, stderr)
+    return stdout.decode("ascii").split()
+
+def _escape_like(value: str) -> str:
+    """Escape a value for a LIKE pattern that uses ESCAPE '\\'."""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def _parse_date(value: str) -> int:
+    """Parse an ISO 8601 date into a UTC timestamp."""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid date: {value}. Expected ISO 8601 format (YYYY-MM-DD)")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+def _format_commit(sha: str, author_name: str, author_email: str, date: str, subject: str, body: str, stats: Dict[str, int]) -> Dict[str, Any]:
+    """Build one search result."""
+    return {
+        "hash": sha,
+        "short_hash": sha[:7],
+        "author": f"{author_name} <{author_email}>",
+        "date": date,
+        "message": f"{subject}\n\n{body}" if body else subject,
+        "stats": stats
+    }
+
+class CommitIndex:
+    """Incrementally maintained index of the commits reachable from a repository's refs."""
+
+    def __init__(self, db_path: str) -> None:
+        """Initialize the index, creating the database schema if needed."""
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        conn = self._connect()
+        try:
+            conn.executescript(SCHEMA)
+            conn.execute(
+                "INSERT OR IGNORE INTO meta (key, value) VALUES ('schema_version', ?)",
+                (str(SCHEMA_VERSION),)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection to the index database."""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def update(self, repo: git.Repo) -> int:
+        """Index commits added since the last update and return how many were added."""
+        with self.lock:
+            tips = current_tips(repo)
+            conn = self._connect()
+            try:
+                indexed_tips = {row[0] for row in conn.execute("SELECT sha FROM tips")}
+                if tips == indexed_tips:
+                    return 0
+
+                # Old tips may have been garbage collected after a rewrite
+                old_tips = []
+                gone = False
+                for sha in indexed_tips - tips:
+                    try:
+                        repo.git.get_object_header(sha)
+                        old_tips.append(sha)
+                    except ValueError:
+                        gone = True
+                exclude = [f"^{sha}" for sha in old_tips + sorted(indexed_tips & tips)]
+
+                # Drop commits that only deleted or rewritten refs reached
+                if gone:
+                    reachable = set(_rev_list(repo, sorted(tips)))
+                    indexed = [sha for (sha,) in conn.execute("SELECT sha FROM commits")]
+                    pruned = self._prune(conn, [sha for sha in indexed if sha not in reachable])
+                else:
+                    pruned = self._prune(conn, _rev_list(repo, old_tips + [f"^{sha}" for sha in sorted(tips)]))
+                if pruned:
+                    logger.info(f"Pruned {pruned} unreachable commits for {repo.working_tree_dir or repo.git_dir}")
+
+                added = self._index_commits(conn, repo, sorted(tips - indexed_tips) + exclude)
+
+                conn.execute("DELETE FROM tips")
+                conn.executemany("INSERT INTO tips (sha) VALUES (?)", [(sha,) for sha in tips])
+                conn.commit()
+            finally:
+                conn.close()
+
+        logger.info(f"Indexed {added} new commits for {repo.working_tree_dir or repo.git_dir}")
+        return added
+
+    def _prune(self, conn: sqlite3.Connection, shas: List[str]) -> int:
+        """Delete indexed commits and their paths and full-text entries; return how many were deleted."""
+        pruned = 0
+        for i in range(0, len(shas), DELETE_BATCH_SIZE):
+            batch = shas[i:i + DELETE_BATCH_SIZE]
+            placeholders = ", ".join("?" for _ in batch)
+            rows = conn.execute(
+                "SELECT id, subject, body, author_name, author_email "
+                f"FROM commits WHERE sha IN ({placeholders})",
+                batch
+            ).fetchall()
+            if not rows:
+                continue
+            # An external content table needs the old values to remove its entries
+            conn.executemany(
+                "INSERT INTO commits_fts (commits_fts, rowid, subject, body, author_name, author_email) "
+                "VALUES ('delete', ?, ?, ?, ?, ?)",
+                rows
+            )
+            commit_ids = [(row[0],) for row in rows]
+            conn.executemany("DELETE FROM commit_paths WHERE commit_id = ?", commit_ids)
+            conn.executemany("DELETE FROM commits WHERE id = ?", commit_ids)
+            pruned += len(rows)
+        return pruned
+
+    def _index_commits(self, conn: sqlite3.Connection, repo: git.Repo, revisions: List[str]) -> int:
+        """Walk the given revisions and insert commits that are not indexed yet."""
+        if not any(not revision.startswith("^") for revision in revisions):
+            return 0
+
+        added = 0
+        for fields, numstat in iter_numstat_log(repo, revisions):
+            sha, author_name, author_email, committer_time, date, message = fields
+            subject, _, body = message.strip().partition("\n")
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO commits "
+                "(sha, author_name, author_email, committer_time, date, subject, body) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (sha, author_name, author_email, int(committer_time), date, subject, body.strip())
+            )
+            if not cursor.rowcount:
+                continue
+
+            commit_id = cursor.lastrowid
+            conn.execute(
+                "INSERT INTO commits_fts (rowid, subject, body, author_name, author_email) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (commit_id, subject, body.strip(), author_name, author_email)
+            )
+            conn.executemany(
+                "INSERT INTO commit_paths (commit_id, path, added, deleted) VALUES (?, ?, ?, ?)",
+                [(commit_id, path, lines_added, lines_deleted) for lines_added, lines_deleted, path in numstat]
+            )
+            added += 1
+            if added % INSERT_BATCH_SIZE == 0:
+                conn.commit()
+
+        return added
+
+    def search(
+        self,
+        query: Optional[str] = None,
+        author: Optional[str] = None,
+        path: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0
+    ) -> Dict[str, Any]:
+        """Search indexed commits, newest first."""
+        conditions: List[str] = []
+        params: List[Any] = []
+
+        if query:
+            conditions.append("c.id IN (SELECT rowid FROM commits_fts WHERE commits_fts MATCH ?)")
+            params.append(query)
+        if author:
+            escaped = _escape_like(author)
+            conditions.append("(c.author_name LIKE ? ESCAPE '\\' OR c.author_email LIKE ? ESCAPE '\\')")
+            params.extend([f"%{escaped}%", f"%{escaped}%"])
+        if path:
+            path = path.rstrip("/")
+            if any(char in path for char in "*?["):
+                conditions.append(
+                    "EXISTS (SELECT 1 FROM commit_paths p WHERE p.commit_id = c.id AND p.path GLOB ?)"
+                )
+                params.append(path)
+            else:
+                escaped = _escape_like(path)
+                conditions.append(
+                    "EXISTS (SELECT 1 FROM commit_paths p WHERE p.commit_id = c.id "
+                    "AND (p.path = ? OR p.path LIKE ? ESCAPE '\\'))"
+                )
+                params.extend([path, f"{escaped}/%"])
+        if since:
+            conditions.append("c.committer_time >= ?")
+            params.append(_parse_date(since))
+        if until:
+            conditions.append("c.committer_time <= ?")
+            params.append(_parse_date(until))
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        sql = (
+            "SELECT c.id, c.sha, c.author_name, c.author_email, c.date, c.subject, c.body "
+            f"FROM commits c {where} "
+            "ORDER BY c.committer_time DESC, c.id DESC LIMIT ? OFFSET ?"
+        )
+        params.extend([limit + 1, offset])
+
+        conn = self._connect()
+        try:
+            try:
+                rows = conn.execute(sql, params).fetchall()
+            except sqlite3.OperationalError as e:
+                raise ValueError(f"Invalid search query: {query}. Error: {str(e)}")
+
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            stats = self._commit_stats(conn, [row[0] for row in rows])
+        finally:
+            conn.close()
+
+        commits = [
+            _format_commit(sha, author_name, author_email, date, subject, body,
+                           stats.get(commit_id, {"files": 0, "insertions": 0, "deletions": 0}))
+            for commit_id, sha, author_name, author_email, date, subject, body in rows
+        ]
+
+        return {
+            "commits": commits,
+            "next_offset": offset + limit if has_more else None
+        }
+
+    def _commit_stats(self, conn: sqlite3.Connection, commit_ids: List[int]) -> Dict[int, Dict[str, int]]:
+        """Aggregate numstat totals for a page of commits."""
+        if not commit_ids:
+            return {}
+        placeholders = ", ".join("?" for _ in commit_ids)
+        rows = conn.execute(
+            "SELECT commit_id, COUNT(*), COALESCE(SUM(added), 0), COALESCE(SUM(deleted), 0) "
+            f"FROM commit_paths WHERE commit_id IN ({placeholders}) GROUP BY commit_id",
+            commit_ids
+        )
+        return {
+            commit_id: {"files": files, "insertions": insertions, "deletions": deletions}
+            for commit_id, files, insertions, deletions in rows
+        }
+
+def search_log(
+    repo: git.Repo,
+    query: Optional[str] = None,
+    author: Optional[str] = None,
+    path: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0
+) -> Dict[str, Any]:
+    """Search the commits reachable from the same tips as the index with `git log`.
+
+    Used where SQLite has no FTS5. Every word or quoted phrase of the query
+    must appear in the commit message; FTS5 operators are not supported.
+    """
+    args = ["--date-order", "--full-diff", "-i", "-F", f"--skip={offset}", f"--max-count={limit + 1}"]
+    if query:
+        args.append("--all-match")
+        for quoted, word in re.findall(r'"([^"]*)"|(\S+)', query):
+            term = quoted or word.rstrip("*")
+            if term and term not in ("AND", "OR", "NOT"):
+                args.append(f"--grep={term}")
+    if author:
+        args.append(f"--author={author}")
+    if since:
+        args.append(f"--since=@{_parse_date(since)}")
+    if until:
+        args.append(f"--until=@{_parse_date(until)}")
+    if path:
+        args.extend(["--", path.rstrip("/")])
+
+    commits = []
+    for fields, numstat in iter_numstat_log(repo, sorted(current_tips(repo)), args):
+        sha, author_name, author_email, _committer_time, date, message = fields
+        subject, _, body = message.strip().partition("\n")
+        commits.append(_format_commit(sha, author_name, author_email, date, subject, body.strip(), {
+            "files": len(numstat),
+            "insertions": sum(added or 0 for added, _deleted, _path in numstat),
+            "deletions": sum(deleted or 0 for _added, deleted, _path in numstat)
+        }))
+
+    has_more = len(commits) > limit
+    return {
+        "commits": commits[:limit],
+        "next_offset": offset + limit if has_more else None
+    }
+
+_indexes: Dict[str, CommitIndex] = {}
+_indexes_lock = threading.Lock()
+
+def get_index(repo_root: str) -> Optional[CommitIndex]:
+    """Get the commit index for a repository, creating it on first use.
+
+    Returns None if SQLite cannot create it, e.g. because it was built without FTS5.
+    """
+    with _indexes_lock:
+        index = _indexes.get(repo_root)
+        if index is None:
+            db_path = os.path.join(config.get_repo_data_dir(repo_root), INDEX_FILE_NAME)
+            try:
+                index = CommitIndex(db_path)
+            except sqlite3.OperationalError as e:
+                logger.warning(f"Commit index unavailable for {repo_root}, searching with git log: {str(e)}")
+                return None
+            _indexes[repo_root] = index
+        return index
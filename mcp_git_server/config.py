@@ -2,18 +2,100 @@
 
 import os
 import json
+import hashlib
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
 DEFAULT_CONFIG = {
     "log_level": "INFO",
-    "allowed_repos": [],  # Empty means all repos are allowed
-    "max_diff_size": 1024 * 1024,  # 1MB
-    "max_log_entries": 100
+    "allowed_repos": [],  # Empty means all repos are allowed; edits to config.json apply without a restart
+    "max_diff_size": 1024 * 1024,  # 1MB, larger diff and show output is spilled to a temp file
+    "spill_ttl_seconds": 900,  # Spilled output is deleted this long after its last read
+    "summarize_diff": True,  # Show generated, binary and large files as numstat lines in diffs
+    "summarize_diff_max_bytes": 512 * 1024,  # Files larger than this are summarized
+    "summarize_diff_globs": [
+        "*.lock", "package-lock.json", "npm-shrinkwrap.json", "pnpm-lock.yaml",
+        "go.sum", "*.min.js", "*.min.css", "*.map"
+    ],
+    "max_log_entries": 100,
+    "max_history_stats_commits": 10000,
+    "numstat_cache_size": 50000,  # Commits whose numstat is kept in memory
+    "max_compare_pairs": 1000,
+    "max_tree_entries": 10000,  # Largest git_ls_tree page
+    "cache_size": 256,  # Entries kept per in-memory result cache
+    "read_backend": "auto",  # auto, cli, pygit2 or dulwich
+    "max_grep_results": 1000,
+    "grep_threads": 0,  # 0 lets git pick the number of grep threads
+    "grep_index_max_file_size": 1024 * 1024,  # Larger files are always searched
+    "workspace_roots": [],  # Directories scanned for repositories
+    "discovery_skip_dirs": ["node_modules", ".venv", "venv", "__pycache__"],
+    "discovery_threads": 8,
+    "watch_debounce_ms": 250,  # Quiet period before a change notification is sent
+    "watch_max_delay_ms": 2000,  # Upper bound on notification delay during bursts
+    "watch_poll_interval": 1.0,  # Seconds between polls where inotify is unavailable
+    "watch_max_directories": 10000,
+    "max_concurrent_requests": 8,  # Split evenly between worker processes when there are any
+    "max_concurrent_per_repo": 2,
+    "max_queued_requests": 64,  # Further requests are rejected as busy; split between worker processes
+    "worker_processes": 0,  # Run function calls in this many worker processes; 0 runs them in the server process
+    "worker_shm_min_bytes": 64 * 1024,  # Worker responses this large are passed back through shared memory
+    "git_memory_limit_mb": 0,  # Address space limit for git processes, 0 disables
+    "git_cpu_time_limit_s": 0,  # CPU time limit for git processes, 0 disables
+    "warmup_on_initialize": False,  # Preload allowed_repos in the background after initialize
+    "warmup_commit_graph": False,  # Also run `git commit-graph write` during warm-up
+    "warmup_untracked_cache": False,  # Also enable the untracked cache during warm-up
+    "trace_file": "",  # Record anonymized requests to this gzip file for mcp-git-replay
+    "trace_redact_paths": False,  # Also hash file paths, branch names and revisions in traces
+    "enable_admin_functions": False  # Expose the admin_profile_* functions
 }
 
+def resolve_path(path: str) -> str:
+    """Resolve a path to its canonical absolute form, following symlinks.
+
+    Request paths are not cached: a symlink can be retargeted between two
+    calls, and a cache checked with an lstat of every component would cost
+    as many system calls as resolving the path again.
+    """
+    return os.path.realpath(os.path.expanduser(path))
+
+class PathPrefixMatcher:
+    """Matches paths against a fixed set of directories using a path component trie."""
+    
+    # Marks a trie node at which an allowed directory ends
+    TERMINAL = "\0"
+    
+    def __init__(self, directories: List[str]) -> None:
+        """Compile the directories into a trie of resolved path components.
+
+        Only the allowlist is resolved once here; callers resolve the paths they match.
+        """
+        self.root: Dict[str, Any] = {}
+        for directory in directories:
+            node = self.root
+            for component in self._components(resolve_path(directory)):
+                node = node.setdefault(component, {})
+            node[self.TERMINAL] = True
+    
+    @staticmethod
+    def _components(resolved_path: str) -> List[str]:
+        """Split a resolved path into its case-normalized components."""
+        drive, rest = os.path.splitdrive(os.path.normcase(resolved_path))
+        return [drive] + [part for part in rest.split(os.sep) if part]
+    
+    def matches(self, resolved_path: str) -> bool:
+        """Check whether a resolved path is one of the directories or inside one of them."""
+        node = self.root
+        for component in self._components(resolved_path):
+            if self.TERMINAL in node:
+                return True
+            child = node.get(component)
+            if child is None:
+                return False
+            node = child
+        return self.TERMINAL in node
+
 class Config:
     """Configuration handler for MCP Git Server."""
     
@@ -21,6 +103,10 @@ class Config:
         """Initialize configuration with defaults."""
         self.config_path = self._get_config_path()
         self.config = self._load_config()
+        # Modification time of config.json when it was last read or written
+        self._config_mtime = self._stat_config()
+        self._allowed_repos_snapshot: Optional[Tuple[str, ...]] = None
+        self._allowed_repos_matcher: Optional[PathPrefixMatcher] = None
     
     def _get_config_path(self) -> str:
         """Get the configuration file path."""
@@ -68,11 +154,41 @@ class Config:
         try:
             with open(self.config_path, 'w') as f:
                 json.dump(config, f, indent=2)
+            self._config_mtime = self._stat_config()
             return True
         except Exception as e:
             logger.error(f"Error saving configuration: {str(e)}")
             return False
     
+    def _stat_config(self) -> Optional[int]:
+        """Modification time of config.json, or None if it cannot be read."""
+        try:
+            return os.stat(self.config_path).st_mtime_ns
+        except OSError:
+            return None
+    
+    def _reload_allowed_repos(self) -> None:
+        """Pick up allowed_repos from config.json if the file changed since it was last read."""
+        mtime = self._stat_config()
+        if mtime is None or mtime == self._config_mtime:
+            return
+        self._config_mtime = mtime
+        try:
+            with open(self.config_path, 'r') as f:
+                allowed_repos = json.load(f).get("allowed_repos", [])
+        except Exception as e:
+            logger.error(f"Error reloading allowed_repos: {str(e)}. Keeping the current list.")
+            return
+        if isinstance(allowed_repos, list):
+            self.config["allowed_repos"] = allowed_repos
+    
+    def get_repo_data_dir(self, repo_root: str) -> str:
+        """Get the directory for persistent per-repository data such as indexes."""
+        repo_key = hashlib.sha1(os.path.normpath(repo_root).encode("utf-8")).hexdigest()
+        data_dir = os.path.join(os.path.dirname(self.config_path), "repos", repo_key)
+        os.makedirs(data_dir, exist_ok=True)
+        return data_dir
+    
     def get(self, key: str, default: Optional[Any] = None) -> Any:
         """Get a configuration value."""
         return self.config.get(key, default)
@@ -84,26 +200,24 @@ class Config:
     
     def is_repo_allowed(self, repo_path: str) -> bool:
         """Check if a repository path is allowed."""
+        return self.is_resolved_path_allowed(resolve_path(repo_path))
+    
+    def is_resolved_path_allowed(self, resolved_path: str) -> bool:
+        """Check if a path already resolved with resolve_path is allowed."""
+        self._reload_allowed_repos()
         allowed_repos = self.get("allowed_repos", [])
         
         # If no repos are specified, all are allowed
         if not allowed_repos:
             return True
         
-        # Check if path is in allowed repos
-        normalized_path = os.path.normpath(os.path.abspath(repo_path))
-        for allowed_repo in allowed_repos:
-            allowed_normalized = os.path.normpath(os.path.abspath(allowed_repo))
-            
-            # Direct match
-            if normalized_path == allowed_normalized:
-                return True
-            
-            # Check if it's a subdirectory of an allowed repo
-            if normalized_path.startswith(allowed_normalized + os.sep):
-                return True
+        # Recompile the allowlist whenever its contents change, including in-place edits
+        snapshot = tuple(allowed_repos)
+        if self._allowed_repos_matcher is None or snapshot != self._allowed_repos_snapshot:
+            self._allowed_repos_matcher = PathPrefixMatcher(list(snapshot))
+            self._allowed_repos_snapshot = snapshot
         
-        return False
+        return self._allowed_repos_matcher.matches(resolved_path)
 
 # Global configuration instance
 config = Config()
\ No newline at end of file
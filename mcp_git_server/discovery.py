@@ -0,0 +1,211 @@
+"""Repository discovery for MCP Git Server.
+
+Workspace roots from the configuration are scanned once for Git
+repositories, and the resulting set of repository roots is persisted under
+the config directory. Any path can then be mapped to the repository that
+contains it: its ancestors are walked up to the first one with a .git entry,
+which is the innermost repository, so nested repositories and submodules
+resolve to themselves. Indexed repositories are validated against the
+identity of their .git entry instead of being opened again.
+"""
+
+import os
+import json
+import stat
+import atexit
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+
+from mcp_git_server.config import config
+from mcp_git_server.utils import is_git_repository, normalize_path
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE_NAME = "repo_index.json"
+INDEX_VERSION = 2
+
+# Seconds to wait before persisting repositories found by lookups, so a burst of them is written once
+SAVE_DELAY = 5.0
+
+class RepositoryDiscovery:
+    """Index of repository roots below the configured workspace roots."""
+
+    def __init__(self, index_path: str) -> None:
+        """Initialize discovery with the path of its persisted index."""
+        self.index_path = index_path
+        self.lock = threading.Lock()
+        # Repository root -> signature of its .git entry
+        self.repos: Dict[str, List[int]] = {}
+        self.scanned_roots: List[str] = []
+        self.scan_thread: Optional[threading.Thread] = None
+        self.save_timer: Optional[threading.Timer] = None
+        self._load()
+
+    def _load(self) -> None:
+        """Load the persisted index, dropping repositories that no longer exist."""
+        if not os.path.exists(self.index_path):
+            return
+
+        try:
+            with open(self.index_path, "r") as f:
+                data = json.load(f)
+            if data.get("version") != INDEX_VERSION:
+                return
+            self.scanned_roots = data.get("roots", [])
+            for repo_root, signature in data.get("repos", {}).items():
+                if self._git_entry_signature(repo_root) == signature:
+                    self.repos[repo_root] = signature
+        except Exception as e:
+            logger.warning(f"Could not load repository index from {self.index_path}: {str(e)}")
+            self.repos = {}
+            self.scanned_roots = []
+
+    def _schedule_save(self) -> None:
+        """Persist the index after a short delay; the caller holds the lock."""
+        if self.save_timer is not None:
+            return
+        self.save_timer = threading.Timer(SAVE_DELAY, self.flush)
+        self.save_timer.daemon = True
+        self.save_timer.start()
+        atexit.register(self.flush)
+
+    def flush(self) -> None:
+        """Persist the index now if a save is pending."""
+        with self.lock:
+            if self.save_timer is None:
+                return
+            self.save_timer.cancel()
+            self.save_timer = None
+            self._save()
+        atexit.unregister(self.flush)
+
+    def _save(self) -> None:
+        """Persist the index atomically; the caller holds the lock."""
+        data = {
+            "version": INDEX_VERSION,
+            "roots": self.scanned_roots,
+            "repos": self.repos
+        }
+        tmp_path = f"{self.index_path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.index_path)
+        except Exception as e:
+            logger.warning(f"Could not save repository index to {self.index_path}: {str(e)}")
+
+    @staticmethod
+    def _signature(st: os.stat_result) -> List[int]:
+        """Identity of a .git entry, which changes when the entry is replaced.
+
+        A .git directory is identified by its device and inode; its mtime changes
+        on every index write. A .git file also includes its mtime, since it points
+        at the real git directory and can be rewritten in place.
+        """
+        if stat.S_ISDIR(st.st_mode):
+            return [st.st_dev, st.st_ino]
+        return [st.st_dev, st.st_ino, st.st_mtime_ns]
+
+    @staticmethod
+    def _git_entry_signature(directory: str) -> Optional[List[int]]:
+        """Signature of the .git entry of a directory, or None if it has none."""
+        try:
+            return RepositoryDiscovery._signature(os.stat(os.path.join(directory, ".git")))
+        except OSError:
+            return None
+
+    def start_scan(self) -> None:
+        """Scan the workspace roots in the background if they are not indexed yet."""
+        roots = sorted(normalize_path(root) for root in config.get("workspace_roots", []))
+        with self.lock:
+            if roots == self.scanned_roots or not roots:
+                return
+            if self.scan_thread is not None and self.scan_thread.is_alive():
+                return
+            self.scan_thread = threading.Thread(
+                target=self._scan, args=(roots,), name="repo-discovery", daemon=True
+            )
+            self.scan_thread.start()
+
+    def _scan(self, roots: List[str]) -> None:
+        """Walk the workspace roots in parallel and record every repository found."""
+        skip_dirs = set(config.get("discovery_skip_dirs", []))
+        found: Dict[str, List[int]] = {}
+
+        def scan_directory(path: str) -> Tuple[List[str], Optional[Tuple[str, List[int]]]]:
+            subdirs = []
+            repo: Optional[Tuple[str, List[int]]] = None
+            try:
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        if entry.name == ".git":
+                            if entry.is_dir(follow_symlinks=False) or entry.is_file(follow_symlinks=False):
+                                repo = (path, self._signature(entry.stat()))
+                        elif entry.name not in skip_dirs and entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+            except OSError as e:
+                logger.debug(f"Skipping unreadable directory {path}: {str(e)}")
+            return subdirs, repo
+
+        max_workers = config.get("discovery_threads", 8)
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="repo-scan") as executor:
+            pending = {executor.submit(scan_directory, root) for root in roots if os.path.isdir(root)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    subdirs, repo = future.result()
+                    if repo is not None:
+                        found[repo[0]] = repo[1]
+                    # Nested repositories (e.g. submodules) are found by walking on
+                    pending.update(executor.submit(scan_directory, subdir) for subdir in subdirs)
+
+        with self.lock:
+            self.repos.update(found)
+            self.scanned_roots = roots
+            self._save()
+        logger.info(f"Discovered {len(found)} repositories under {', '.join(roots)}")
+
+    def find_repo_root(self, path: str) -> Optional[str]:
+        """Map any path inside a repository to the root of the innermost repository."""
+        current = normalize_path(path)
+        while True:
+            # The first ancestor with a .git entry wins, indexed or not, so nested repositories are never skipped
+            signature = self._git_entry_signature(current)
+            with self.lock:
+                known = self.repos.get(current)
+            if signature is not None and signature == known:
+                return current
+            # New, replaced or rewritten since it was indexed: check it is a repository before recording it
+            if signature is not None and is_git_repository(current):
+                with self.lock:
+                    self.repos[current] = signature
+                    self._schedule_save()
+                return current
+            if known is not None:
+                # The repository moved or was removed since it was indexed
+                with self.lock:
+                    self.repos.pop(current, None)
+                    self._schedule_save()
+            parent = os.path.dirname(current)
+            if parent == current:
+                return None
+            current = parent
+
+_discovery: Optional[RepositoryDiscovery] = None
+_discovery_lock = threading.Lock()
+
+def get_discovery() -> RepositoryDiscovery:
+    """Get the repository discovery service, starting the workspace scan on first use."""
+    global _discovery
+    with _discovery_lock:
+        if _discovery is None:
+            index_path = os.path.join(os.path.dirname(config.config_path), INDEX_FILE_NAME)
+            _discovery = RepositoryDiscovery(index_path)
+            _discovery.start_scan()
+        return _discovery
+
+def find_repo_root(path: str) -> Optional[str]:
+    """Map any path inside a repository to the repository's root directory."""
+    return get_discovery().find_repo_root(path)
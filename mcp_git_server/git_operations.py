@@ -1,70 +1,250 @@
 """Git operations module for MCP Git Server."""
 
 import os
+import sys
+import json
+import fnmatch
+import hashlib
 import git
-from typing import List, Optional, Dict, Any
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Dict, Any, Iterator, Set, Tuple, Union, cast
 import logging
 
+from mcp_git_server.cache import LRUCache
+from mcp_git_server.backends import get_backend
+from mcp_git_server.config import config, resolve_path
+from mcp_git_server.results import CommitLog, StatusResult, TreeListing
+from mcp_git_server.scheduler import GovernedRepo
+from mcp_git_server.spill import iter_process_chunks, spill_store
+from mcp_git_server import classifier, commit_index, discovery, trigram_index
+
 logger = logging.getLogger(__name__)
 
+# Candidate paths passed to a single `git grep` call when using the trigram index
+GREP_PATHSPEC_BATCH_SIZE = 500
+
+# The tree with no entries, diffed against to list the files of a tree that match pathspecs
+EMPTY_TREE_SHA = "4b825dc642cb6eb9a060e54bf8d69288fbee4904"
+
+# Blame results keyed by (blob SHA, commit SHA, line range)
+_blame_cache = LRUCache(config.get("cache_size", 256))
+
+# git_status results keyed by the snapshot token handed to the client
+_status_snapshots = LRUCache(config.get("cache_size", 256))
+
+# HEAD commit each git_log snapshot token was computed at
+_log_snapshot_heads = LRUCache(config.get("cache_size", 256))
+
+# git_ls_tree listings keyed by (tree SHA, recursive, with sizes); trees are immutable
+_tree_listing_cache = LRUCache(max(1, config.get("cache_size", 256) // 8))
+
+# git_compare_refs results keyed by (base SHA, head SHA, commit list limit)
+_compare_cache = LRUCache(config.get("cache_size", 256) * 16)
+
+# First git version with the %(ahead-behind:<base>) for-each-ref atom
+AHEAD_BEHIND_GIT_VERSION = (2, 41)
+
+# Per-commit (author name, author email, numstat) keyed by commit SHA; a
+# commit's numstat never changes, so entries are shared between repositories
+_numstat_cache = LRUCache(config.get("numstat_cache_size", 50000))
+
+STATUS_LIST_KEYS = ("changed_files", "staged_files", "untracked_files")
+
+# Media type reported for spilled diff output
+DIFF_MIME_TYPE = "text/x-diff"
+
+def _object_header(repo: git.Repo, spec: str) -> Tuple[str, str]:
+    """SHA and type of an object, through the persistent cat-file process."""
+    # GitPython annotates the header fields as str but returns bytes
+    sha, object_type, _size = cast(Tuple[bytes, bytes, int], repo.git.get_object_header(spec))
+    return sha.decode("ascii"), object_type.decode("ascii")
+
+def _summarized_diff_chunks(repo: git.Repo, command: str, args: List[str]) -> Iterator[bytes]:
+    """Stream a `git diff` or `git show` patch, leaving classified files out of it.
+
+    Generated, binary and oversized files are excluded with pathspecs, so git
+    never renders their patches, and are listed with numstat counts after it.
+    """
+    run = getattr(repo.git, command)
+    summary_args = ["--format="] if command == "show" else []
+    reasons: Dict[str, str] = {}
+    try:
+        if config.get("summarize_diff", True):
+            reasons = classifier.classify(repo, run(*summary_args, "--raw", "-z", "--no-abbrev", *args))
+        if reasons:
+            numstat = run(*summary_args, "--numstat", "-z", *args, *classifier.include_pathspecs(reasons))
+            patch = run(*summary_args, *args, *classifier.exclude_pathspecs(reasons), as_process=True)
+    except OSError as e:
+        # Such as E2BIG from a huge command line; an unfiltered patch is still correct
+        logger.warning(f"Could not summarize diff, showing it in full: {str(e)}")
+        reasons = {}
+    if not reasons:
+        yield from iter_process_chunks(run(*args, as_process=True))
+        return
+
+    if command == "show":
+        # With pathspecs git leaves out the commit header when no other file changed
+        yield from iter_process_chunks(run("--no-patch", *args, as_process=True))
+        yield b"\n"
+    yield from iter_process_chunks(patch)
+    yield classifier.format_trailer(numstat, reasons).encode("utf-8")
+
+def _iter_process_lines(proc: Any) -> Iterator[str]:
+    """Yield decoded output lines from a running git process, then check its status."""
+    finished = False
+    try:
+        for raw_line in proc.stdout:
+            yield raw_line.decode("utf-8", errors="replace").rstrip("\n")
+        finished = True
+        proc.wait()
+    finally:
+        proc.stdout.close()
+        if not finished:
+            # The caller stopped reading early, so don't let git run to completion
+            proc.kill()
+
+def _matches_pathspec(path: str, pathspecs: List[str]) -> bool:
+    """Check a repository-relative path against plain or glob pathspecs."""
+    for pathspec in pathspecs:
+        pathspec = pathspec.rstrip("/")
+        if pathspec in ("", "."):
+            return True
+        if any(char in pathspec for char in "*?["):
+            if fnmatch.fnmatchcase(path, pathspec):
+                return True
+        elif path == pathspec or path.startswith(pathspec + "/"):
+            return True
+    return False
+
+def _snapshot_token(kind: str, *parts: Any) -> str:
+    """Build an opaque token identifying the state a response was computed from."""
+    digest = hashlib.sha1(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+    return f"{kind}1-{digest}"
+
+def _is_linear_extension(repo: git.Repo, old_head: str, new_head: str) -> bool:
+    """Check whether new_head only adds commits without merges on top of old_head.
+
+    Only then do the new commits come before all older ones in every log order.
+    """
+    try:
+        # GitPython accepts revision strings as well as commits
+        if not repo.is_ancestor(old_head, new_head):  # type: ignore[arg-type]
+            return False
+        return not repo.git.rev_list("--merges", "--max-count=1", new_head, f"^{old_head}")
+    except git.GitCommandError:
+        # The old head was garbage collected
+        return False
+
+def _format_timestamp(timestamp: str, tz_offset: str) -> str:
+    """Convert a git epoch timestamp and +HHMM offset to an ISO 8601 string."""
+    sign = -1 if tz_offset.startswith("-") else 1
+    offset = timedelta(hours=int(tz_offset[1:3]), minutes=int(tz_offset[3:5]))
+    tz = timezone(sign * offset)
+    return datetime.fromtimestamp(int(timestamp), tz).isoformat()
+
+def _parse_blame_incremental(lines: Iterator[str]) -> Iterator[Tuple[str, int, int, int, Optional[Dict[str, str]]]]:
+    """Parse `git blame --incremental` output as git produces it.
+
+    Yields (commit, original_line, final_line, line_count, metadata) per group of
+    lines, in the order git finishes them, where metadata is only present the
+    first time a commit appears in the output.
+    """
+    seen = set()
+    header: Optional[List[str]] = None
+    metadata: Dict[str, str] = {}
+    for line in lines:
+        if header is None:
+            header = line.split(" ")
+            continue
+        key, _, value = line.partition(" ")
+        metadata[key] = value
+        # Every group ends with the name of the file in the blamed commit
+        if key == "filename":
+            commit = header[0]
+            new_metadata = None
+            if commit not in seen:
+                seen.add(commit)
+                new_metadata = metadata
+            yield commit, int(header[1]), int(header[2]), int(header[3]), new_metadata
+            header = None
+            metadata = {}
+
 class GitOperations:
     """Class to handle Git operations."""
     
     @staticmethod
     def validate_repo_path(repo_path: str) -> git.Repo:
-        """Validate and return the Git repository."""
-        if not os.path.exists(repo_path):
+        """Validate and return the Git repository containing a path."""
+        # Check and open the directory symlinks currently point to, so
+        # retargeting a link after an earlier call cannot escape the allowlist
+        resolved_path = resolve_path(repo_path)
+        if not config.is_resolved_path_allowed(resolved_path):
+            raise PermissionError(f"Repository path is not allowed: {repo_path}")
+        
+        if not os.path.exists(resolved_path):
             raise ValueError(f"Repository path does not exist: {repo_path}")
         
+        # Any file or directory inside a repository may be passed; bare
+        # repositories have no .git entry and are opened directly. An ancestor
+        # of a resolved path is resolved too, so the root needs no second lookup
+        repo_root = discovery.find_repo_root(resolved_path) or resolved_path
+        if not config.is_resolved_path_allowed(repo_root):
+            raise PermissionError(f"Repository path is not allowed: {repo_path}")
+        
         try:
-            return git.Repo(repo_path)
+            return GovernedRepo(repo_root)
         except git.InvalidGitRepositoryError:
             raise ValueError(f"Not a valid Git repository: {repo_path}")
     
     @staticmethod
-    def git_status(repo_path: str) -> Dict[str, Any]:
-        """Shows the working tree status."""
+    def git_status(repo_path: str, since_token: Optional[str] = None) -> Union[StatusResult, Dict[str, Any]]:
+        """Shows the working tree status.
+        
+        Every response carries a snapshot_token. Passing it back as since_token
+        returns only "not_modified" or the files added to and removed from
+        each list since that snapshot.
+        """
         repo = GitOperations.validate_repo_path(repo_path)
+        status = get_backend(repo).status()
+        token = _snapshot_token("s", repo.git_dir, status.to_json())
         
-        # Get status information
-        changed_files = [item.a_path for item in repo.index.diff(None)]
-        staged_files = [item.a_path for item in repo.index.diff('HEAD')]
-        untracked_files = repo.untracked_files
+        if since_token == token:
+            return {"not_modified": True, "snapshot_token": token}
         
-        # Get branch information
-        try:
-            current_branch = repo.active_branch.name
-        except TypeError:
-            # Handle detached HEAD state
-            current_branch = f"HEAD detached at {repo.head.commit.hexsha[:7]}"
+        previous = _status_snapshots.get(since_token) if since_token else None
+        status.snapshot_token = token
+        _status_snapshots.set(token, status)
+        if previous is None:
+            return status
         
-        return {
-            "current_branch": current_branch,
-            "changed_files": changed_files,
-            "staged_files": staged_files,
-            "untracked_files": untracked_files
-        }
+        delta: Dict[str, Any] = {}
+        if status.current_branch != previous.current_branch:
+            delta["current_branch"] = status.current_branch
+        for key in STATUS_LIST_KEYS:
+            current_files, previous_files = set(getattr(status, key)), set(getattr(previous, key))
+            added = sorted(current_files - previous_files)
+            removed = sorted(previous_files - current_files)
+            if added or removed:
+                delta[key] = {"added": added, "removed": removed}
+        return {"delta": delta, "snapshot_token": token}
     
     @staticmethod
-    def git_diff_unstaged(repo_path: str) -> str:
+    def git_diff_unstaged(repo_path: str) -> Union[str, Dict[str, Any]]:
         """Shows changes in working directory not yet staged."""
         repo = GitOperations.validate_repo_path(repo_path)
-        diff_output = repo.git.diff()
-        return diff_output
+        return spill_store.collect(_summarized_diff_chunks(repo, "diff", []), DIFF_MIME_TYPE)
     
     @staticmethod
-    def git_diff_staged(repo_path: str) -> str:
+    def git_diff_staged(repo_path: str) -> Union[str, Dict[str, Any]]:
         """Shows changes that are staged for commit."""
         repo = GitOperations.validate_repo_path(repo_path)
-        diff_output = repo.git.diff('--staged')
-        return diff_output
+        return spill_store.collect(_summarized_diff_chunks(repo, "diff", ['--staged']), DIFF_MIME_TYPE)
     
     @staticmethod
-    def git_diff(repo_path: str, target: str) -> str:
+    def git_diff(repo_path: str, target: str) -> Union[str, Dict[str, Any]]:
         """Shows differences between branches or commits."""
         repo = GitOperations.validate_repo_path(repo_path)
-        diff_output = repo.git.diff(target)
-        return diff_output
+        return spill_store.collect(_summarized_diff_chunks(repo, "diff", [target]), DIFF_MIME_TYPE)
     
     @staticmethod
     def git_commit(repo_path: str, message: str) -> Dict[str, str]:
@@ -95,10 +275,13 @@ class GitOperations:
         if not files:
             raise ValueError("No files specified for staging")
         
+        if repo.working_tree_dir is None:
+            raise ValueError("Bare repositories have no working tree to add files from")
+
         # Verify all files exist before adding any
         non_existent_files = []
         for file_path in files:
-            full_path = os.path.join(repo_path, file_path)
+            full_path = os.path.join(repo.working_tree_dir, file_path)
             if not os.path.exists(full_path):
                 non_existent_files.append(file_path)
         
@@ -118,21 +301,39 @@ class GitOperations:
         return {"success": True}
     
     @staticmethod
-    def git_log(repo_path: str, max_count: Optional[int] = 10) -> List[Dict[str, str]]:
-        """Shows the commit logs."""
+    def git_log(
+        repo_path: str,
+        max_count: Optional[int] = 10,
+        since_token: Optional[str] = None
+    ) -> Union[CommitLog, Dict[str, Any]]:
+        """Shows the commit logs.
+        
+        Without since_token the commits are returned as a list. When
+        since_token is given (an empty string for the first call), the result
+        is a dict with a snapshot_token and either "not_modified", "added"
+        (commits to prepend to the previous result) or the full "commits"
+        list. The full list is returned when history was rewritten, when the
+        previous HEAD no longer exists, and when the new commits include a
+        merge, whose side branch may sort among the previous commits.
+        """
         repo = GitOperations.validate_repo_path(repo_path)
+        backend = get_backend(repo)
+        if since_token is None:
+            return backend.log(max_count=max_count)
+        
+        head = backend.resolve_ref("HEAD")
+        token = _snapshot_token("l", repo.git_dir, head, max_count)
+        if since_token == token:
+            return {"not_modified": True, "snapshot_token": token}
         
-        logs = []
-        for commit in repo.iter_commits(max_count=max_count):
-            logs.append({
-                "hash": commit.hexsha,
-                "short_hash": commit.hexsha[:7],
-                "author": f"{commit.author.name} <{commit.author.email}>",
-                "date": commit.committed_datetime.isoformat(),
-                "message": commit.message
-            })
+        # Tokens are opaque hashes, so look up the HEAD the previous one was taken at
+        previous_head = _log_snapshot_heads.get(since_token) if since_token else None
+        _log_snapshot_heads.set(token, head)
+        if previous_head is not None and _is_linear_extension(repo, previous_head, head):
+            added = backend.log(max_count=max_count, exclude=[previous_head])
+            return {"added": added, "snapshot_token": token}
         
-        return logs
+        return {"commits": backend.log(max_count=max_count), "snapshot_token": token}
     
     @staticmethod
     def git_create_branch(repo_path: str, branch_name: str, start_point: Optional[str] = None) -> Dict[str, str]:
@@ -171,7 +372,7 @@ class GitOperations:
         return {"current_branch": branch_name}
     
     @staticmethod
-    def git_show(repo_path: str, revision: str) -> str:
+    def git_show(repo_path: str, revision: str) -> Union[str, Dict[str, Any]]:
         """Shows the contents of a commit."""
         repo = GitOperations.validate_repo_path(repo_path)
         
@@ -179,20 +380,664 @@ class GitOperations:
             raise ValueError("Revision cannot be empty")
         
         try:
-            show_output = repo.git.show(revision)
-            return show_output
-        except git.GitCommandError as e:
-            raise ValueError(f"Invalid revision: {revision}. Error: {str(e)}")
+            object_type: Optional[str] = _object_header(repo, revision)[1]
+        except ValueError:
+            object_type = None
+        if object_type == "commit":
+            try:
+                return spill_store.collect(_summarized_diff_chunks(repo, "show", [revision]))
+            except git.GitCommandError as e:
+                raise ValueError(f"Invalid revision: {revision}. Error: {str(e)}")
+        
+        # Tags, trees and blobs have no patch to summarize
+        return spill_store.collect(get_backend(repo).show_stream(revision))
     
+    @staticmethod
+    def git_blame(
+        repo_path: str,
+        file_path: str,
+        revision: Optional[str] = None,
+        start_line: Optional[int] = None,
+        end_line: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Shows what revision and author last modified each line of a file."""
+        repo = GitOperations.validate_repo_path(repo_path)
+
+        if not file_path or file_path.strip() == "":
+            raise ValueError("File path cannot be empty")
+        if start_line is not None and start_line < 1:
+            raise ValueError("start_line must be 1 or greater")
+        if start_line is not None and end_line is not None and end_line < start_line:
+            raise ValueError("end_line must not be less than start_line")
+
+        revision = revision or "HEAD"
+        try:
+            commit_sha, blob_sha = repo.git.rev_parse(
+                f"{revision}^{{commit}}", f"{revision}:{file_path}"
+            ).splitlines()
+        except (git.GitCommandError, ValueError):
+            raise ValueError(f"File '{file_path}' does not exist at revision: {revision}")
+
+        line_range = (int(start_line or 1), int(end_line) if end_line else None)
+        result: Optional[Dict[str, Any]] = _blame_cache.get((blob_sha, commit_sha, line_range))
+        if result is not None:
+            return result
+
+        # Commits that did not touch the file leave its blame unchanged, so
+        # key a second entry by the last commit that did.
+        last_commit = repo.git.rev_list("-1", commit_sha, "--", file_path)
+        result = _blame_cache.get((blob_sha, last_commit, line_range))
+        if result is None:
+            result = GitOperations._run_blame(repo, last_commit, blob_sha, file_path, line_range)
+            _blame_cache.set((blob_sha, last_commit, line_range), result)
+        result = dict(result, revision=commit_sha)
+        _blame_cache.set((blob_sha, commit_sha, line_range), result)
+        return result
+
+    @staticmethod
+    def _run_blame(
+        repo: git.Repo,
+        commit_sha: str,
+        blob_sha: str,
+        file_path: str,
+        line_range: Tuple[int, Optional[int]]
+    ) -> Dict[str, Any]:
+        """Stream `git blame --incremental` for a file and group lines into hunks.
+
+        The incremental format carries no line contents, so they are read from
+        the blob; textconv is disabled to keep line numbers in step with it.
+        """
+        args = ["--incremental", "--no-textconv"]
+        start_line, end_line = line_range
+        if start_line > 1 or end_line is not None:
+            args.append(f"-L{start_line},{end_line or ''}")
+        args.extend([commit_sha, "--", file_path])
+
+        try:
+            proc = repo.git.blame(*args, as_process=True)
+            metadata_by_commit: Dict[str, Dict[str, str]] = {}
+            groups = []
+            for commit, original_line, final_line, line_count, metadata in _parse_blame_incremental(
+                _iter_process_lines(proc)
+            ):
+                if metadata is not None:
+                    metadata_by_commit[commit] = metadata
+                groups.append((final_line, original_line, line_count, commit))
+        except git.GitCommandError as e:
+            raise ValueError(f"Could not blame '{file_path}'. Error: {str(e)}")
+
+        content = get_backend(repo).read_blob(blob_sha).decode("utf-8", errors="replace")
+        lines = content.split("\n")
+        if content.endswith("\n"):
+            lines.pop()
+
+        commits: Dict[str, Dict[str, Any]] = {}
+        hunks: List[Dict[str, Any]] = []
+        for final_line, original_line, line_count, commit in sorted(groups):
+            if commit not in commits:
+                metadata = metadata_by_commit[commit]
+                commits[commit] = {
+                    "author": f"{metadata.get('author', '')} {metadata.get('author-mail', '')}".strip(),
+                    "date": _format_timestamp(metadata["author-time"], metadata["author-tz"]),
+                    "summary": metadata.get("summary", ""),
+                    "filename": metadata.get("filename", file_path)
+                }
+            group_lines = lines[final_line - 1:final_line - 1 + line_count]
+            last = hunks[-1] if hunks else None
+            if (
+                last is not None
+                and last["commit"] == commit
+                and last["start_line"] + len(last["lines"]) == final_line
+                and last["original_start_line"] + len(last["lines"]) == original_line
+            ):
+                last["lines"].extend(group_lines)
+            else:
+                hunks.append({
+                    "commit": commit,
+                    "start_line": final_line,
+                    "original_start_line": original_line,
+                    "lines": group_lines
+                })
+
+        return {
+            "file_path": file_path,
+            "commits": commits,
+            "hunks": hunks
+        }
+
+    @staticmethod
+    def git_grep(
+        repo_path: str,
+        pattern: str,
+        paths: Optional[List[str]] = None,
+        revision: Optional[str] = None,
+        ignore_case: bool = False,
+        fixed_strings: bool = False,
+        max_count: Optional[int] = None,
+        max_results: Optional[int] = None,
+        use_index: bool = False
+    ) -> Dict[str, Any]:
+        """Searches tracked files for lines matching a pattern."""
+        repo = GitOperations.validate_repo_path(repo_path)
+
+        if not pattern:
+            raise ValueError("Search pattern cannot be empty")
+
+        max_results = int(max_results or config.get("max_grep_results", 1000))
+        args = ["-z", "-n", "-I", "--no-color", "-F" if fixed_strings else "-E"]
+        if ignore_case:
+            args.append("-i")
+        if max_count:
+            args.append(f"--max-count={int(max_count)}")
+        threads = config.get("grep_threads", 0)
+        if threads:
+            args.append(f"--threads={int(threads)}")
+        args.extend(["-e", pattern])
+
+        # Only a resolved SHA reaches the command line, so a revision can never be read as an option.
+        # The index describes a tree, so indexed searches never look at the worktree
+        tree = GitOperations._resolve_tree(repo, revision or "HEAD") if revision or use_index else None
+
+        pathspec_batches = [list(paths or [])]
+        index_info: Optional[Dict[str, Any]] = None
+        if use_index and tree is not None:
+            candidates: Optional[List[str]] = None
+            # The index follows HEAD, so searches of other trees don't rewind its incremental updates
+            if revision is None or tree == GitOperations._head_tree(repo):
+                index = trigram_index.get_index(str(repo.working_tree_dir or repo.git_dir))
+                with index.lock:
+                    index.update(repo, tree)
+                    candidates = index.candidates(pattern, fixed_strings)
+
+            index_info = {"tree": tree, "candidates": None}
+            if candidates is not None:
+                if paths:
+                    # git applies the pathspecs, so magic such as exclusions and globs keeps its meaning
+                    selected = GitOperations._tree_paths(repo, tree, paths)
+                    candidates = [path for path in candidates if path in selected]
+                index_info["candidates"] = len(candidates)
+                pathspec_batches = [
+                    [f":(literal){path}" for path in candidates[i:i + GREP_PATHSPEC_BATCH_SIZE]]
+                    for i in range(0, len(candidates), GREP_PATHSPEC_BATCH_SIZE)
+                ]
+
+        matches: List[Dict[str, Any]] = []
+        truncated = False
+        prefix = f"{tree}:" if tree else ""
+        for pathspecs in pathspec_batches:
+            command = args + ([tree] if tree else []) + ["--"] + pathspecs
+            try:
+                proc = repo.git.grep(*command, as_process=True)
+                for line in _iter_process_lines(proc):
+                    path, line_number, text = line.split("\0", 2)
+                    if prefix and path.startswith(prefix):
+                        path = path[len(prefix):]
+                    matches.append({"path": path, "line": int(line_number), "text": text})
+                    if len(matches) >= max_results:
+                        truncated = True
+                        break
+            except git.GitCommandError as e:
+                # git grep exits with status 1 when nothing matched
+                if e.status != 1:
+                    raise ValueError(f"Search failed. Error: {str(e)}")
+            if truncated:
+                break
+
+        result: Dict[str, Any] = {"matches": matches, "truncated": truncated}
+        if index_info is not None:
+            result["index"] = index_info
+        return result
+
+    @staticmethod
+    def git_search_commits(
+        repo_path: str,
+        query: Optional[str] = None,
+        author: Optional[str] = None,
+        path: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        limit: Optional[int] = 20,
+        offset: Optional[int] = 0
+    ) -> Dict[str, Any]:
+        """Searches commit history using the local commit index."""
+        repo = GitOperations.validate_repo_path(repo_path)
+
+        limit = int(limit or 20)
+        offset = int(offset or 0)
+        if limit < 1 or offset < 0:
+            raise ValueError("limit must be positive and offset must not be negative")
+        limit = min(limit, config.get("max_log_entries", 100))
+
+        index = commit_index.get_index(str(repo.working_tree_dir or repo.git_dir))
+        if index is None:
+            try:
+                return commit_index.search_log(
+                    repo, query=query, author=author, path=path, since=since, until=until, limit=limit, offset=offset
+                )
+            except git.GitCommandError as e:
+                raise ValueError(f"Could not search commits. Error: {str(e)}")
+
+        try:
+            index.update(repo)
+        except git.GitCommandError as e:
+            raise ValueError(f"Could not index commits. Error: {str(e)}")
+
+        return index.search(
+            query=query,
+            author=author,
+            path=path,
+            since=since,
+            until=until,
+            limit=limit,
+            offset=offset
+        )
+
+    @staticmethod
+    def git_history_stats(
+        repo_path: str,
+        revision_range: Optional[str] = None,
+        paths: Optional[List[str]] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        depth: Optional[int] = None,
+        max_commits: Optional[int] = None,
+        max_paths: Optional[int] = 100
+    ) -> Dict[str, Any]:
+        """Computes churn, commit counts and author shares per path over a revision range."""
+        repo = GitOperations.validate_repo_path(repo_path)
+
+        revision_range = revision_range or "HEAD"
+        paths = paths or []
+        max_commits = min(int(max_commits or config.get("max_history_stats_commits", 10000)),
+                          config.get("max_history_stats_commits", 10000))
+        max_paths = int(max_paths or 100)
+        if depth is not None and depth < 1:
+            raise ValueError("depth must be 1 or greater")
+        if max_commits < 1 or max_paths < 1:
+            raise ValueError("max_commits and max_paths must be positive")
+
+        rev_list_args = [f"--max-count={max_commits + 1}", "--no-merges"]
+        if since:
+            rev_list_args.append(f"--since={since}")
+        if until:
+            rev_list_args.append(f"--until={until}")
+        try:
+            output = repo.git.rev_list(*rev_list_args, revision_range, "--", *paths)
+        except git.GitCommandError as e:
+            raise ValueError(f"Invalid revision range: {revision_range}. Error: {str(e)}")
+        shas = output.split()
+        truncated = len(shas) > max_commits
+        shas = shas[:max_commits]
+
+        # Only commits that were never seen before need a numstat pass
+        missing = [sha for sha in shas if sha not in _numstat_cache]
+        if missing:
+            try:
+                for fields, numstat in commit_index.iter_numstat_log(repo, missing, ["--no-walk=unsorted"]):
+                    _numstat_cache.set(fields[0], (
+                        fields[1],
+                        fields[2],
+                        tuple((sys.intern(path), added or 0, deleted or 0) for added, deleted, path in numstat)
+                    ))
+            except git.GitCommandError as e:
+                raise ValueError(f"Could not read commit statistics. Error: {str(e)}")
+
+        author_ids: Dict[Tuple[str, str], int] = {}
+        author_commits: List[int] = []
+        author_lines: List[int] = []
+        # Path -> [commits, added, deleted, {author id: changed lines}]
+        path_stats: Dict[str, List[Any]] = {}
+
+        for sha in shas:
+            entry = _numstat_cache.get(sha)
+            if entry is None:
+                continue
+            author_name, author_email, numstat = entry
+            author_id = author_ids.setdefault((author_name, author_email), len(author_ids))
+            if author_id == len(author_commits):
+                author_commits.append(0)
+                author_lines.append(0)
+            author_commits[author_id] += 1
+
+            seen = set()
+            for path, added, deleted in numstat:
+                if paths and not _matches_pathspec(path, paths):
+                    continue
+                if depth is not None:
+                    path = "/".join(path.split("/")[:depth])
+                stats = path_stats.get(path)
+                if stats is None:
+                    stats = path_stats[path] = [0, 0, 0, {}]
+                if path not in seen:
+                    seen.add(path)
+                    stats[0] += 1
+                stats[1] += added
+                stats[2] += deleted
+                # Count a commit as one changed line so binary-only changes still show ownership
+                lines = added + deleted or 1
+                stats[3][author_id] = stats[3].get(author_id, 0) + lines
+                author_lines[author_id] += added + deleted
+
+        ranked = sorted(path_stats.items(), key=lambda item: (-(item[1][1] + item[1][2]), -item[1][0], item[0]))
+        columns: Dict[str, List[Any]] = {
+            "path": [], "commits": [], "added": [], "deleted": [],
+            "authors": [], "top_author": [], "top_author_share": []
+        }
+        for path, (commits, added, deleted, owners) in ranked[:max_paths]:
+            top_author, top_lines = max(owners.items(), key=lambda owner: (owner[1], -owner[0]))
+            columns["path"].append(path)
+            columns["commits"].append(commits)
+            columns["added"].append(added)
+            columns["deleted"].append(deleted)
+            columns["authors"].append(len(owners))
+            columns["top_author"].append(top_author)
+            columns["top_author_share"].append(round(top_lines / sum(owners.values()), 3))
+
+        authors = list(author_ids)
+        return {
+            "commits": len(shas),
+            "truncated": truncated,
+            "total_paths": len(path_stats),
+            "paths": columns,
+            # top_author values above index into these columns
+            "authors": {
+                "name": [name for name, _email in authors],
+                "email": [email for _name, email in authors],
+                "commits": author_commits,
+                "lines_changed": author_lines
+            }
+        }
+
+    @staticmethod
+    def _resolve_commit(repo: git.Repo, ref: str) -> str:
+        """Resolve a revision to a commit SHA through the persistent cat-file process."""
+        if not ref or ref.startswith("-"):
+            raise ValueError(f"Invalid revision: {ref}")
+        try:
+            return _object_header(repo, f"{ref}^{{commit}}")[0]
+        except ValueError:
+            raise ValueError(f"Invalid revision: {ref}")
+
+    @staticmethod
+    def _resolve_tree(repo: git.Repo, ref: str) -> str:
+        """Resolve a revision to a tree SHA through the persistent cat-file process."""
+        if not ref or ref.startswith("-"):
+            raise ValueError(f"Invalid revision: {ref}")
+        try:
+            return _object_header(repo, f"{ref}^{{tree}}")[0]
+        except ValueError:
+            raise ValueError(f"Invalid revision: {ref}")
+
+    @staticmethod
+    def _head_tree(repo: git.Repo) -> Optional[str]:
+        """Tree SHA of HEAD, or None while HEAD has no commits."""
+        try:
+            return GitOperations._resolve_tree(repo, "HEAD")
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _tree_paths(repo: git.Repo, tree_sha: str, pathspecs: List[str]) -> Set[str]:
+        """List the files of a tree that match pathspecs, with git's pathspec rules."""
+        try:
+            output = repo.git.diff("--name-only", "-z", "--no-renames", EMPTY_TREE_SHA, tree_sha, "--", *pathspecs)
+        except git.GitCommandError as e:
+            raise ValueError(f"Invalid pathspec. Error: {str(e)}")
+        return {path for path in output.split("\0") if path}
+
+    @staticmethod
+    def _batch_ahead_behind(repo: git.Repo, base_sha: str, head_refs: List[str]) -> Dict[str, Tuple[int, int]]:
+        """Count ahead/behind for many refs against one base in a single history walk (git 2.41+)."""
+        # Map short names to full ref names in the order `git rev-parse` tries them
+        all_refs = set(repo.git.for_each_ref("--format=%(refname)").splitlines())
+        full_names = {}
+        for ref in head_refs:
+            for candidate in (ref, f"refs/{ref}", f"refs/tags/{ref}", f"refs/heads/{ref}", f"refs/remotes/{ref}"):
+                if candidate.startswith("refs/") and candidate in all_refs:
+                    full_names[candidate] = ref
+                    break
+        if not full_names:
+            return {}
+
+        output = repo.git.for_each_ref(f"--format=%(refname) %(ahead-behind:{base_sha})", *full_names)
+        counts = {}
+        for line in output.splitlines():
+            refname, ahead, behind = line.rsplit(" ", 2)
+            # for-each-ref patterns also match refs below a name, so keep exact matches only
+            if refname in full_names:
+                counts[full_names[refname]] = (int(ahead), int(behind))
+        return counts
+
+    @staticmethod
+    def _compare_commits(repo: git.Repo, base_sha: str, head_sha: str, max_commits: int, counts: Optional[Tuple[int, int]]) -> Dict[str, Any]:
+        """Compute merge base, ahead/behind counts and unique commits for one pair of commits."""
+        try:
+            merge_base: Optional[str] = repo.git.merge_base(base_sha, head_sha)
+        except git.GitCommandError:
+            # Unrelated histories
+            merge_base = None
+
+        result: Dict[str, Any] = {"merge_base": merge_base}
+        symmetric_range = f"{base_sha}...{head_sha}"
+        if max_commits == 0:
+            if counts is None:
+                behind, ahead = repo.git.rev_list("--left-right", "--count", symmetric_range).split()
+                counts = (int(ahead), int(behind))
+            result["ahead"], result["behind"] = counts
+            return result
+
+        ahead_commits: List[Dict[str, str]] = []
+        behind_commits: List[Dict[str, str]] = []
+        ahead = behind = 0
+        proc = repo.git.log("--left-right", "--format=%m%x1f%H%x1f%s", symmetric_range, as_process=True)
+        for line in _iter_process_lines(proc):
+            side, sha, subject = line.split("\x1f", 2)
+            if side == ">":
+                ahead += 1
+                if len(ahead_commits) < max_commits:
+                    ahead_commits.append({"hash": sha, "subject": subject})
+            else:
+                behind += 1
+                if len(behind_commits) < max_commits:
+                    behind_commits.append({"hash": sha, "subject": subject})
+
+        result.update({
+            "ahead": ahead,
+            "behind": behind,
+            "ahead_commits": ahead_commits,
+            "behind_commits": behind_commits
+        })
+        return result
+
+    @staticmethod
+    def git_compare_refs(
+        repo_path: str,
+        pairs: Optional[List[Dict[str, str]]] = None,
+        base: Optional[str] = None,
+        heads: Optional[List[str]] = None,
+        max_commits: Optional[int] = 20
+    ) -> Dict[str, Any]:
+        """Compares branch pairs: merge base, ahead/behind counts and commits unique to each side."""
+        repo = GitOperations.validate_repo_path(repo_path)
+
+        pairs = list(pairs or [])
+        if heads:
+            if not base:
+                raise ValueError("base is required when heads are given")
+            pairs.extend({"base": base, "head": head} for head in heads)
+        if not pairs:
+            raise ValueError("Either pairs or base and heads must be given")
+        max_pairs = config.get("max_compare_pairs", 1000)
+        if len(pairs) > max_pairs:
+            raise ValueError(f"At most {max_pairs} pairs can be compared in one call")
+        if not all(isinstance(pair.get("base"), str) and isinstance(pair.get("head"), str) for pair in pairs):
+            raise ValueError("Every pair needs a base and a head revision")
+        max_commits = int(max_commits if max_commits is not None else 20)
+        if max_commits < 0:
+            raise ValueError("max_commits must not be negative")
+
+        resolved: Dict[str, Union[str, ValueError]] = {}
+        for pair in pairs:
+            for ref in (pair["base"], pair["head"]):
+                if ref not in resolved:
+                    try:
+                        resolved[ref] = GitOperations._resolve_commit(repo, ref)
+                    except ValueError as e:
+                        resolved[ref] = e
+
+        # With git 2.41+ all heads compared against the same base share one walk
+        batch_counts: Dict[Tuple[str, str], Tuple[int, int]] = {}
+        if max_commits == 0 and repo.git.version_info >= AHEAD_BEHIND_GIT_VERSION:
+            heads_by_base: Dict[str, List[str]] = {}
+            for pair in pairs:
+                base_sha, head_sha = resolved[pair["base"]], resolved[pair["head"]]
+                if isinstance(base_sha, str) and isinstance(head_sha, str) and \
+                        (base_sha, head_sha, max_commits) not in _compare_cache:
+                    heads_by_base.setdefault(base_sha, []).append(pair["head"])
+            for base_sha, head_refs in heads_by_base.items():
+                if len(head_refs) > 1:
+                    for head_ref, counts in GitOperations._batch_ahead_behind(repo, base_sha, head_refs).items():
+                        batch_counts[(base_sha, head_ref)] = counts
+
+        comparisons = []
+        for pair in pairs:
+            base_ref, head_ref = pair["base"], pair["head"]
+            comparison: Dict[str, Any] = {"base": base_ref, "head": head_ref}
+            base_sha, head_sha = resolved[base_ref], resolved[head_ref]
+            if not isinstance(base_sha, str) or not isinstance(head_sha, str):
+                comparison["error"] = str(base_sha if not isinstance(base_sha, str) else head_sha)
+                comparisons.append(comparison)
+                continue
+
+            # Commits are immutable, so results stay valid for the same tips
+            key = (base_sha, head_sha, max_commits)
+            result = _compare_cache.get(key)
+            if result is None:
+                result = GitOperations._compare_commits(
+                    repo, base_sha, head_sha, max_commits, batch_counts.get((base_sha, head_ref))
+                )
+                _compare_cache.set(key, result)
+            comparison.update({"base_sha": base_sha, "head_sha": head_sha})
+            comparison.update(result)
+            comparisons.append(comparison)
+
+        common_dir = repo.common_dir
+        has_commit_graph = os.path.exists(os.path.join(common_dir, "objects", "info", "commit-graph")) or \
+            os.path.isdir(os.path.join(common_dir, "objects", "info", "commit-graphs"))
+        return {
+            "comparisons": comparisons,
+            # Without a commit-graph git cannot use generation numbers to cut walks short
+            "commit_graph": has_commit_graph
+        }
+
+    @staticmethod
+    def _list_tree(repo: git.Repo, tree_sha: str, recursive: bool, include_sizes: bool) -> TreeListing:
+        """Stream `git ls-tree -z` into a compact listing, cached by tree SHA."""
+        key = (tree_sha, recursive, include_sizes)
+        cached: Optional[TreeListing] = _tree_listing_cache.get(key)
+        if cached is not None:
+            return cached
+
+        args = ["-z"]
+        if recursive:
+            args.append("-r")
+        if include_sizes:
+            args.append("--long")
+        proc = repo.git.ls_tree(*args, tree_sha, as_process=True)
+
+        entries = TreeListing()
+        pending = b""
+        for chunk in iter_process_chunks(proc):
+            records = (pending + chunk).split(b"\0")
+            pending = records.pop()
+            for record in records:
+                info, _, path = record.partition(b"\t")
+                fields = info.split()
+                size = None
+                if include_sizes and fields[3] != b"-":
+                    size = int(fields[3])
+                entries.append(
+                    fields[0].decode("ascii"),
+                    fields[2].decode("ascii"),
+                    size,
+                    path.decode("utf-8", errors="replace")
+                )
+
+        _tree_listing_cache.set(key, entries)
+        return entries
+
+    @staticmethod
+    def git_ls_tree(
+        repo_path: str,
+        revision: Optional[str] = None,
+        path: Optional[str] = None,
+        recursive: Optional[bool] = False,
+        pattern: Optional[str] = None,
+        include_sizes: Optional[bool] = False,
+        limit: Optional[int] = 1000,
+        cursor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Lists the entries of a tree at a revision, one page at a time."""
+        repo = GitOperations.validate_repo_path(repo_path)
+
+        limit = int(limit or 1000)
+        if limit < 1:
+            raise ValueError("limit must be positive")
+        limit = min(limit, config.get("max_tree_entries", 10000))
+        prefix = (path or "").strip("/")
+
+        if cursor:
+            # Continue from the exact tree of the first page, even if the revision moved
+            tree_sha, _, offset_text = cursor.partition(":")
+            if len(tree_sha) < 40 or not offset_text.isdigit():
+                raise ValueError(f"Invalid cursor: {cursor}")
+            offset = int(offset_text)
+        else:
+            revision = revision or "HEAD"
+            spec = f"{revision}:{prefix}" if prefix else f"{revision}^{{tree}}"
+            try:
+                tree_sha, object_type = _object_header(repo, spec)
+            except ValueError:
+                raise ValueError(f"Path {prefix or '/'} does not exist at revision {revision}")
+            if object_type != "tree":
+                raise ValueError(f"{prefix} is not a directory at revision {revision}")
+            offset = 0
+
+        try:
+            entries = GitOperations._list_tree(repo, tree_sha, bool(recursive), bool(include_sizes))
+        except git.GitCommandError as e:
+            raise ValueError(f"Could not list tree {tree_sha}. Error: {str(e)}")
+
+        path_prefix = f"{prefix}/" if prefix else ""
+        selected: Union[range, List[int]] = range(len(entries))
+        if pattern:
+            # Patterns without a slash match the file name, like .gitignore
+            if "/" in pattern:
+                selected = [i for i, entry_path in enumerate(entries.paths) if fnmatch.fnmatchcase(path_prefix + entry_path, pattern)]
+            else:
+                selected = [i for i, entry_path in enumerate(entries.paths) if fnmatch.fnmatchcase(entry_path.rsplit("/", 1)[-1], pattern)]
+
+        page = selected[offset:offset + limit]
+        end = offset + len(page)
+        return {
+            "tree": tree_sha,
+            "total": len(selected),
+            "entries": entries.columns(page, path_prefix, bool(include_sizes)),
+            "next_cursor": f"{tree_sha}:{end}" if end < len(selected) else None
+        }
+
     @staticmethod
     def git_init(repo_path: str) -> Dict[str, bool]:
         """Initializes a Git repository."""
+        if not config.is_repo_allowed(repo_path):
+            raise PermissionError(f"Repository path is not allowed: {repo_path}")
+        
         if not os.path.exists(repo_path):
             os.makedirs(repo_path)
         
         if os.path.exists(os.path.join(repo_path, ".git")):
             raise ValueError(f"Repository already exists at {repo_path}")
         
-        git.Repo.init(repo_path)
+        GovernedRepo.init(repo_path)
         
         return {"success": True}
\ No newline at end of file
@@ -5,11 +5,20 @@ import sys
 import json
 from typing import Dict, Any, List, Optional
 
+from mcp_git_server.config import config
+from mcp_git_server.discovery import find_repo_root
 from mcp_git_server.git_operations import GitOperations
 from mcp_git_server.mcp import Server, FunctionRegistry, FunctionDefinition
+from mcp_git_server.profiling import PROFILE_MODES, profiler
+from mcp_git_server.scheduler import Scheduler
+from mcp_git_server.spill import spill_store
+from mcp_git_server.tracing import TraceRecorder
 from mcp_git_server.error_handling import setup_exception_handling
 from mcp_git_server.logging_config import setup_logging
-from mcp_git_server.utils import get_system_info
+from mcp_git_server.utils import get_system_info, normalize_path
+from mcp_git_server.warmup import start_warmup
+from mcp_git_server.watcher import CHANGE_KINDS, subscriptions
+from mcp_git_server.workers import WorkerPool, shard_index
 
 # Setup logging
 setup_logging()
@@ -18,6 +27,10 @@ logger = logging.getLogger(__name__)
 # Setup exception handling
 setup_exception_handling()
 
+def without_worker(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Drop the `worker` parameter, which only routes calls in multi-process mode."""
+    return {key: value for key, value in params.items() if key != "worker"}
+
 def register_functions(server: Server) -> None:
     """Register Git operations as MCP functions."""
     registry = FunctionRegistry()
@@ -33,6 +46,10 @@ def register_functions(server: Server) -> None:
                     "repo_path": {
                         "type": "string",
                         "description": "Path to Git repository"
+                    },
+                    "since_token": {
+                        "type": "string",
+                        "description": "snapshot_token from a previous call; only changes since then are returned"
                     }
                 },
                 "required": ["repo_path"]
@@ -56,7 +73,8 @@ def register_functions(server: Server) -> None:
                 },
                 "required": ["repo_path"]
             },
-            function=lambda params: GitOperations.git_diff_unstaged(**params)
+            function=lambda params: GitOperations.git_diff_unstaged(**params),
+            heavy=True
         )
     )
     
@@ -75,7 +93,8 @@ def register_functions(server: Server) -> None:
                 },
                 "required": ["repo_path"]
             },
-            function=lambda params: GitOperations.git_diff_staged(**params)
+            function=lambda params: GitOperations.git_diff_staged(**params),
+            heavy=True
         )
     )
     
@@ -98,7 +117,8 @@ def register_functions(server: Server) -> None:
                 },
                 "required": ["repo_path", "target"]
             },
-            function=lambda params: GitOperations.git_diff(**params)
+            function=lambda params: GitOperations.git_diff(**params),
+            heavy=True
         )
     )
     
@@ -121,7 +141,8 @@ def register_functions(server: Server) -> None:
                 },
                 "required": ["repo_path", "message"]
             },
-            function=lambda params: GitOperations.git_commit(**params)
+            function=lambda params: GitOperations.git_commit(**params),
+            writes=True
         )
     )
     
@@ -145,7 +166,8 @@ def register_functions(server: Server) -> None:
                 },
                 "required": ["repo_path", "files"]
             },
-            function=lambda params: GitOperations.git_add(**params)
+            function=lambda params: GitOperations.git_add(**params),
+            writes=True
         )
     )
     
@@ -164,7 +186,8 @@ def register_functions(server: Server) -> None:
                 },
                 "required": ["repo_path"]
             },
-            function=lambda params: GitOperations.git_reset(**params)
+            function=lambda params: GitOperations.git_reset(**params),
+            writes=True
         )
     )
     
@@ -183,11 +206,16 @@ def register_functions(server: Server) -> None:
                     "max_count": {
                         "type": "number",
                         "description": "Maximum number of commits to show (default: 10)"
+                    },
+                    "since_token": {
+                        "type": "string",
+                        "description": "snapshot_token from a previous call (empty string on the first call); only new commits are returned"
                     }
                 },
                 "required": ["repo_path"]
             },
-            function=lambda params: GitOperations.git_log(**params)
+            function=lambda params: GitOperations.git_log(**params),
+            heavy=True
         )
     )
     
@@ -214,7 +242,8 @@ def register_functions(server: Server) -> None:
                 },
                 "required": ["repo_path", "branch_name"]
             },
-            function=lambda params: GitOperations.git_create_branch(**params)
+            function=lambda params: GitOperations.git_create_branch(**params),
+            writes=True
         )
     )
     
@@ -237,7 +266,8 @@ def register_functions(server: Server) -> None:
                 },
                 "required": ["repo_path", "branch_name"]
             },
-            function=lambda params: GitOperations.git_checkout(**params)
+            function=lambda params: GitOperations.git_checkout(**params),
+            writes=True
         )
     )
     
@@ -260,7 +290,286 @@ def register_functions(server: Server) -> None:
                 },
                 "required": ["repo_path", "revision"]
             },
-            function=lambda params: GitOperations.git_show(**params)
+            function=lambda params: GitOperations.git_show(**params),
+            heavy=True
+        )
+    )
+    
+    # git_ls_tree
+    registry.register(
+        FunctionDefinition(
+            name="git_ls_tree",
+            description="Lists the files and directories in a revision, with pagination",
+            parameters={
+                "type": "object",
+                "properties": {
+                    "repo_path": {
+                        "type": "string",
+                        "description": "Path to Git repository"
+                    },
+                    "revision": {
+                        "type": "string",
+                        "description": "Revision to list (default: HEAD)"
+                    },
+                    "path": {
+                        "type": "string",
+                        "description": "Directory to list, relative to the repository root (default: the root)"
+                    },
+                    "recursive": {
+                        "type": "boolean",
+                        "description": "List all files below the directory instead of its direct entries"
+                    },
+                    "pattern": {
+                        "type": "string",
+                        "description": "Glob matched against file names, or against full paths if it contains a slash"
+                    },
+                    "include_sizes": {
+                        "type": "boolean",
+                        "description": "Include file sizes in bytes"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "Maximum number of entries to return (default: 1000)"
+                    },
+                    "cursor": {
+                        "type": "string",
+                        "description": "next_cursor from a previous call, with the same path, recursive, pattern and include_sizes"
+                    }
+                },
+                "required": ["repo_path"]
+            },
+            function=lambda params: GitOperations.git_ls_tree(**params)
+        )
+    )
+    
+    # git_blame
+    registry.register(
+        FunctionDefinition(
+            name="git_blame",
+            description="Shows what revision and author last modified each line of a file",
+            parameters={
+                "type": "object",
+                "properties": {
+                    "repo_path": {
+                        "type": "string",
+                        "description": "Path to Git repository"
+                    },
+                    "file_path": {
+                        "type": "string",
+                        "description": "Path of the file relative to the repository root"
+                    },
+                    "revision": {
+                        "type": "string",
+                        "description": "Revision to blame the file at (default: HEAD)"
+                    },
+                    "start_line": {
+                        "type": "integer",
+                        "description": "First line to blame (1-based)"
+                    },
+                    "end_line": {
+                        "type": "integer",
+                        "description": "Last line to blame (inclusive)"
+                    }
+                },
+                "required": ["repo_path", "file_path"]
+            },
+            function=lambda params: GitOperations.git_blame(**params),
+            heavy=True
+        )
+    )
+    
+    # git_grep
+    registry.register(
+        FunctionDefinition(
+            name="git_grep",
+            description="Searches tracked files for lines matching a pattern",
+            parameters={
+                "type": "object",
+                "properties": {
+                    "repo_path": {
+                        "type": "string",
+                        "description": "Path to Git repository"
+                    },
+                    "pattern": {
+                        "type": "string",
+                        "description": "Extended regular expression (or fixed string) to search for"
+                    },
+                    "paths": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Pathspecs limiting which files are searched"
+                    },
+                    "revision": {
+                        "type": "string",
+                        "description": "Revision to search instead of the working tree"
+                    },
+                    "ignore_case": {
+                        "type": "boolean",
+                        "description": "Match case-insensitively"
+                    },
+                    "fixed_strings": {
+                        "type": "boolean",
+                        "description": "Treat the pattern as a literal string"
+                    },
+                    "max_count": {
+                        "type": "integer",
+                        "description": "Maximum number of matches per file"
+                    },
+                    "max_results": {
+                        "type": "integer",
+                        "description": "Maximum number of matches to return (default: 1000)"
+                    },
+                    "use_index": {
+                        "type": "boolean",
+                        "description": "Narrow the search with the persistent trigram index, which follows HEAD (searches the revision, default HEAD; other revisions are searched without narrowing)"
+                    }
+                },
+                "required": ["repo_path", "pattern"]
+            },
+            function=lambda params: GitOperations.git_grep(**params),
+            heavy=True
+        )
+    )
+    
+    # git_search_commits
+    registry.register(
+        FunctionDefinition(
+            name="git_search_commits",
+            description="Searches commit history by message text, author, path and date",
+            parameters={
+                "type": "object",
+                "properties": {
+                    "repo_path": {
+                        "type": "string",
+                        "description": "Path to Git repository"
+                    },
+                    "query": {
+                        "type": "string",
+                        "description": "Full-text query over commit messages and authors (SQLite FTS5 syntax)"
+                    },
+                    "author": {
+                        "type": "string",
+                        "description": "Substring of the author name or email"
+                    },
+                    "path": {
+                        "type": "string",
+                        "description": "File, directory or glob the commits must touch"
+                    },
+                    "since": {
+                        "type": "string",
+                        "description": "Only commits on or after this ISO 8601 date"
+                    },
+                    "until": {
+                        "type": "string",
+                        "description": "Only commits on or before this ISO 8601 date"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "Maximum number of commits to return (default: 20)"
+                    },
+                    "offset": {
+                        "type": "integer",
+                        "description": "Number of matching commits to skip, from next_offset of a previous call"
+                    }
+                },
+                "required": ["repo_path"]
+            },
+            function=lambda params: GitOperations.git_search_commits(**params),
+            heavy=True
+        )
+    )
+    
+    # git_history_stats
+    registry.register(
+        FunctionDefinition(
+            name="git_history_stats",
+            description="Computes churn, commit counts and author shares per path over a revision range",
+            parameters={
+                "type": "object",
+                "properties": {
+                    "repo_path": {
+                        "type": "string",
+                        "description": "Path to Git repository"
+                    },
+                    "revision_range": {
+                        "type": "string",
+                        "description": "Revision or range such as main~100..main (default: HEAD); merge commits are skipped"
+                    },
+                    "paths": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Pathspecs limiting which files are counted"
+                    },
+                    "since": {
+                        "type": "string",
+                        "description": "Only commits more recent than this date"
+                    },
+                    "until": {
+                        "type": "string",
+                        "description": "Only commits older than this date"
+                    },
+                    "depth": {
+                        "type": "integer",
+                        "description": "Aggregate paths to their first N directory levels"
+                    },
+                    "max_commits": {
+                        "type": "integer",
+                        "description": "Maximum number of commits to analyze (default: 10000)"
+                    },
+                    "max_paths": {
+                        "type": "integer",
+                        "description": "Maximum number of paths to return, by churn (default: 100)"
+                    }
+                },
+                "required": ["repo_path"]
+            },
+            function=lambda params: GitOperations.git_history_stats(**params),
+            heavy=True
+        )
+    )
+    
+    # git_compare_refs
+    registry.register(
+        FunctionDefinition(
+            name="git_compare_refs",
+            description="Compares branches: merge base, ahead/behind counts and commits unique to each side, for many pairs at once",
+            parameters={
+                "type": "object",
+                "properties": {
+                    "repo_path": {
+                        "type": "string",
+                        "description": "Path to Git repository"
+                    },
+                    "pairs": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "base": {"type": "string"},
+                                "head": {"type": "string"}
+                            },
+                            "required": ["base", "head"]
+                        },
+                        "description": "Pairs of revisions to compare; head is ahead/behind relative to base"
+                    },
+                    "base": {
+                        "type": "string",
+                        "description": "Base revision to compare every entry of heads against"
+                    },
+                    "heads": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Revisions to compare against base"
+                    },
+                    "max_commits": {
+                        "type": "integer",
+                        "description": "Unique commits to list per side (default: 20, 0 for counts only, which is fastest)"
+                    }
+                },
+                "required": ["repo_path"]
+            },
+            function=lambda params: GitOperations.git_compare_refs(**params),
+            heavy=True
         )
     )
     
@@ -279,7 +588,51 @@ def register_functions(server: Server) -> None:
                 },
                 "required": ["repo_path"]
             },
-            function=lambda params: GitOperations.git_init(**params)
+            function=lambda params: GitOperations.git_init(**params),
+            writes=True
+        )
+    )
+    
+    # git_subscribe
+    registry.register(
+        FunctionDefinition(
+            name="git_subscribe",
+            description="Subscribes to repository changes, pushed as notifications/git/repository_changed",
+            parameters={
+                "type": "object",
+                "properties": {
+                    "repo_path": {
+                        "type": "string",
+                        "description": "Path to Git repository"
+                    },
+                    "kinds": {
+                        "type": "array",
+                        "items": {"type": "string", "enum": list(CHANGE_KINDS)},
+                        "description": "Changes to watch: head, refs, index, worktree (default: all)"
+                    }
+                },
+                "required": ["repo_path"]
+            },
+            function=lambda params: subscriptions.subscribe(**params)
+        )
+    )
+    
+    # git_unsubscribe
+    registry.register(
+        FunctionDefinition(
+            name="git_unsubscribe",
+            description="Cancels a repository change subscription",
+            parameters={
+                "type": "object",
+                "properties": {
+                    "subscription_id": {
+                        "type": "string",
+                        "description": "Subscription ID returned by git_subscribe"
+                    }
+                },
+                "required": ["subscription_id"]
+            },
+            function=lambda params: subscriptions.unsubscribe(**params)
         )
     )
     
@@ -297,7 +650,99 @@ def register_functions(server: Server) -> None:
         )
     )
     
+    # Admin functions are only exposed when enabled in the configuration
+    if config.get("enable_admin_functions", False):
+        # admin_profile_start
+        registry.register(
+            FunctionDefinition(
+                name="admin_profile_start",
+                description="Starts profiling the server for a number of seconds or function calls",
+                parameters={
+                    "type": "object",
+                    "properties": {
+                        "mode": {
+                            "type": "string",
+                            "enum": list(PROFILE_MODES),
+                            "description": "cprofile profiles every call; sampling samples stacks at an interval (default: cprofile)"
+                        },
+                        "seconds": {
+                            "type": "number",
+                            "description": "Stop after this many seconds"
+                        },
+                        "requests": {
+                            "type": "integer",
+                            "description": "Stop after this many function calls"
+                        },
+                        "trace_allocations": {
+                            "type": "boolean",
+                            "description": "Also report the source lines with the most memory allocated, using tracemalloc"
+                        },
+                        "sample_interval_ms": {
+                            "type": "integer",
+                            "description": "Milliseconds between stack samples in sampling mode (default: 5)"
+                        },
+                        "top": {
+                            "type": "integer",
+                            "description": "Number of functions and allocation sites to report (default: 20)"
+                        },
+                        "write_file": {
+                            "type": "boolean",
+                            "description": "Also write a pstats or collapsed-stack file to the config directory"
+                        },
+                        "worker": {
+                            "type": "integer",
+                            "description": "Worker process to profile when worker_processes is set (default: 0)"
+                        }
+                    },
+                    "required": []
+                },
+                function=lambda params: profiler.start(**without_worker(params))
+            )
+        )
+        
+        # admin_profile_stop
+        registry.register(
+            FunctionDefinition(
+                name="admin_profile_stop",
+                description="Stops profiling, or returns the report of the last finished profiling session",
+                parameters={
+                    "type": "object",
+                    "properties": {
+                        "worker": {
+                            "type": "integer",
+                            "description": "Worker process to profile when worker_processes is set (default: 0)"
+                        }
+                    },
+                    "required": []
+                },
+                function=lambda params: profiler.stop()
+            )
+        )
+        server.profiler = profiler
+    
     server.function_registry = registry
+    subscriptions.set_notifier(server.send_notification)
+
+def repo_key(repo_path: str) -> str:
+    """Key that calls on a repository are scheduled and sharded by."""
+    return find_repo_root(repo_path) or normalize_path(repo_path)
+
+def setup_server(server: Server, worker_index: int = 0, worker_count: int = 1) -> None:
+    """Prepare a server that runs function calls itself, as one of worker_count processes."""
+    register_functions(server)
+    # Workers split the global limits, so together they stay within the configured totals
+    server.scheduler = Scheduler(
+        repo_key=repo_key,
+        max_workers=max(1, config.get("max_concurrent_requests", 8) // worker_count),
+        max_queued=max(1, config.get("max_queued_requests", 64) // worker_count)
+    )
+    server.resource_reader = spill_store.read
+
+    def owns(repo_root: str) -> bool:
+        return shard_index(repo_root, worker_count) == worker_index
+
+    # Each worker warms up only the repositories it is sent calls for
+    server.on_initialize = lambda: start_warmup(server.scheduler, owns if worker_count > 1 else None)
 
 def main() -> None:
     """Main entry point for the MCP Git Server."""
@@ -305,7 +750,16 @@ def main() -> None:
     logger.info(f"System info: {json.dumps(get_system_info(), indent=2)}")
     
     server = Server()
-    register_functions(server)
+    worker_processes = config.get("worker_processes", 0)
+    if worker_processes > 0:
+        # The schema is still served here; calls run in the workers
+        register_functions(server)
+        server.worker_pool = WorkerPool(worker_processes, repo_key, server.write_encoded)
+        server.on_initialize = server.worker_pool.initialize
+    else:
+        setup_server(server)
+    if config.get("trace_file"):
+        server.trace_recorder = TraceRecorder(config.get("trace_file"))
     
     try:
         server.start_loop()
@@ -3,12 +3,25 @@
 import sys
 import json
 import logging
+import threading
 import traceback
+from contextlib import nullcontext
 from jsonschema import validate
-from typing import Dict, Any, List, Callable, Optional, Union
+from typing import TYPE_CHECKING, Dict, Any, List, Callable, Optional, Union
+
+from mcp_git_server.profiling import Profiler
+from mcp_git_server.results import to_json
+from mcp_git_server.scheduler import Scheduler, ServerBusyError
+from mcp_git_server.tracing import TraceRecorder
+
+if TYPE_CHECKING:
+    from mcp_git_server.workers import WorkerPool
 
 logger = logging.getLogger(__name__)
 
+# Methods handed to the worker pool in multi-process mode
+WORKER_METHODS = ("mcp.execute_function", "resources/read")
+
 class FunctionDefinition:
     """Defines a function that can be called via MCP."""
 
@@ -17,13 +30,22 @@ class FunctionDefinition:
         name: str,
         description: str,
         parameters: Dict[str, Any],
-        function: Callable[[Dict[str, Any]], Any]
+        function: Callable[[Dict[str, Any]], Any],
+        writes: bool = False,
+        heavy: bool = False
     ):
-        """Initialize function definition."""
+        """Initialize function definition.
+
+        writes marks functions that modify the repository and must not run
+        alongside other calls on it; heavy marks expensive read functions that
+        the scheduler starts after cheap ones.
+        """
         self.name = name
         self.description = description
         self.parameters = parameters
         self.function = function
+        self.writes = writes
+        self.heavy = heavy
 
     def to_dict(self) -> Dict[str, Any]:
         """Convert function definition to dictionary for schema response."""
@@ -56,6 +78,47 @@ class Server:
     def __init__(self) -> None:
         """Initialize server."""
         self.function_registry: Optional[FunctionRegistry] = None
+        # When set, function calls run on the scheduler instead of inline
+        self.scheduler: Optional[Scheduler] = None
+        # Serves resources/read for resource URIs returned by functions
+        self.resource_reader: Optional[Callable[[str, int, Optional[int]], Dict[str, Any]]] = None
+        # Profiles function calls while an admin profiling session runs
+        self.profiler: Optional[Profiler] = None
+        # Records incoming requests when tracing is enabled
+        self.trace_recorder: Optional[TraceRecorder] = None
+        # Called once the client has sent initialize
+        self.on_initialize: Optional[Callable[[], None]] = None
+        # When set, function calls and resource reads run in worker processes
+        self.worker_pool: Optional["WorkerPool"] = None
+        self._write_lock = threading.Lock()
+
+    def _write_message(self, message: Dict[str, Any]) -> None:
+        """Encode one JSON-RPC message once, log responses by size and send it."""
+        data = json.dumps(message, default=to_json).encode("utf-8")
+        if "method" not in message:
+            logger.info(f"Sending response to request {message.get('id')}: {len(data)} bytes")
+        self._send_encoded(message, data)
+
+    def _send_encoded(self, message: Dict[str, Any], data: bytes) -> None:
+        """Send an encoded message; the message itself is passed for routing."""
+        self.write_encoded(data)
+
+    def write_encoded(self, data: Union[bytes, memoryview]) -> None:
+        """Write one already encoded JSON-RPC message to stdout."""
+        with self._write_lock:
+            sys.stdout.flush()
+            sys.stdout.buffer.write(data)
+            sys.stdout.buffer.write(b"\n")
+            sys.stdout.buffer.flush()
+
+    def send_notification(self, method: str, params: Dict[str, Any]) -> None:
+        """Push a JSON-RPC notification to the client."""
+        logger.debug(f"Sending notification: {method}")
+        self._write_message({
+            "jsonrpc": "2.0",
+            "method": method,
+            "params": params
+        })
 
     def handle_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
         """Handle an MCP request."""
@@ -75,8 +138,13 @@ class Server:
                 # Handle initialize request specially
                 logger.info("Processing initialize request")
                 response["result"] = {
-                    "capabilities": {}
+                    "capabilities": {"resources": {}} if self.resource_reader or self.worker_pool else {}
                 }
+                if self.on_initialize is not None:
+                    try:
+                        self.on_initialize()
+                    except Exception as e:
+                        logger.warning(f"Initialize hook failed: {str(e)}")
                 return response
             elif method == "mcp.get_schema":
                 logger.info("Processing mcp.get_schema request")
@@ -94,6 +162,14 @@ class Server:
                 else:
                     response["result"] = result["result"]
                 return response
+            elif method == "resources/read":
+                logger.info("Processing resources/read request")
+                result = self._handle_read_resource(request)
+                if "error" in result:
+                    response["error"] = result["error"]
+                else:
+                    response["result"] = result["result"]
+                return response
             elif method == "notifications/cancelled":
                 # Just acknowledge notification
                 logger.info("Received cancellation notification")
@@ -173,7 +249,9 @@ class Server:
         try:
             # Validate parameters against the schema
             validate(instance=function_params, schema=function_def.parameters)
-            result = function_def.function(function_params)
+            profile = self.profiler.profile_request(function_name) if self.profiler else nullcontext()
+            with profile:
+                result = function_def.function(function_params)
             logger.info(f"Function executed successfully: {function_name}")
             return {"result": result}
         except Exception as e:
@@ -186,6 +264,73 @@ class Server:
                 }
             }
 
+    def _handle_read_resource(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle the resources/read request, with optional byte offset and length."""
+        if not self.resource_reader:
+            return {
+                "error": {
+                    "code": -32601,
+                    "message": "Method not found: resources/read"
+                }
+            }
+
+        params = request.get("params", {})
+        uri = params.get("uri")
+        try:
+            result = self.resource_reader(uri, params.get("offset", 0), params.get("length"))
+            return {"result": result}
+        except KeyError as e:
+            return {
+                "error": {
+                    "code": -32002,
+                    "message": str(e.args[0]),
+                    "data": {"uri": uri}
+                }
+            }
+        except (TypeError, ValueError) as e:
+            return {
+                "error": {
+                    "code": -32602,
+                    "message": f"Invalid params: {str(e)}"
+                }
+            }
+
+    def _schedule_request(self, request: Dict[str, Any]) -> None:
+        """Queue an execute_function request on the scheduler; its response is written when it finishes."""
+        params = request.get("params") or {}
+        function_params = params.get("parameters") or {}
+        repo_path = function_params.get("repo_path") if isinstance(function_params, dict) else None
+        function_def = None
+        name = params.get("name")
+        if self.function_registry and isinstance(name, str):
+            function_def = self.function_registry.get_function(name)
+
+        def run() -> None:
+            response = self.handle_request(request)
+            self._write_message(response)
+
+        if self.scheduler is None:
+            run()
+            return
+
+        try:
+            self.scheduler.submit(
+                run,
+                repo_path=repo_path if isinstance(repo_path, str) else None,
+                writes=function_def.writes if function_def else False,
+                heavy=function_def.heavy if function_def else False
+            )
+        except ServerBusyError as e:
+            self._write_message({
+                "jsonrpc": "2.0",
+                "id": request.get("id"),
+                "error": {
+                    "code": -32000,
+                    "message": str(e),
+                    "data": {"retry_after": e.retry_after}
+                }
+            })
+
     def start_loop(self) -> None:
         """Start the server loop, reading requests from stdin and writing responses to stdout."""
         logger.info("Starting MCP server loop")
@@ -198,6 +343,11 @@ class Server:
                 
                 if not line:
                     logger.info("End of input stream detected, exiting loop")
+                    if self.scheduler is not None:
+                        self.scheduler.drain()
+                    if self.worker_pool is not None:
+                        self.worker_pool.drain()
+                        self.worker_pool.stop()
                     break  # End of input stream
                 
                 logger.debug(f"Received raw input: {line.strip()}")
@@ -205,42 +355,57 @@ class Server:
                 # Parse the request
                 request = json.loads(line)
                 logger.info(f"Received request: {json.dumps(request)}")
+                if self.trace_recorder is not None:
+                    self.trace_recorder.record(request)
+
+                method = request.get("method")
+                if self.worker_pool is not None:
+                    if method in WORKER_METHODS:
+                        self.worker_pool.submit(request)
+                        continue
+                    if method in ("shutdown", "exit"):
+                        # Answer every call sent to the workers before shutting down
+                        self.worker_pool.drain()
+                if self.scheduler is not None:
+                    if method == "mcp.execute_function":
+                        self._schedule_request(request)
+                        continue
+                    if method in ("shutdown", "exit"):
+                        # Answer every queued call before shutting down
+                        self.scheduler.drain()
 
                 # Handle the request
                 response = self.handle_request(request)
 
                 # Write the response to stdout
-                json_response = json.dumps(response)
-                logger.info(f"Sending response: {json_response}")
-                sys.stdout.write(json_response + "\n")
-                sys.stdout.flush()
+                self._write_message(response)
                 
                 # If this was an exit notification, break the loop
                 if request.get("method") == "exit":
                     logger.info("Exit notification received, stopping server")
+                    if self.worker_pool is not None:
+                        self.worker_pool.stop()
                     break
 
             except json.JSONDecodeError as e:
                 logger.error(f"Invalid JSON input: {str(e)}")
-                sys.stdout.write(json.dumps({
+                self._write_message({
                     "jsonrpc": "2.0",
                     "id": None,
                     "error": {
                         "code": -32700,
                         "message": f"Parse error: {str(e)}"
                     }
-                }) + "\n")
-                sys.stdout.flush()
+                })
             
             except Exception as e:
                 logger.error(f"Unexpected error in server loop: {str(e)}")
                 logger.error(traceback.format_exc())
-                sys.stdout.write(json.dumps({
+                self._write_message({
                     "jsonrpc": "2.0",
                     "id": None,
                     "error": {
                         "code": -32603,
                         "message": f"Internal error: {str(e)}"
                     }
-                }) + "\n")
-                sys.stdout.flush()
\ No newline at end of file
+                })
\ No newline at end of file
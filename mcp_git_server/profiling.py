@@ -0,0 +1,312 @@
+"""On-demand profiling for MCP Git Server.
+
+A profiling session is started and stopped through the admin functions
+while the server keeps running. It either profiles every function call with
+cProfile, merging the per-call profiles, or samples the stacks of the
+threads running function calls at a fixed interval. Allocations can be traced with tracemalloc at
+the same time. A session ends after a number of seconds, after a number of
+function calls, or when it is stopped explicitly.
+"""
+
+import os
+import sys
+import time
+import cProfile
+import logging
+import pstats
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from types import FrameType
+from typing import Any, Dict, Iterator, List, Optional
+
+from mcp_git_server.config import config
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ("cprofile", "sampling")
+
+# Calls to these functions are never profiled or counted
+ADMIN_FUNCTION_PREFIX = "admin_"
+
+DEFAULT_SAMPLE_INTERVAL_MS = 5
+
+TRACEMALLOC_FRAMES = 16
+
+class ProfileSession:
+    """State of one profiling session."""
+
+    def __init__(
+        self,
+        mode: str,
+        max_seconds: Optional[float],
+        max_requests: Optional[int],
+        trace_allocations: bool,
+        sample_interval_ms: int
+    ) -> None:
+        """Initialize a session; it starts collecting when started by the Profiler."""
+        self.mode = mode
+        self.max_seconds = max_seconds
+        self.max_requests = max_requests
+        self.trace_allocations = trace_allocations
+        self.sample_interval = sample_interval_ms / 1000
+        self.started = time.monotonic()
+        self.started_at = datetime.now().isoformat()
+        self.requests = 0
+        self.stats: Optional[pstats.Stats] = None
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self.start_snapshot: Optional[tracemalloc.Snapshot] = None
+        self.started_tracemalloc = False
+        self.sampler: Optional[threading.Thread] = None
+        # Threads currently running a function call; only these are sampled
+        self.active_threads: Counter = Counter()
+        self.running = True
+
+class Profiler:
+    """Runs at most one profiling session at a time."""
+
+    def __init__(self) -> None:
+        """Initialize the profiler with no active session."""
+        self.lock = threading.Lock()
+        # Held while a session's report is built, so stop() can wait for it
+        self.finish_lock = threading.Lock()
+        self.session: Optional[ProfileSession] = None
+        self.report: Optional[Dict[str, Any]] = None
+        self.write_file = False
+        self.top = 20
+
+    def start(
+        self,
+        mode: str = "cprofile",
+        seconds: Optional[float] = None,
+        requests: Optional[int] = None,
+        trace_allocations: bool = False,
+        sample_interval_ms: int = DEFAULT_SAMPLE_INTERVAL_MS,
+        top: int = 20,
+        write_file: bool = False
+    ) -> Dict[str, Any]:
+        """Start a profiling session."""
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profiling mode: {mode}. Use one of: {', '.join(PROFILE_MODES)}")
+        if seconds is None and requests is None:
+            raise ValueError("Either seconds or requests must be given")
+        if sample_interval_ms < 1:
+            raise ValueError("sample_interval_ms must be 1 or greater")
+
+        with self.lock:
+            if self.session is not None and self.session.running:
+                raise ValueError("A profiling session is already running")
+
+            session = ProfileSession(mode, seconds, requests, trace_allocations, sample_interval_ms)
+            if trace_allocations:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start(TRACEMALLOC_FRAMES)
+                    session.started_tracemalloc = True
+                session.start_snapshot = tracemalloc.take_snapshot()
+            self.session = session
+            self.report = None
+            self.top = top
+            self.write_file = write_file
+
+        if mode == "sampling":
+            session.sampler = threading.Thread(target=self._sample, args=(session,), name="profile-sampler", daemon=True)
+            session.sampler.start()
+        if seconds is not None:
+            timer = threading.Timer(seconds, self._finish, args=(session,))
+            timer.daemon = True
+            timer.start()
+
+        logger.info(f"Started {mode} profiling session")
+        return {
+            "status": "running",
+            "mode": mode,
+            "seconds": seconds,
+            "requests": requests,
+            "trace_allocations": trace_allocations
+        }
+
+    def stop(self) -> Dict[str, Any]:
+        """Stop the current session, or return the report of the last finished one."""
+        with self.lock:
+            session = self.session
+        if session is None:
+            raise ValueError("No profiling session has been started")
+        self._finish(session)
+        with self.lock:
+            return self.report or {"status": "stopped"}
+
+    @contextmanager
+    def profile_request(self, function_name: str) -> Iterator[None]:
+        """Profile and count one function call while a session is running."""
+        session = self.session
+        if session is None or not session.running or function_name.startswith(ADMIN_FUNCTION_PREFIX):
+            yield
+            return
+
+        profile = None
+        if session.mode == "cprofile":
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Only one profiler can be active at a time on newer Pythons,
+                # so concurrent calls are counted but not profiled
+                profile = None
+        thread_id = threading.get_ident()
+        with self.lock:
+            session.active_threads[thread_id] += 1
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+            with self.lock:
+                session.active_threads[thread_id] -= 1
+                if not session.active_threads[thread_id]:
+                    del session.active_threads[thread_id]
+                if session.running:
+                    if profile is not None:
+                        if session.stats is None:
+                            session.stats = pstats.Stats(profile)
+                        else:
+                            session.stats.add(profile)
+                    session.requests += 1
+                finish = session.max_requests is not None and session.requests >= session.max_requests
+            if finish:
+                self._finish(session)
+
+    def _sample(self, session: ProfileSession) -> None:
+        """Record the stacks of threads running function calls until the session ends."""
+        while session.running:
+            with self.lock:
+                active = set(session.active_threads)
+            for thread_id, top_frame in sys._current_frames().items():
+                if thread_id not in active:
+                    continue
+                stack = []
+                frame: Optional[FrameType] = top_frame
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                session.samples[";".join(reversed(stack))] += 1
+            session.sample_count += 1
+            time.sleep(session.sample_interval)
+
+    def _finish(self, session: ProfileSession) -> None:
+        """End a session and build its report."""
+        with self.finish_lock:
+            with self.lock:
+                if not session.running:
+                    return
+                session.running = False
+            if session.sampler is not None:
+                session.sampler.join()
+            self._build_report(session)
+
+    def _build_report(self, session: ProfileSession) -> None:
+        """Summarize a finished session."""
+        report: Dict[str, Any] = {
+            "status": "finished",
+            "mode": session.mode,
+            "started_at": session.started_at,
+            "duration_seconds": round(time.monotonic() - session.started, 3),
+            "requests": session.requests
+        }
+        if session.mode == "cprofile":
+            report["top_functions"] = self._top_cprofile(session)
+        else:
+            report["samples"] = session.sample_count
+            report["top_functions"] = self._top_sampled(session)
+        if session.trace_allocations:
+            report["top_allocations"] = self._top_allocations(session)
+        if self.write_file:
+            report["file"] = self._write_file(session)
+
+        with self.lock:
+            self.report = report
+        logger.info(f"Finished {session.mode} profiling session")
+
+    def _top_cprofile(self, session: ProfileSession) -> List[Dict[str, Any]]:
+        """List the functions with the highest cumulative time."""
+        if session.stats is None:
+            return []
+        rows = []
+        # Stats.stats is not in the type stubs
+        stats = session.stats.stats  # type: ignore[attr-defined]
+        for (filename, line, name), (_cc, calls, total, cumulative, _callers) in stats.items():
+            rows.append({
+                "function": f"{name} ({os.path.basename(filename)}:{line})",
+                "calls": calls,
+                "total_seconds": round(total, 6),
+                "cumulative_seconds": round(cumulative, 6)
+            })
+        rows.sort(key=lambda row: row["cumulative_seconds"], reverse=True)
+        return rows[:self.top]
+
+    def _top_sampled(self, session: ProfileSession) -> List[Dict[str, Any]]:
+        """List the functions seen most often at the top of, and anywhere in, sampled stacks."""
+        own: Counter = Counter()
+        inclusive: Counter = Counter()
+        for stack, count in session.samples.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for frame in set(frames):
+                inclusive[frame] += count
+        total = max(1, sum(session.samples.values()))
+        return [
+            {
+                "function": frame,
+                "own_percent": round(100 * count / total, 2),
+                "inclusive_percent": round(100 * inclusive[frame] / total, 2)
+            }
+            for frame, count in own.most_common(self.top)
+        ]
+
+    def _top_allocations(self, session: ProfileSession) -> List[Dict[str, Any]]:
+        """List the source lines whose allocations grew most during the session."""
+        if not tracemalloc.is_tracing() or session.start_snapshot is None:
+            return []
+        snapshot = tracemalloc.take_snapshot()
+        if session.started_tracemalloc:
+            tracemalloc.stop()
+        # Leave out the profiler's own bookkeeping
+        filters = [
+            tracemalloc.Filter(False, module.__file__)
+            for module in (cProfile, pstats, tracemalloc, sys.modules[__name__]) if module.__file__
+        ]
+        snapshot = snapshot.filter_traces(filters)
+        differences = snapshot.compare_to(session.start_snapshot.filter_traces(filters), "lineno")
+        return [
+            {
+                "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                "size_diff_bytes": stat.size_diff,
+                "size_bytes": stat.size,
+                "count_diff": stat.count_diff
+            }
+            for stat in differences[:self.top]
+        ]
+
+    def _write_file(self, session: ProfileSession) -> Optional[str]:
+        """Write a pstats file or collapsed stacks under the config directory."""
+        profile_dir = os.path.join(os.path.dirname(config.config_path), "profiles")
+        os.makedirs(profile_dir, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        if session.mode == "cprofile":
+            if session.stats is None:
+                return None
+            path = os.path.join(profile_dir, f"profile-{stamp}.pstats")
+            session.stats.dump_stats(path)
+        else:
+            # One "frame;frame;frame count" line per stack, as read by flame graph tools
+            path = os.path.join(profile_dir, f"profile-{stamp}.collapsed")
+            with open(path, "w") as f:
+                for stack, count in session.samples.most_common():
+                    f.write(f"{stack} {count}\n")
+        return path
+
+# Global profiler instance
+profiler = Profiler()
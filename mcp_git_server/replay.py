@@ -0,0 +1,211 @@
+"""Load replayer for request traces recorded by MCP Git Server.
+
+Replays a trace against one or more server processes over stdio, keeping
+the recorded request timing (optionally sped up), and reports latency
+percentiles and error rates per function. Repository placeholders in the
+trace are mapped to local repositories with --repo.
+
+Example:
+    mcp-git-replay trace.jsonl.gz --repo REPO0=/src/project --speed 4 --servers 2
+"""
+
+import sys
+import gzip
+import json
+import math
+import time
+import zlib
+import shlex
+import argparse
+import threading
+import subprocess
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple
+
+from mcp_git_server.trace_format import REPO_PLACEHOLDER, TRACE_VERSION, WRITE_FUNCTIONS
+
+# Requests whose parameters only make sense in the recording session
+SKIPPED_METHODS = ("initialize", "shutdown", "exit", "resources/read", "notifications/cancelled")
+
+def read_trace(trace_path: str) -> Iterator[Tuple[float, Dict[str, Any]]]:
+    """Yield (offset in seconds, request) pairs from a trace file."""
+    with gzip.open(trace_path, "rt", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if "version" in record:
+                if record["version"] != TRACE_VERSION:
+                    raise ValueError(f"Unsupported trace version: {record['version']}")
+                continue
+            yield record["t"], record["request"]
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+class ServerProcess:
+    """A server under test, with a thread collecting its responses."""
+
+    def __init__(self, command: List[str]) -> None:
+        """Start the server and complete the initialize handshake."""
+        self.proc = subprocess.Popen(
+            command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL, text=True, bufsize=1
+        )
+        if self.proc.stdin is None or self.proc.stdout is None:
+            raise RuntimeError("Server pipes were not created")
+        self.stdin: IO[str] = self.proc.stdin
+        self.stdout: IO[str] = self.proc.stdout
+        self.lock = threading.Lock()
+        # Request ID -> (function name, send time)
+        self.pending: Dict[int, Tuple[str, float]] = {}
+        self.results: List[Tuple[str, float, bool]] = []
+        self.done = threading.Condition(self.lock)
+        self.send({"jsonrpc": "2.0", "id": 0, "method": "initialize", "params": {}})
+        self.stdout.readline()
+        self.reader = threading.Thread(target=self._read_responses, daemon=True)
+        self.reader.start()
+
+    def send(self, request: Dict[str, Any], name: Optional[str] = None) -> None:
+        """Send a request, timing it when a function name is given."""
+        if name is not None:
+            with self.lock:
+                self.pending[request["id"]] = (name, time.monotonic())
+        self.stdin.write(json.dumps(request) + "\n")
+        self.stdin.flush()
+
+    def _read_responses(self) -> None:
+        """Match responses to pending requests until the server exits."""
+        for line in self.stdout:
+            received = time.monotonic()
+            try:
+                message = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            with self.lock:
+                entry = self.pending.pop(message.get("id"), None)
+                if entry is not None:
+                    name, sent = entry
+                    self.results.append((name, received - sent, "error" in message))
+                    self.done.notify_all()
+        with self.lock:
+            self.pending.clear()
+            self.done.notify_all()
+
+    def finish(self, timeout: float) -> int:
+        """Wait for outstanding responses, stop the server, and return the number lost."""
+        deadline = time.monotonic() + timeout
+        with self.lock:
+            while self.pending and time.monotonic() < deadline:
+                self.done.wait(deadline - time.monotonic())
+            lost = len(self.pending)
+        self.stdin.close()
+        try:
+            self.proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+        return lost
+
+def map_repo_paths(value: Any, repos: Dict[str, str], default_repo: Optional[str]) -> Any:
+    """Replace $REPO<n> placeholders with local repository paths."""
+    if isinstance(value, dict):
+        return {k: map_repo_paths(v, repos, default_repo) for k, v in value.items()}
+    if isinstance(value, list):
+        return [map_repo_paths(item, repos, default_repo) for item in value]
+    if isinstance(value, str) and value.startswith(REPO_PLACEHOLDER):
+        name, _, rest = value[1:].partition("/")
+        local = repos.get(name, default_repo)
+        if local is None:
+            raise KeyError(name)
+        return f"{local}/{rest}" if rest else local
+    return value
+
+def print_report(results: List[Tuple[str, float, bool]], lost: int, skipped: int, elapsed: float) -> None:
+    """Print latency percentiles and error rates per function."""
+    by_name: Dict[str, List[Tuple[float, bool]]] = {}
+    for name, latency, error in results:
+        by_name.setdefault(name, []).append((latency, error))
+        by_name.setdefault("(all)", []).append((latency, error))
+
+    header = f"{'function':<24}{'count':>8}{'errors':>9}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for name in sorted(by_name, key=lambda n: (n == "(all)", n)):
+        entries = by_name[name]
+        latencies = sorted(latency * 1000 for latency, _ in entries)
+        errors = sum(1 for _, error in entries if error)
+        print(
+            f"{name:<24}{len(entries):>8}{errors / len(entries):>8.1%} "
+            f"{percentile(latencies, 0.5):>9.1f}{percentile(latencies, 0.9):>10.1f}"
+            f"{percentile(latencies, 0.99):>10.1f}{latencies[-1]:>10.1f}"
+        )
+    print()
+    print(f"Replayed {len(results)} requests in {elapsed:.1f}s ({len(results) / max(elapsed, 1e-9):.1f}/s)")
+    if skipped:
+        print(f"Skipped {skipped} requests")
+    if lost:
+        print(f"No response to {lost} requests")
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Entry point for mcp-git-replay."""
+    parser = argparse.ArgumentParser(description="Replay a recorded MCP Git Server request trace")
+    parser.add_argument("trace", help="Trace file written with the trace_file setting")
+    parser.add_argument("--repo", action="append", default=[], metavar="REPOn=PATH",
+                        help="Map a trace repository placeholder to a local repository")
+    parser.add_argument("--default-repo", help="Repository used for placeholders without --repo")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Replay speed multiplier; 0 sends requests as fast as possible")
+    parser.add_argument("--servers", type=int, default=1, help="Number of server processes")
+    parser.add_argument("--server-command", default=f"{sys.executable} -m mcp_git_server.main",
+                        help="Command that starts a server")
+    parser.add_argument("--include-writes", action="store_true",
+                        help="Also replay functions that modify repositories")
+    parser.add_argument("--timeout", type=float, default=60.0,
+                        help="Seconds to wait for outstanding responses at the end")
+    args = parser.parse_args(argv)
+
+    repos = {}
+    for mapping in args.repo:
+        name, sep, path = mapping.partition("=")
+        if not sep:
+            parser.error(f"Invalid --repo mapping: {mapping}")
+        repos[name.lstrip("$")] = path
+
+    skip_functions = frozenset() if args.include_writes else WRITE_FUNCTIONS
+    servers = [ServerProcess(shlex.split(args.server_command)) for _ in range(max(1, args.servers))]
+
+    skipped = 0
+    next_id = 1
+    started = time.monotonic()
+    for offset, request in read_trace(args.trace):
+        if request.get("method") in SKIPPED_METHODS:
+            continue
+        params = request.get("params") or {}
+        name = params.get("name", request.get("method"))
+        if name in skip_functions:
+            skipped += 1
+            continue
+        try:
+            params = map_repo_paths(params, repos, args.default_repo)
+        except KeyError as e:
+            parser.error(f"No local repository for ${e.args[0]}; use --repo or --default-repo")
+
+        if args.speed > 0:
+            delay = started + offset / args.speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+        # Keep each repository on one server so its caches stay warm
+        repo_path = (params.get("parameters") or {}).get("repo_path", "")
+        server = servers[zlib.crc32(repo_path.encode("utf-8")) % len(servers)]
+        server.send({"jsonrpc": "2.0", "id": next_id, "method": request.get("method"), "params": params}, name)
+        next_id += 1
+
+    lost = sum(server.finish(args.timeout) for server in servers)
+    elapsed = time.monotonic() - started
+    results = [result for server in servers for result in server.results]
+    print_report(results, lost, skipped, elapsed)
+
+if __name__ == "__main__":
+    main()
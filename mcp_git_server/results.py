@@ -0,0 +1,162 @@
+"""Compact result types for large listings in MCP Git Server.
+
+Status, log and tree listings of big repositories are kept alive by the
+snapshot and listing caches, so they are stored compactly instead of as
+lists of dicts: paths and author names are interned, so that every cached
+snapshot of a repository shares one string per path, object IDs are packed
+into one byte array, and numbers live in typed arrays. The types are
+converted to plain JSON values only when a response is encoded, by passing
+`to_json` as the `default` of `json.dumps`.
+"""
+
+import sys
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+def format_commit_date(timestamp: int, offset_seconds: int) -> str:
+    """Format a commit timestamp with its timezone offset as ISO 8601."""
+    tz = timezone(timedelta(seconds=offset_seconds))
+    return datetime.fromtimestamp(timestamp, tz).isoformat()
+
+def intern_paths(paths: Iterable[str]) -> Tuple[str, ...]:
+    """Sort and intern paths into a tuple."""
+    return tuple(sys.intern(path) for path in sorted(paths))
+
+class StatusResult:
+    """Current branch and sorted changed, staged and untracked paths."""
+
+    __slots__ = ("current_branch", "changed_files", "staged_files", "untracked_files", "snapshot_token")
+
+    def __init__(
+        self,
+        current_branch: str,
+        changed_files: Iterable[str],
+        staged_files: Iterable[str],
+        untracked_files: Iterable[str]
+    ) -> None:
+        """Initialize a status from unsorted path lists."""
+        self.current_branch = current_branch
+        self.changed_files = intern_paths(changed_files)
+        self.staged_files = intern_paths(staged_files)
+        self.untracked_files = intern_paths(untracked_files)
+        self.snapshot_token: Optional[str] = None
+
+    def to_json(self) -> Dict[str, Any]:
+        """Convert to the git_status response."""
+        result = {
+            "current_branch": self.current_branch,
+            "changed_files": self.changed_files,
+            "staged_files": self.staged_files,
+            "untracked_files": self.untracked_files
+        }
+        if self.snapshot_token is not None:
+            result["snapshot_token"] = self.snapshot_token
+        return result
+
+class CommitLog:
+    """Commits in columns; authors are stored once and referenced by index."""
+
+    __slots__ = ("shas", "oid_size", "authors", "author_ids", "author_index", "timestamps", "offsets", "messages")
+
+    def __init__(self) -> None:
+        """Initialize an empty log."""
+        self.shas = bytearray()
+        self.oid_size = 0
+        self.authors: List[str] = []
+        self.author_ids = array("I")
+        self.author_index: Dict[str, int] = {}
+        self.timestamps = array("q")
+        self.offsets = array("i")
+        self.messages: List[str] = []
+
+    def __len__(self) -> int:
+        """Number of commits."""
+        return len(self.messages)
+
+    def append(self, sha: str, author: str, timestamp: int, offset_seconds: int, message: str) -> None:
+        """Add a commit; offset_seconds is the committer's offset east of UTC."""
+        author_id = self.author_index.get(author)
+        if author_id is None:
+            author_id = self.author_index[author] = len(self.authors)
+            self.authors.append(sys.intern(author))
+        self.oid_size = len(sha) // 2
+        self.shas += bytes.fromhex(sha)
+        self.author_ids.append(author_id)
+        self.timestamps.append(timestamp)
+        self.offsets.append(offset_seconds)
+        self.messages.append(message)
+
+    def to_json(self) -> List[Dict[str, str]]:
+        """Convert to the git_log response, newest commit first."""
+        commits = []
+        for i in range(len(self.messages)):
+            sha = self.shas[i * self.oid_size:(i + 1) * self.oid_size].hex()
+            commits.append({
+                "hash": sha,
+                "short_hash": sha[:7],
+                "author": self.authors[self.author_ids[i]],
+                "date": format_commit_date(self.timestamps[i], self.offsets[i]),
+                "message": self.messages[i]
+            })
+        return commits
+
+class TreeListing:
+    """Entries of a tree in columns, in git order."""
+
+    __slots__ = ("paths", "modes", "objects", "oid_size", "sizes")
+
+    # Sizes of entries without one (trees and submodules)
+    NO_SIZE = -1
+
+    def __init__(self) -> None:
+        """Initialize an empty listing."""
+        self.paths: List[str] = []
+        self.modes = array("I")
+        self.objects = bytearray()
+        self.oid_size = 0
+        self.sizes = array("q")
+
+    def __len__(self) -> int:
+        """Number of entries."""
+        return len(self.paths)
+
+    def append(self, mode: str, object_id: str, size: Optional[int], path: str) -> None:
+        """Add an entry; mode is the octal string printed by git."""
+        self.paths.append(sys.intern(path))
+        self.modes.append(int(mode, 8))
+        self.oid_size = len(object_id) // 2
+        self.objects += bytes.fromhex(object_id)
+        self.sizes.append(self.NO_SIZE if size is None else size)
+
+    def object_id(self, index: int) -> str:
+        """Hex object ID of an entry."""
+        return self.objects[index * self.oid_size:(index + 1) * self.oid_size].hex()
+
+    @staticmethod
+    def object_type(mode: int) -> str:
+        """Object type of an entry, derived from its mode like git does."""
+        if mode == 0o040000:
+            return "tree"
+        if mode == 0o160000:
+            return "commit"
+        return "blob"
+
+    def columns(self, indices: Sequence[int], path_prefix: str, include_sizes: bool) -> Dict[str, List[Any]]:
+        """Columnar git_ls_tree entries for the selected rows."""
+        result: Dict[str, List[Any]] = {
+            "path": [path_prefix + self.paths[i] for i in indices],
+            "type": [self.object_type(self.modes[i]) for i in indices],
+            "mode": [f"{self.modes[i]:06o}" for i in indices],
+            "object": [self.object_id(i) for i in indices]
+        }
+        if include_sizes:
+            result["size"] = [None if self.sizes[i] == self.NO_SIZE else self.sizes[i] for i in indices]
+        return result
+
+def to_json(obj: Any) -> Any:
+    """`default` hook for json.dumps that converts result types."""
+    convert = getattr(obj, "to_json", None)
+    if convert is None:
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+    return convert()
@@ -0,0 +1,246 @@
+"""Admission control and per-repository resource governor for MCP Git Server.
+
+Function calls are queued and run on a bounded pool of worker threads. At
+most `max_concurrent_per_repo` calls run against one repository at a time,
+writes to a repository run alone, and cheap calls are started before heavy
+ones. While a write is queued for a repository no new reads of it start, so
+a steady stream of reads cannot starve writes. When the queue is full new calls are rejected with ServerBusyError
+instead of piling up git processes. Git child processes can additionally be
+started with memory and CPU time rlimits. The limits are applied by running
+git under `prlimit`, or with `resource.prlimit` right after a streaming
+process is spawned; `preexec_fn` is not used because it is unsafe in a
+threaded process.
+"""
+
+import bisect
+import shutil
+import logging
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import git
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None  # type: ignore
+
+from mcp_git_server.config import config
+
+logger = logging.getLogger(__name__)
+
+# Priority classes, lower runs first
+PRIORITY_CHEAP = 0
+PRIORITY_HEAVY = 1
+
+class ServerBusyError(Exception):
+    """Raised when the request queue is full."""
+
+    def __init__(self, retry_after: int) -> None:
+        """Initialize the error with the suggested retry delay in seconds."""
+        super().__init__(f"Server busy, retry after {retry_after} seconds")
+        self.retry_after = retry_after
+
+class Job:
+    """A queued function call."""
+
+    __slots__ = ("priority", "seq", "repo", "writes", "run")
+
+    def __init__(self, priority: int, seq: int, repo: Optional[str], writes: bool, run: Callable[[], None]) -> None:
+        """Initialize a job."""
+        self.priority = priority
+        self.seq = seq
+        self.repo = repo
+        self.writes = writes
+        self.run = run
+
+    def __lt__(self, other: "Job") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+class Scheduler:
+    """Runs function calls on worker threads within global and per-repository limits."""
+
+    def __init__(
+        self,
+        repo_key: Callable[[str], Optional[str]],
+        max_workers: Optional[int] = None,
+        max_per_repo: Optional[int] = None,
+        max_queued: Optional[int] = None
+    ) -> None:
+        """Initialize the scheduler; worker threads start with the first job.
+
+        repo_key maps a repo_path argument to the key per-repository limits are
+        counted under, so that different paths into one repository share them.
+        """
+        self.repo_key = repo_key
+        self.max_workers = max_workers or config.get("max_concurrent_requests", 8)
+        self.max_per_repo = max_per_repo or config.get("max_concurrent_per_repo", 2)
+        self.max_queued = max_queued or config.get("max_queued_requests", 64)
+        self._cond = threading.Condition()
+        self._reads: List[Job] = []
+        self._writes: List[Job] = []
+        # Repository -> number of queued writes, which hold back new reads
+        self._queued_writes: Dict[Optional[str], int] = {}
+        # Repository -> [running reads, running writes]
+        self._running: Dict[Optional[str], List[int]] = {}
+        self._active = 0
+        self._seq = 0
+        self._threads: List[threading.Thread] = []
+        # Moving average of job duration, used to suggest a retry delay
+        self._avg_duration = 0.1
+
+    def submit(self, run: Callable[[], None], repo_path: Optional[str] = None, writes: bool = False, heavy: bool = False) -> None:
+        """Queue a call, or raise ServerBusyError if the queue is full."""
+        repo = None
+        if repo_path:
+            try:
+                repo = self.repo_key(repo_path)
+            except Exception as e:
+                # The call itself will report the problem with the path
+                logger.debug(f"Could not resolve repository for {repo_path}: {str(e)}")
+                repo = repo_path
+
+        with self._cond:
+            queued = len(self._reads) + len(self._writes)
+            if queued >= self.max_queued:
+                retry_after = max(1, math.ceil(self._avg_duration * (queued + 1) / self.max_workers))
+                logger.warning(f"Rejecting request, {queued} requests already queued")
+                raise ServerBusyError(retry_after)
+
+            self._seq += 1
+            # Writes are short and block readers of the repository, so never deprioritize them
+            priority = PRIORITY_HEAVY if heavy and not writes else PRIORITY_CHEAP
+            job = Job(priority, self._seq, repo, writes, run)
+            bisect.insort(self._writes if writes else self._reads, job)
+            if writes:
+                self._queued_writes[repo] = self._queued_writes.get(repo, 0) + 1
+            self._start_workers()
+            self._cond.notify()
+
+    def drain(self) -> None:
+        """Wait until every queued and running call has finished."""
+        with self._cond:
+            while self._reads or self._writes or self._active:
+                self._cond.wait()
+
+    def _start_workers(self) -> None:
+        """Start the worker threads if they are not running yet."""
+        if self._threads:
+            return
+        for i in range(self.max_workers):
+            thread = threading.Thread(target=self._worker, name=f"scheduler-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _eligible(self, job: Job) -> bool:
+        """Check whether a job can start without exceeding its repository's limits."""
+        reads, writes = self._running.get(job.repo, (0, 0))
+        if job.writes:
+            return reads == 0 and writes == 0
+        return writes == 0 and reads < self.max_per_repo and job.repo not in self._queued_writes
+
+    def _take_job(self) -> Optional[Job]:
+        """Remove and return the highest priority job that may start now."""
+        best: Optional[Job] = None
+        best_queue: Optional[List[Job]] = None
+        for queue in (self._reads, self._writes):
+            for job in queue:
+                if best is not None and best < job:
+                    break
+                if self._eligible(job):
+                    best, best_queue = job, queue
+                    break
+        if best is not None and best_queue is not None:
+            best_queue.remove(best)
+            if best.writes:
+                remaining = self._queued_writes[best.repo] - 1
+                if remaining:
+                    self._queued_writes[best.repo] = remaining
+                else:
+                    del self._queued_writes[best.repo]
+        return best
+
+    def _worker(self) -> None:
+        """Run jobs until the process exits."""
+        while True:
+            with self._cond:
+                job = self._take_job()
+                while job is None:
+                    self._cond.wait()
+                    job = self._take_job()
+                counts = self._running.setdefault(job.repo, [0, 0])
+                counts[1 if job.writes else 0] += 1
+                self._active += 1
+
+            started = time.monotonic()
+            try:
+                job.run()
+            except Exception as e:
+                logger.error(f"Unhandled error in scheduled job: {str(e)}")
+            finally:
+                duration = time.monotonic() - started
+                with self._cond:
+                    self._avg_duration = 0.8 * self._avg_duration + 0.2 * duration
+                    counts[1 if job.writes else 0] -= 1
+                    if counts == [0, 0]:
+                        del self._running[job.repo]
+                    self._active -= 1
+                    self._cond.notify_all()
+
+def git_child_limits() -> Dict[int, int]:
+    """The configured rlimits for git children, by resource."""
+    if resource is None:
+        return {}
+    limits = {}
+    memory_limit = int(config.get("git_memory_limit_mb", 0)) * 1024 * 1024
+    cpu_limit = int(config.get("git_cpu_time_limit_s", 0))
+    if memory_limit:
+        limits[resource.RLIMIT_AS] = memory_limit
+    if cpu_limit:
+        limits[resource.RLIMIT_CPU] = cpu_limit
+    return limits
+
+def prlimit_command(limits: Dict[int, int]) -> Optional[List[str]]:
+    """Command prefix running a program under the limits with util-linux prlimit, if installed."""
+    executable = shutil.which("prlimit")
+    if executable is None or resource is None:
+        return None
+    options = {resource.RLIMIT_AS: "--as", resource.RLIMIT_CPU: "--cpu"}
+    return [executable] + [f"{options[limit]}={value}" for limit, value in limits.items()] + ["--"]
+
+class GovernedGit(git.Git):
+    """Git command wrapper that starts every git process with the configured rlimits."""
+
+    _warned_unlimited = False
+
+    def execute(self, command: Any, *args: Any, **kwargs: Any) -> Any:
+        """Execute a git command under the resource limits."""
+        limits = git_child_limits()
+        if not limits:
+            return super().execute(command, *args, **kwargs)
+
+        prefix = prlimit_command(limits)
+        if prefix is not None and isinstance(command, (list, tuple)):
+            return super().execute(prefix + list(command), *args, **kwargs)
+
+        if kwargs.get("as_process"):
+            # Set the limits from here; the child may run briefly without them
+            proc = super().execute(command, *args, **kwargs)
+            try:
+                for limit, value in limits.items():
+                    resource.prlimit(proc.pid, limit, (value, value))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not limit git process {proc.pid}: {str(e)}")
+            return proc
+
+        if not GovernedGit._warned_unlimited:
+            GovernedGit._warned_unlimited = True
+            logger.warning("prlimit is not installed; git commands that are not streamed run without resource limits")
+        return super().execute(command, *args, **kwargs)
+
+class GovernedRepo(git.Repo):
+    """Repository whose git commands run under the configured resource limits."""
+
+    GitCommandWrapperType = GovernedGit
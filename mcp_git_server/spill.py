@@ -0,0 +1,200 @@
+"""Spilling of large command output to temporary files for MCP Git Server.
+
+Output larger than `max_diff_size` is written to a temporary file while git
+produces it, instead of being collected into one string and encoded into a
+single JSON line. The tool then returns a resource URI with the size and
+SHA-256 of the output, and the client reads it in slices with
+`resources/read`. Spilled files expire `spill_ttl_seconds` after they were
+last read.
+"""
+
+import os
+import mmap
+import atexit
+import shutil
+import hashlib
+import logging
+import secrets
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, Optional, Union
+
+from mcp_git_server.config import config
+
+logger = logging.getLogger(__name__)
+
+URI_SCHEME = "git-spill://"
+
+CHUNK_SIZE = 64 * 1024
+
+# Bytes returned by resources/read when no length is given
+DEFAULT_READ_LENGTH = 1024 * 1024
+
+def iter_process_chunks(proc: Any) -> Iterator[bytes]:
+    """Yield raw output chunks from a running git process, then check its status."""
+    finished = False
+    try:
+        while True:
+            chunk = proc.stdout.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+        finished = True
+        proc.wait()
+    finally:
+        proc.stdout.close()
+        if not finished:
+            proc.kill()
+
+class SpilledOutput:
+    """A command output stored in a temporary file."""
+
+    __slots__ = ("path", "size", "sha256", "mime_type", "expires")
+
+    def __init__(self, path: str, size: int, sha256: str, mime_type: str, expires: float) -> None:
+        """Initialize a spilled output entry."""
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+        self.mime_type = mime_type
+        self.expires = expires
+
+class SpillStore:
+    """Temporary files holding large outputs, addressed by resource URI."""
+
+    def __init__(self) -> None:
+        """Initialize the store; the temporary directory is created on first spill."""
+        self.lock = threading.Lock()
+        self.entries: Dict[str, SpilledOutput] = {}
+        self.directory: Optional[str] = None
+        # Worker processes add their index, so reads can be routed back to them
+        self.uri_prefix = URI_SCHEME
+
+    def _ensure_directory(self) -> str:
+        """Create the private temporary directory for spilled files."""
+        with self.lock:
+            if self.directory is None:
+                self.directory = tempfile.mkdtemp(prefix="mcp-git-spill-")
+                atexit.register(shutil.rmtree, self.directory, True)
+            return self.directory
+
+    def collect(self, chunks: Iterable[bytes], mime_type: str = "text/plain") -> Union[str, Dict[str, Any]]:
+        """Collect output chunks, spilling them to a file once they exceed max_diff_size.
+
+        Small outputs are returned as a string, with the trailing newline
+        stripped like GitPython does; large ones as a resource description.
+        """
+        threshold = config.get("max_diff_size", 1024 * 1024)
+        buffered = []
+        buffered_size = 0
+        chunk_iter = iter(chunks)
+
+        for chunk in chunk_iter:
+            buffered.append(chunk)
+            buffered_size += len(chunk)
+            if buffered_size > threshold:
+                break
+        else:
+            text = b"".join(buffered).decode("utf-8", errors="replace")
+            return text[:-1] if text.endswith("\n") else text
+
+        fd, path = tempfile.mkstemp(dir=self._ensure_directory(), suffix=".out")
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in buffered:
+                    f.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+                del buffered[:]
+                for chunk in chunk_iter:
+                    f.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+        except BaseException:
+            os.unlink(path)
+            raise
+
+        uri = f"{self.uri_prefix}{secrets.token_hex(16)}"
+        ttl = config.get("spill_ttl_seconds", 900)
+        with self.lock:
+            self.entries[uri] = SpilledOutput(path, size, digest.hexdigest(), mime_type, time.monotonic() + ttl)
+        self.expire()
+        logger.info(f"Spilled {size} bytes of output to {uri}")
+
+        return {
+            "resource": {
+                "uri": uri,
+                "mime_type": mime_type,
+                "size": size,
+                "sha256": digest.hexdigest()
+            }
+        }
+
+    def read(self, uri: str, offset: int = 0, length: Optional[int] = None) -> Dict[str, Any]:
+        """Read a byte range of a spilled output.
+
+        The range is shortened so that it never ends inside a UTF-8 sequence,
+        or extended to one whole character when it is shorter than that; the
+        next read should start at offset + the returned length.
+        """
+        self.expire()
+        with self.lock:
+            entry = self.entries.get(uri)
+            if entry is None:
+                raise KeyError(f"Resource not found or expired: {uri}")
+            entry.expires = time.monotonic() + config.get("spill_ttl_seconds", 900)
+
+        if offset < 0 or offset > entry.size:
+            raise ValueError(f"Offset {offset} is outside the resource (size {entry.size})")
+        if length is None:
+            length = DEFAULT_READ_LENGTH
+        if length < 0:
+            raise ValueError("Length cannot be negative")
+
+        end = min(offset + length, entry.size)
+        data = b""
+        if end > offset:
+            try:
+                with open(entry.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    # Back off continuation bytes so multi-byte characters are not split
+                    while end < entry.size and end > offset and mapped[end] & 0xC0 == 0x80:
+                        end -= 1
+                    if end == offset:
+                        # The range is shorter than the character at offset; return all of it so reads progress
+                        end = offset + 1
+                        while end < entry.size and mapped[end] & 0xC0 == 0x80:
+                            end += 1
+                    data = mapped[offset:end]
+            except FileNotFoundError:
+                # Expired and deleted by a concurrent call
+                raise KeyError(f"Resource not found or expired: {uri}")
+
+        return {
+            "contents": [{
+                "uri": uri,
+                "mimeType": entry.mime_type,
+                "text": data.decode("utf-8", errors="replace")
+            }],
+            "offset": offset,
+            "length": len(data),
+            "size": entry.size,
+            "sha256": entry.sha256
+        }
+
+    def expire(self) -> None:
+        """Delete spilled files whose time to live has passed."""
+        now = time.monotonic()
+        with self.lock:
+            expired = [uri for uri, entry in self.entries.items() if entry.expires <= now]
+            paths = [self.entries.pop(uri).path for uri in expired]
+        for path in paths:
+            try:
+                os.unlink(path)
+            except OSError as e:
+                logger.debug(f"Could not remove spilled file {path}: {str(e)}")
+
+# Global spill store
+spill_store = SpillStore()
@@ -0,0 +1,15 @@
+"""Request trace format shared by the recorder and mcp-git-replay.
+
+This module imports nothing from the rest of the package, so the replayer
+can use it without loading the server configuration.
+"""
+
+TRACE_VERSION = 1
+
+REPO_PLACEHOLDER = "$REPO"
+
+# Functions that modify repositories, registered with writes=True;
+# the replayer skips them unless --include-writes is given
+WRITE_FUNCTIONS = frozenset({
+    "git_commit", "git_add", "git_reset", "git_create_branch", "git_checkout", "git_init"
+})
@@ -0,0 +1,125 @@
+"""Request trace recording for MCP Git Server.
+
+When `trace_file` is set, every request read by the server loop is appended
+to a gzip-compressed JSON lines file together with its arrival time, so that
+real workloads can be replayed later with `mcp-git-replay`. Traces are
+anonymized as they are written: repository paths become `$REPO<n>` followed
+by the path inside the repository, and free-text fields (commit messages,
+authors, search patterns and queries) are replaced by HMAC-SHA256 digests.
+The HMAC key is drawn at random for each recording and never written, so
+equal values can still be matched up within a trace but cannot be recovered
+by hashing guesses.
+
+File paths inside the repository, branch names and revisions are kept by
+default, because a replay against a copy of the repository needs them to
+do the same work. With `trace_redact_paths` they are hashed as well, and
+replayed calls that use them fail.
+"""
+
+import os
+import gzip
+import json
+import time
+import atexit
+import hmac
+import hashlib
+import logging
+import secrets
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional, TextIO
+
+from mcp_git_server import discovery
+from mcp_git_server.config import config
+from mcp_git_server.trace_format import REPO_PLACEHOLDER, TRACE_VERSION
+from mcp_git_server.utils import normalize_path
+
+logger = logging.getLogger(__name__)
+
+# Parameters whose values may identify people or leak content
+REDACTED_KEYS = ("message", "author", "pattern", "query")
+
+# Parameters naming files, branches or revisions inside a repository,
+# hashed only when `trace_redact_paths` is set
+REPOSITORY_NAME_KEYS = (
+    "file_path", "path", "paths", "files", "branch_name", "start_point",
+    "revision", "revision_range", "target", "base", "head", "heads"
+)
+
+# Seconds between flushes of the compressed stream
+FLUSH_INTERVAL = 1.0
+
+class TraceRecorder:
+    """Appends anonymized, timestamped requests to a trace file."""
+
+    def __init__(self, trace_path: str) -> None:
+        """Open the trace file and write its header."""
+        self.trace_path = os.path.expanduser(trace_path)
+        self.lock = threading.Lock()
+        self.repo_ids: Dict[str, int] = {}
+        # Key for hashing redacted values; kept in memory only
+        self.hash_key = secrets.token_bytes(32)
+        self.started = time.monotonic()
+        self.last_flush = self.started
+        self.redacted_keys = REDACTED_KEYS + (REPOSITORY_NAME_KEYS if config.get("trace_redact_paths", False) else ())
+        self.file: Optional[TextIO] = gzip.open(self.trace_path, "at", encoding="utf-8")
+        self._write({"version": TRACE_VERSION, "started": datetime.now().isoformat()})
+        atexit.register(self.close)
+        logger.info(f"Recording request trace to {self.trace_path}")
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        """Write one record, flushing the stream at most once per FLUSH_INTERVAL."""
+        if self.file is None:
+            return
+        self.file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        now = time.monotonic()
+        if now - self.last_flush >= FLUSH_INTERVAL:
+            self.file.flush()
+            self.last_flush = now
+
+    def _map_repo_path(self, repo_path: str) -> str:
+        """Replace the repository root of a path with its placeholder."""
+        try:
+            repo_root = discovery.find_repo_root(repo_path)
+        except Exception:
+            repo_root = None
+        if repo_root is None:
+            repo_root = repo_path
+            relative = ""
+        else:
+            relative = os.path.relpath(normalize_path(repo_path), repo_root)
+            relative = "" if relative == "." else "/" + relative.replace(os.sep, "/")
+
+        repo_id = self.repo_ids.setdefault(repo_root, len(self.repo_ids))
+        return f"{REPO_PLACEHOLDER}{repo_id}{relative}"
+
+    def _anonymize(self, value: Any, key: Optional[str] = None) -> Any:
+        """Anonymize request parameters recursively."""
+        if isinstance(value, dict):
+            return {k: self._anonymize(v, k) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self._anonymize(item, key) for item in value]
+        if isinstance(value, str):
+            if key == "repo_path":
+                return self._map_repo_path(value)
+            if key in self.redacted_keys:
+                return "redacted-" + hmac.new(self.hash_key, value.encode("utf-8"), hashlib.sha256).hexdigest()[:16]
+        return value
+
+    def record(self, request: Dict[str, Any]) -> None:
+        """Append one request to the trace."""
+        try:
+            with self.lock:
+                self._write({
+                    "t": round(time.monotonic() - self.started, 4),
+                    "request": self._anonymize(request)
+                })
+        except Exception as e:
+            logger.warning(f"Could not record request trace: {str(e)}")
+
+    def close(self) -> None:
+        """Flush and close the trace file."""
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
@@ -0,0 +1,353 @@
+"""Persistent trigram index used to narrow down git_grep searches."""
+
+import os
+import pickle
+import atexit
+import logging
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import git
+
+from mcp_git_server.backends import get_backend
+from mcp_git_server.config import config
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE_NAME = "trigram_index.pickle"
+INDEX_VERSION = 1
+
+# Seconds to wait before writing an updated index, so a series of HEAD moves is written once
+SAVE_DELAY = 30.0
+
+# Number of leading bytes inspected when deciding whether a blob is binary
+BINARY_CHECK_SIZE = 8000
+
+# Characters with a special meaning in POSIX extended regular expressions;
+# a backslash before one of them makes it a literal
+ERE_SPECIAL = set(".[]()*+?{}|^$\\")
+
+# Bracket expressions with character classes, equivalence classes or
+# collating symbols, which cannot be mapped to literal characters
+POSIX_BRACKET_SYNTAX = ("[:", "[=", "[.")
+
+def _trigrams(text: str) -> Set[str]:
+    """Return the set of case-folded trigrams in a piece of text."""
+    folded = text.casefold()
+    return {folded[i:i + 3] for i in range(len(folded) - 2)}
+
+def _skip_bracket(pattern: str, start: int) -> int:
+    """Index just past the bracket expression that starts at `start`."""
+    i = start + 1
+    if i < len(pattern) and pattern[i] == "^":
+        i += 1
+    # A ] right after the opening bracket is a member, not the end
+    if i < len(pattern) and pattern[i] == "]":
+        i += 1
+    end = pattern.find("]", i)
+    return len(pattern) if end < 0 else end + 1
+
+def _skip_group(pattern: str, start: int) -> Optional[int]:
+    """Index just past the group that starts at `start`, or None if it is not closed."""
+    depth = 0
+    i = start
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            i += 2
+            continue
+        if char == "[":
+            i = _skip_bracket(pattern, i)
+            continue
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return None
+
+def _literal_runs(pattern: str, fixed_strings: bool) -> Optional[List[str]]:
+    """Extract literal substrings every match of a pattern must contain.
+
+    Patterns are read as the POSIX extended regular expressions git grep -E
+    uses. Returns None when the pattern cannot be narrowed down safely (an
+    alternation, POSIX bracket classes, or a backslash escape with a meaning
+    of its own such as \\b or \\<), in which case every file is a candidate.
+    Groups and bracket expressions are skipped rather than analysed.
+    """
+    if fixed_strings:
+        return [pattern]
+    if any(syntax in pattern for syntax in POSIX_BRACKET_SYNTAX):
+        return None
+
+    runs: List[str] = []
+    current: List[str] = []
+
+    def end_run() -> None:
+        runs.append("".join(current))
+        current.clear()
+
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            if i + 1 >= len(pattern) or pattern[i + 1] not in ERE_SPECIAL:
+                return None
+            current.append(pattern[i + 1])
+            i += 2
+            continue
+        if char == "|":
+            return None
+        if char in "*?{":
+            # The preceding character may be absent, so it cannot be required
+            if current:
+                current.pop()
+            end_run()
+            if char == "{":
+                end = pattern.find("}", i)
+                if end < 0:
+                    return None
+                i = end + 1
+                continue
+        elif char == "+":
+            # The preceding character is required, but may repeat
+            end_run()
+        elif char == "[":
+            end_run()
+            i = _skip_bracket(pattern, i)
+            continue
+        elif char == "(":
+            end_run()
+            group_end = _skip_group(pattern, i)
+            if group_end is None:
+                return None
+            i = group_end
+            continue
+        elif char in ".^$)]}":
+            end_run()
+        else:
+            current.append(char)
+        i += 1
+    end_run()
+    return [run for run in runs if len(run) >= 3]
+
+class TrigramIndex:
+    """Maps trigrams to the files of one indexed tree that contain them."""
+
+    def __init__(self, index_path: str) -> None:
+        """Initialize an empty index stored at the given path."""
+        self.index_path = index_path
+        self.lock = threading.Lock()
+        self.save_timer: Optional[threading.Timer] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        """Drop all indexed data."""
+        self.tree_sha: Optional[str] = None
+        self.paths: List[Optional[str]] = []
+        self.path_ids: Dict[str, int] = {}
+        self.free_ids: List[int] = []
+        self.postings: Dict[str, Set[int]] = {}
+        self.unindexed: Set[int] = set()
+
+    @classmethod
+    def load(cls, index_path: str) -> "TrigramIndex":
+        """Load an index from disk, or return an empty one if none is usable."""
+        index = cls(index_path)
+        if not os.path.exists(index_path):
+            return index
+
+        try:
+            with open(index_path, "rb") as f:
+                data = pickle.load(f)
+            if data.get("version") != INDEX_VERSION:
+                logger.info(f"Discarding trigram index with old version at {index_path}")
+                return index
+            index.tree_sha = data["tree_sha"]
+            index.paths = data["paths"]
+            index.postings = data["postings"]
+            index.unindexed = data["unindexed"]
+            for file_id, path in enumerate(index.paths):
+                if path is None:
+                    index.free_ids.append(file_id)
+                else:
+                    index.path_ids[path] = file_id
+        except Exception as e:
+            logger.warning(f"Could not load trigram index from {index_path}: {str(e)}")
+            return cls(index_path)
+
+        return index
+
+    def _schedule_save(self) -> None:
+        """Write the index after a short delay; the caller holds the lock."""
+        if self.save_timer is not None:
+            return
+        self.save_timer = threading.Timer(SAVE_DELAY, self.flush)
+        self.save_timer.daemon = True
+        self.save_timer.start()
+        atexit.register(self.flush)
+
+    def flush(self) -> None:
+        """Write the index now if a save is pending."""
+        with self.lock:
+            if self.save_timer is None:
+                return
+            self.save_timer.cancel()
+            self.save_timer = None
+            try:
+                self.save()
+            except OSError as e:
+                logger.warning(f"Could not save trigram index to {self.index_path}: {str(e)}")
+        atexit.unregister(self.flush)
+
+    def save(self) -> None:
+        """Write the index to disk atomically."""
+        data = {
+            "version": INDEX_VERSION,
+            "tree_sha": self.tree_sha,
+            "paths": self.paths,
+            "postings": self.postings,
+            "unindexed": self.unindexed
+        }
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.index_path)
+
+    def update(self, repo: git.Repo, tree_sha: str) -> None:
+        """Bring the index up to date with a tree, reusing the previously indexed tree."""
+        if self.tree_sha == tree_sha:
+            return
+
+        if self.tree_sha is None:
+            logger.info(f"Building trigram index for tree {tree_sha}")
+            changes: Iterable[Tuple[str, Optional[str], Optional[str]]] = self._list_tree(repo, tree_sha)
+        else:
+            logger.info(f"Updating trigram index from tree {self.tree_sha} to {tree_sha}")
+            try:
+                changes = self._diff_trees(repo, self.tree_sha, tree_sha)
+            except git.GitCommandError:
+                # The old tree is gone (e.g. after gc), so rebuild from scratch
+                self._reset()
+                changes = self._list_tree(repo, tree_sha)
+
+        changed = self.tree_sha is None
+        for path, old_blob, new_blob in changes:
+            if old_blob is not None:
+                self._remove_file(repo, path, old_blob)
+            if new_blob is not None:
+                self._add_file(repo, path, new_blob)
+            changed = True
+
+        self.tree_sha = tree_sha
+        if changed:
+            self._schedule_save()
+
+    def candidates(self, pattern: str, fixed_strings: bool = False) -> Optional[List[str]]:
+        """Return the paths that may match a pattern, or None if all paths may."""
+        runs = _literal_runs(pattern, fixed_strings)
+        if not runs:
+            return None
+
+        required: Set[str] = set()
+        for run in runs:
+            required.update(_trigrams(run))
+
+        # Intersect the smallest posting lists first
+        posting_lists = sorted(
+            (self.postings.get(trigram, set()) for trigram in required), key=len
+        )
+        file_ids = set(posting_lists[0])
+        for posting_list in posting_lists[1:]:
+            if not file_ids:
+                break
+            file_ids &= posting_list
+        file_ids |= self.unindexed
+
+        return sorted(self.paths[file_id] for file_id in file_ids if self.paths[file_id] is not None)  # type: ignore[misc]
+
+    def _list_tree(self, repo: git.Repo, tree_sha: str) -> Iterator[Tuple[str, Optional[str], Optional[str]]]:
+        """Yield every blob of a tree as an added file."""
+        output = repo.git.ls_tree("-r", "-z", "--full-tree", tree_sha)
+        for entry in output.split("\0"):
+            if not entry:
+                continue
+            info, path = entry.split("\t", 1)
+            _mode, obj_type, sha = info.split(" ")
+            if obj_type == "blob":
+                yield path, None, sha
+
+    def _diff_trees(self, repo: git.Repo, old_tree: str, new_tree: str) -> List[Tuple[str, Optional[str], Optional[str]]]:
+        """List the blobs that changed between two trees."""
+        changes = []
+        for change in get_backend(repo).diff_trees(old_tree, new_tree):
+            status = change["status"]
+            old_blob = None if status == "A" or change["old_mode"] == "160000" else change["old_sha"]
+            new_blob = None if status == "D" or change["new_mode"] == "160000" else change["new_sha"]
+            changes.append((change["path"], old_blob, new_blob))
+        return changes
+
+    def _read_text(self, repo: git.Repo, blob_sha: str) -> Optional[str]:
+        """Read a blob as text, or return None if it is binary."""
+        data = get_backend(repo).read_blob(blob_sha)
+        if b"\0" in data[:BINARY_CHECK_SIZE]:
+            return None
+        return data.decode("utf-8", errors="replace")
+
+    def _add_file(self, repo: git.Repo, path: str, blob_sha: str) -> None:
+        """Index one file."""
+        if self.free_ids:
+            file_id = self.free_ids.pop()
+            self.paths[file_id] = path
+        else:
+            file_id = len(self.paths)
+            self.paths.append(path)
+        self.path_ids[path] = file_id
+
+        _sha, _type, size = repo.git.get_object_header(blob_sha)
+        if size > config.get("grep_index_max_file_size", 1024 * 1024):
+            self.unindexed.add(file_id)
+            return
+
+        text = self._read_text(repo, blob_sha)
+        if text is None:
+            # git grep skips binary files, so they never need to be searched
+            return
+        for trigram in _trigrams(text):
+            self.postings.setdefault(trigram, set()).add(file_id)
+
+    def _remove_file(self, repo: git.Repo, path: str, blob_sha: str) -> None:
+        """Remove one file, using its old contents to find its posting lists."""
+        file_id = self.path_ids.pop(path, None)
+        if file_id is None:
+            return
+        self.paths[file_id] = None
+        self.free_ids.append(file_id)
+        if file_id in self.unindexed:
+            self.unindexed.discard(file_id)
+            return
+
+        text = self._read_text(repo, blob_sha)
+        if text is None:
+            return
+        for trigram in _trigrams(text):
+            posting_list = self.postings.get(trigram)
+            if posting_list is not None:
+                posting_list.discard(file_id)
+                if not posting_list:
+                    del self.postings[trigram]
+
+_indexes: Dict[str, TrigramIndex] = {}
+_indexes_lock = threading.Lock()
+
+def get_index(repo_root: str) -> TrigramIndex:
+    """Get the trigram index for a repository, loading it from disk on first use."""
+    with _indexes_lock:
+        index = _indexes.get(repo_root)
+        if index is None:
+            index_path = os.path.join(config.get_repo_data_dir(repo_root), INDEX_FILE_NAME)
+            index = TrigramIndex.load(index_path)
+            _indexes[repo_root] = index
+        return index
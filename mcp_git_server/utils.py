@@ -31,9 +31,17 @@ def normalize_path(path: str) -> str:
     return os.path.normpath(os.path.abspath(os.path.expanduser(path)))
 
 def is_git_repository(path: str) -> bool:
-    """Check if a directory is a Git repository."""
+    """Check if a directory is a Git repository, worktree or submodule checkout."""
     git_dir = os.path.join(path, ".git")
-    return os.path.isdir(git_dir)
+    if os.path.isdir(git_dir):
+        return True
+    
+    # Linked worktrees and submodules use a .git file pointing at the git directory
+    try:
+        with open(git_dir, "r") as f:
+            return f.read(8) == "gitdir: "
+    except OSError:
+        return False
 
 def find_git_root(path: str) -> Optional[str]:
     """Find the Git repository root from a path."""
@@ -0,0 +1,149 @@
+"""Background warm-up of allowed repositories for MCP Git Server.
+
+The first call against a cold repository pays for discovering its root and
+for reading the index, refs and pack indexes from disk. When enabled, the
+warm-up runs once after `initialize`, on a background thread with idle I/O
+priority, so that those costs are paid before the first real request.
+"""
+
+import os
+import glob
+import ctypes
+import ctypes.util
+import logging
+import platform
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional
+
+from mcp_git_server import discovery
+from mcp_git_server.config import config
+from mcp_git_server.scheduler import GovernedRepo, Scheduler, ServerBusyError
+
+logger = logging.getLogger(__name__)
+
+# ioprio_set/ioprio_get system call numbers, which have no libc wrapper
+IOPRIO_SYSCALLS = {
+    "x86_64": (251, 252),
+    "aarch64": (30, 31),
+}
+IOPRIO_WHO_PROCESS = 1
+IOPRIO_CLASS_SHIFT = 13
+IOPRIO_CLASS_IDLE = 3
+
+READ_CHUNK_SIZE = 1024 * 1024
+
+_started = False
+_started_lock = threading.Lock()
+
+def _ioprio_syscall(index: int, *args: int) -> int:
+    """Call ioprio_set (index 0) or ioprio_get (index 1) for the calling thread."""
+    numbers = IOPRIO_SYSCALLS.get(platform.machine())
+    if numbers is None or platform.system() != "Linux":
+        return -1
+    libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    # A who of 0 means the calling thread; git children forked by it inherit the priority
+    return int(libc.syscall(numbers[index], IOPRIO_WHO_PROCESS, 0, *args))
+
+@contextmanager
+def low_io_priority() -> Iterator[None]:
+    """Run the calling thread, and the processes it starts, at idle I/O priority."""
+    previous = _ioprio_syscall(1)
+    changed = previous >= 0 and _ioprio_syscall(0, IOPRIO_CLASS_IDLE << IOPRIO_CLASS_SHIFT) == 0
+    try:
+        yield
+    finally:
+        if changed:
+            _ioprio_syscall(0, previous)
+
+def _preload(path: str) -> None:
+    """Read a file so that its pages are in the page cache."""
+    try:
+        with open(path, "rb", buffering=0) as f:
+            while f.read(READ_CHUNK_SIZE):
+                pass
+    except OSError as e:
+        logger.debug(f"Could not preload {path}: {str(e)}")
+
+def _maintain(repo_root: str) -> None:
+    """Run the optional maintenance commands that speed up later calls."""
+    repo = GovernedRepo(repo_root)
+    try:
+        if config.get("warmup_commit_graph", False):
+            repo.git.commit_graph("write", "--reachable")
+        if config.get("warmup_untracked_cache", False) and repo.working_tree_dir:
+            repo.git.update_index("--untracked-cache")
+    except Exception as e:
+        logger.warning(f"Warm-up maintenance failed for {repo_root}: {str(e)}")
+    finally:
+        repo.close()
+
+def warm_repository(repo_root: str, scheduler: Optional[Scheduler] = None) -> None:
+    """Warm the caches for one repository."""
+    repo = GovernedRepo(repo_root)
+    try:
+        common_dir = repo.common_dir
+        paths = [os.path.join(repo.git_dir, "index"), os.path.join(common_dir, "packed-refs")]
+        pack_dir = os.path.join(common_dir, "objects", "pack")
+        paths.extend(glob.glob(os.path.join(pack_dir, "*.idx")))
+        paths.append(os.path.join(pack_dir, "multi-pack-index"))
+        paths.append(os.path.join(common_dir, "objects", "info", "commit-graph"))
+    finally:
+        repo.close()
+
+    for path in paths:
+        if os.path.isfile(path):
+            _preload(path)
+
+    if not (config.get("warmup_commit_graph", False) or config.get("warmup_untracked_cache", False)):
+        return
+
+    def maintain() -> None:
+        with low_io_priority():
+            _maintain(repo_root)
+
+    if scheduler is None:
+        maintain()
+        return
+
+    # These commands take repository locks, so run them as writes
+    try:
+        scheduler.submit(maintain, repo_path=repo_root, writes=True, heavy=True)
+    except ServerBusyError:
+        logger.info(f"Skipping warm-up maintenance for {repo_root}, server is busy")
+
+def _warm_up(repo_paths: List[str], scheduler: Optional[Scheduler], owns: Optional[Callable[[str], bool]]) -> None:
+    """Warm every repository this process handles, one at a time."""
+    seen = set()
+    with low_io_priority():
+        for repo_path in repo_paths:
+            try:
+                repo_root = discovery.find_repo_root(repo_path)
+                if repo_root is None or repo_root in seen or (owns is not None and not owns(repo_root)):
+                    continue
+                seen.add(repo_root)
+                warm_repository(repo_root, scheduler)
+            except Exception as e:
+                logger.warning(f"Could not warm up {repo_path}: {str(e)}")
+    logger.info(f"Warmed up {len(seen)} repositories")
+
+def start_warmup(scheduler: Optional[Scheduler] = None, owns: Optional[Callable[[str], bool]] = None) -> None:
+    """Start warming up the allowed repositories in the background, once per process.
+
+    owns selects the repository roots this process handles; by default it warms them all.
+    """
+    global _started
+    if not config.get("warmup_on_initialize", False):
+        return
+
+    with _started_lock:
+        if _started:
+            return
+        _started = True
+
+    repo_paths = list(config.get("allowed_repos", []))
+    if not repo_paths:
+        return
+
+    thread = threading.Thread(target=_warm_up, args=(repo_paths, scheduler, owns), name="repo-warmup", daemon=True)
+    thread.start()
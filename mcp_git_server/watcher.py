@@ -0,0 +1,420 @@
+"""Repository change subscriptions for MCP Git Server.
+
+Clients subscribe to changes of a repository's HEAD, refs, index or working
+tree and receive debounced notifications instead of polling git_status and
+git_log. On Linux changes are picked up with inotify; elsewhere the git
+metadata files are polled with os.stat and working tree changes are not
+reported.
+"""
+
+import os
+import sys
+import uuid
+import errno
+import select
+import struct
+import logging
+import threading
+import ctypes
+import ctypes.util
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from mcp_git_server.config import config
+from mcp_git_server.git_operations import GitOperations
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_METHOD = "notifications/git/repository_changed"
+
+CHANGE_KINDS = ("head", "refs", "index", "worktree")
+
+# Paths listed per worktree notification before it is marked as truncated
+MAX_REPORTED_PATHS = 50
+
+# inotify event masks (see inotify(7))
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+WATCH_MASK = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+    | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+)
+EVENT_HEADER = struct.Struct("iIII")
+
+class Inotify:
+    """Minimal ctypes binding for Linux inotify."""
+
+    def __init__(self) -> None:
+        """Create a non-blocking inotify instance."""
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    @staticmethod
+    def available() -> bool:
+        """Check whether inotify can be used on this platform."""
+        return sys.platform.startswith("linux")
+
+    def add_watch(self, path: str, mask: int = WATCH_MASK) -> int:
+        """Watch a file or directory and return the watch descriptor."""
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {path}")
+        return int(wd)
+
+    def remove_watch(self, wd: int) -> None:
+        """Stop watching a watch descriptor."""
+        self.libc.inotify_rm_watch(self.fd, wd)
+
+    def read_events(self) -> List[Tuple[int, int, str]]:
+        """Read pending events as (watch descriptor, mask, name) tuples."""
+        try:
+            data = os.read(self.fd, 65536)
+        except OSError as e:
+            if e.errno == errno.EAGAIN:
+                return []
+            raise
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            events.append((wd, mask, name))
+        return events
+
+    def close(self) -> None:
+        """Close the inotify instance."""
+        os.close(self.fd)
+
+class WatchedRepository:
+    """Watch state and pending changes for one repository."""
+
+    def __init__(self, repo_root: str, git_dir: str, common_dir: str) -> None:
+        """Initialize watch state for a repository."""
+        self.repo_root = repo_root
+        self.git_dir = git_dir
+        self.common_dir = common_dir
+        self.subscriptions: Dict[str, Set[str]] = {}
+        self.watch_worktree = False
+        self.pending_kinds: Set[str] = set()
+        self.pending_refs: Set[str] = set()
+        self.pending_paths: Set[str] = set()
+        self.first_change = 0.0
+        self.last_change = 0.0
+        self.stat_signature: Dict[str, Any] = {}
+
+    def record(self, kind: str, detail: Optional[str] = None) -> None:
+        """Record a change to be reported at the next flush."""
+        now = time.monotonic()
+        if not self.pending_kinds:
+            self.first_change = now
+        self.last_change = now
+        self.pending_kinds.add(kind)
+        if detail is None:
+            return
+        if kind == "refs":
+            self.pending_refs.add(detail)
+        elif kind == "worktree" and len(self.pending_paths) <= MAX_REPORTED_PATHS:
+            self.pending_paths.add(detail)
+
+    def read_head(self) -> Dict[str, str]:
+        """Read HEAD directly from the git directory."""
+        try:
+            with open(os.path.join(self.git_dir, "HEAD"), "r") as f:
+                head = f.read().strip()
+        except OSError:
+            return {}
+        if head.startswith("ref: "):
+            ref = head[len("ref: "):]
+            return {"ref": ref, "branch": ref[len("refs/heads/"):] if ref.startswith("refs/heads/") else ref}
+        return {"detached": head}
+
+    def take_changes(self) -> Dict[str, Any]:
+        """Build a compact summary of the pending changes and reset them."""
+        changes: Dict[str, Any] = {}
+        if "head" in self.pending_kinds:
+            changes["head"] = self.read_head()
+        if "refs" in self.pending_kinds:
+            changes["refs"] = sorted(self.pending_refs)
+        if "index" in self.pending_kinds:
+            changes["index"] = True
+        if "worktree" in self.pending_kinds:
+            paths = sorted(self.pending_paths)
+            changes["worktree"] = {
+                "paths": paths[:MAX_REPORTED_PATHS],
+                "truncated": len(paths) > MAX_REPORTED_PATHS
+            }
+        self.pending_kinds.clear()
+        self.pending_refs.clear()
+        self.pending_paths.clear()
+        return changes
+
+class SubscriptionManager:
+    """Tracks subscriptions and pushes debounced change notifications."""
+
+    def __init__(self) -> None:
+        """Initialize the manager; the watcher thread starts with the first subscription."""
+        self.notifier: Optional[Callable[[str, Dict[str, Any]], None]] = None
+        self.repos: Dict[str, WatchedRepository] = {}
+        self.subscription_repos: Dict[str, str] = {}
+        # Worker processes add their index, so unsubscribe calls can be routed back to them
+        self.id_prefix = ""
+        self.lock = threading.RLock()
+        self.thread: Optional[threading.Thread] = None
+        self.inotify: Optional[Inotify] = None
+        # Watch descriptor -> (repository root, kind, watched directory)
+        self.watches: Dict[int, Tuple[str, str, str]] = {}
+        self.debounce = config.get("watch_debounce_ms", 250) / 1000.0
+        self.max_delay = config.get("watch_max_delay_ms", 2000) / 1000.0
+        self.poll_interval = config.get("watch_poll_interval", 1.0)
+
+    def set_notifier(self, notifier: Callable[[str, Dict[str, Any]], None]) -> None:
+        """Set the callback used to send notifications to the client."""
+        self.notifier = notifier
+
+    def subscribe(self, repo_path: str, kinds: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Subscribe to changes of a repository."""
+        repo = GitOperations.validate_repo_path(repo_path)
+        kinds = list(kinds or CHANGE_KINDS)
+        unknown = [kind for kind in kinds if kind not in CHANGE_KINDS]
+        if unknown:
+            raise ValueError(f"Unknown change kinds: {', '.join(unknown)}")
+        if "worktree" in kinds and repo.working_tree_dir is None:
+            raise ValueError("Bare repositories have no working tree to watch")
+
+        with self.lock:
+            self._ensure_started()
+            if self.inotify is None and "worktree" in kinds:
+                logger.warning("inotify is unavailable; working tree changes will not be reported")
+                kinds.remove("worktree")
+
+            repo_root = str(repo.working_tree_dir or repo.git_dir)
+            watched = self.repos.get(repo_root)
+            if watched is None:
+                watched = WatchedRepository(repo_root, str(repo.git_dir), str(repo.common_dir))
+                self.repos[repo_root] = watched
+                self._watch_git_dir(watched)
+            if "worktree" in kinds and not watched.watch_worktree:
+                watched.watch_worktree = True
+                self._watch_worktree(watched, repo_root)
+
+            subscription_id = f"{self.id_prefix}{uuid.uuid4().hex}"
+            watched.subscriptions[subscription_id] = set(kinds)
+            self.subscription_repos[subscription_id] = repo_root
+
+        logger.info(f"Subscription {subscription_id} watching {', '.join(kinds)} of {repo_root}")
+        return {
+            "subscription_id": subscription_id,
+            "repo_path": repo_root,
+            "kinds": kinds,
+            "notification": NOTIFICATION_METHOD
+        }
+
+    def unsubscribe(self, subscription_id: str) -> Dict[str, bool]:
+        """Cancel a subscription."""
+        with self.lock:
+            repo_root = self.subscription_repos.pop(subscription_id, None)
+            if repo_root is None:
+                raise ValueError(f"Unknown subscription: {subscription_id}")
+            watched = self.repos[repo_root]
+            watched.subscriptions.pop(subscription_id, None)
+            if not watched.subscriptions:
+                self._unwatch(repo_root)
+                del self.repos[repo_root]
+        return {"success": True}
+
+    def _ensure_started(self) -> None:
+        """Start the watcher thread."""
+        if self.thread is not None:
+            return
+        if Inotify.available():
+            try:
+                self.inotify = Inotify()
+            except OSError as e:
+                logger.warning(f"Could not initialize inotify, polling git metadata instead: {str(e)}")
+        target = self._inotify_loop if self.inotify is not None else self._poll_loop
+        self.thread = threading.Thread(target=target, name="repo-watcher", daemon=True)
+        self.thread.start()
+
+    def _add_watch(self, repo_root: str, kind: str, path: str) -> None:
+        """Add an inotify watch for a directory."""
+        if self.inotify is None:
+            return
+        try:
+            wd = self.inotify.add_watch(path)
+            self.watches[wd] = (repo_root, kind, path)
+        except OSError as e:
+            logger.debug(f"Could not watch {path}: {str(e)}")
+
+    def _watch_git_dir(self, watched: WatchedRepository) -> None:
+        """Watch HEAD, index, packed-refs and the refs hierarchy."""
+        if self.inotify is None:
+            watched.stat_signature = self._git_signature(watched)
+            return
+        self._add_watch(watched.repo_root, "git", watched.git_dir)
+        if watched.common_dir != watched.git_dir:
+            self._add_watch(watched.repo_root, "git", watched.common_dir)
+        for dirpath, _dirnames, _filenames in os.walk(os.path.join(watched.common_dir, "refs")):
+            self._add_watch(watched.repo_root, "refs", dirpath)
+
+    def _watch_worktree(self, watched: WatchedRepository, directory: str) -> None:
+        """Recursively watch working tree directories, skipping .git and configured directories."""
+        skip_dirs = set(config.get("discovery_skip_dirs", [])) | {".git"}
+        max_watches = config.get("watch_max_directories", 10000)
+        for dirpath, dirnames, _filenames in os.walk(directory):
+            dirnames[:] = [name for name in dirnames if name not in skip_dirs]
+            if len(self.watches) >= max_watches:
+                logger.warning(f"Watch limit of {max_watches} directories reached for {watched.repo_root}")
+                return
+            self._add_watch(watched.repo_root, "worktree", dirpath)
+
+    def _unwatch(self, repo_root: str) -> None:
+        """Remove every watch belonging to a repository."""
+        for wd, (watch_root, _kind, _path) in list(self.watches.items()):
+            if watch_root == repo_root:
+                del self.watches[wd]
+                if self.inotify is not None:
+                    self.inotify.remove_watch(wd)
+
+    def _handle_event(self, wd: int, mask: int, name: str) -> None:
+        """Translate one inotify event into a pending change."""
+        if mask & IN_IGNORED:
+            self.watches.pop(wd, None)
+            return
+        watch = self.watches.get(wd)
+        if watch is None:
+            return
+        repo_root, kind, directory = watch
+        watched = self.repos.get(repo_root)
+        if watched is None or name.endswith(".lock"):
+            return
+
+        if kind == "git":
+            if name == "HEAD" and directory == watched.git_dir:
+                watched.record("head")
+            elif name == "index" and directory == watched.git_dir:
+                watched.record("index")
+            elif name == "packed-refs":
+                watched.record("refs", "packed-refs")
+        elif kind == "refs":
+            full_path = os.path.join(directory, name)
+            watched.record("refs", os.path.relpath(full_path, watched.common_dir).replace(os.sep, "/"))
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                self._add_watch(repo_root, "refs", full_path)
+        elif kind == "worktree" and name != ".git":
+            full_path = os.path.join(directory, name) if name else directory
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                self._watch_worktree(watched, full_path)
+            watched.record("worktree", os.path.relpath(full_path, repo_root).replace(os.sep, "/"))
+
+    def _inotify_loop(self) -> None:
+        """Read inotify events and flush debounced notifications."""
+        assert self.inotify is not None
+        while True:
+            try:
+                readable, _, _ = select.select([self.inotify.fd], [], [], self.debounce)
+                with self.lock:
+                    if readable:
+                        for wd, mask, name in self.inotify.read_events():
+                            if mask & IN_Q_OVERFLOW:
+                                # Events were lost, so report everything as changed
+                                for watched in self.repos.values():
+                                    for kind in ("head", "refs", "index", "worktree"):
+                                        watched.record(kind)
+                                continue
+                            self._handle_event(wd, mask, name)
+                    self._flush()
+            except Exception as e:
+                logger.error(f"Error in repository watcher: {str(e)}")
+                time.sleep(self.debounce)
+
+    def _git_signature(self, watched: WatchedRepository) -> Dict[str, Any]:
+        """Stat the git metadata files of a repository."""
+        def stat_key(path: str) -> Optional[Tuple[float, int]]:
+            try:
+                st = os.stat(path)
+                return (st.st_mtime, st.st_size)
+            except OSError:
+                return None
+
+        refs = {}
+        refs_dir = os.path.join(watched.common_dir, "refs")
+        for dirpath, _dirnames, filenames in os.walk(refs_dir):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                refs[os.path.relpath(path, watched.common_dir).replace(os.sep, "/")] = stat_key(path)
+        refs["packed-refs"] = stat_key(os.path.join(watched.common_dir, "packed-refs"))
+        return {
+            "head": stat_key(os.path.join(watched.git_dir, "HEAD")),
+            "index": stat_key(os.path.join(watched.git_dir, "index")),
+            "refs": refs
+        }
+
+    def _poll_loop(self) -> None:
+        """Poll git metadata files where inotify is unavailable."""
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                with self.lock:
+                    for watched in self.repos.values():
+                        signature = self._git_signature(watched)
+                        previous = watched.stat_signature
+                        if signature["head"] != previous.get("head"):
+                            watched.record("head")
+                        if signature["index"] != previous.get("index"):
+                            watched.record("index")
+                        previous_refs = previous.get("refs", {})
+                        for ref in set(signature["refs"]) | set(previous_refs):
+                            if signature["refs"].get(ref) != previous_refs.get(ref):
+                                watched.record("refs", ref)
+                        watched.stat_signature = signature
+                    # Polling already spaces out changes, so flush without waiting
+                    self._flush(force=True)
+            except Exception as e:
+                logger.error(f"Error in repository poller: {str(e)}")
+
+    def _flush(self, force: bool = False) -> None:
+        """Send notifications for repositories whose changes have settled."""
+        now = time.monotonic()
+        for watched in self.repos.values():
+            if not watched.pending_kinds:
+                continue
+            settled = now - watched.last_change >= self.debounce
+            overdue = now - watched.first_change >= self.max_delay
+            if not (force or settled or overdue):
+                continue
+
+            changes = watched.take_changes()
+            for subscription_id, kinds in watched.subscriptions.items():
+                subscribed_changes = {kind: value for kind, value in changes.items() if kind in kinds}
+                if subscribed_changes:
+                    self._notify({
+                        "subscription_id": subscription_id,
+                        "repo_path": watched.repo_root,
+                        "changes": subscribed_changes
+                    })
+
+    def _notify(self, params: Dict[str, Any]) -> None:
+        """Send one notification to the client."""
+        if self.notifier is None:
+            return
+        try:
+            self.notifier(NOTIFICATION_METHOD, params)
+        except Exception as e:
+            logger.error(f"Could not send change notification: {str(e)}")
+
+# Global subscription manager
+subscriptions = SubscriptionManager()
@@ -0,0 +1,322 @@
+"""Multi-process mode for MCP Git Server.
+
+With `worker_processes` set, the server process becomes a supervisor. It
+reads requests and answers initialize, schema and shutdown requests itself,
+and hands function calls and resource reads to a pool of worker processes.
+Each repository is always handled by the same worker, chosen from its root
+path, so its caches stay warm in one process, and each worker warms up only
+the repositories it handles. Workers run calls on their own scheduler and
+encode the JSON responses themselves, so parsing and serialization use every
+core. The `max_concurrent_requests` and `max_queued_requests` limits are
+split evenly between the workers (at least one each), so together they stay
+within the configured totals; `max_concurrent_per_repo` applies as is, since
+a repository is only handled by one worker. Responses of at least `worker_shm_min_bytes`
+come back through shared memory instead of the pipe. A worker that exits is
+started again, and the calls it was running fail with an error.
+"""
+
+import json
+import zlib
+import logging
+import threading
+import multiprocessing
+from multiprocessing import shared_memory
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Dict, Final, List, Optional, Union
+
+from mcp_git_server.config import config
+from mcp_git_server.mcp import Server
+from mcp_git_server.spill import URI_SCHEME, spill_store
+from mcp_git_server.watcher import subscriptions
+
+logger = logging.getLogger(__name__)
+
+# Spawned workers do not inherit the supervisor's threads and locks
+START_METHOD: Final = "spawn"
+
+# Seconds a worker gets to finish its calls after being asked to stop
+STOP_TIMEOUT = 30
+
+# Functions routed by a `worker` parameter instead of a repository
+WORKER_PARAMETER_FUNCTIONS = ("admin_profile_start", "admin_profile_stop")
+
+def worker_id_prefix(index: int) -> str:
+    """Prefix of the IDs handed out by a worker, so later requests using them reach it."""
+    return f"w{index}-"
+
+def id_worker(value: Any, prefix: str = "") -> Optional[int]:
+    """Index of the worker that handed out an ID, or None if it has none."""
+    if not isinstance(value, str) or not value.startswith(f"{prefix}w"):
+        return None
+    index, sep, _token = value[len(prefix) + 1:].partition("-")
+    return int(index) if sep and index.isdigit() else None
+
+def shard_index(key: str, count: int) -> int:
+    """Index of the worker that handles a repository key."""
+    return zlib.crc32(key.encode("utf-8")) % count
+
+def spill_uri_prefix(index: int) -> str:
+    """Prefix of the spill resource URIs created by a worker."""
+    return f"{URI_SCHEME}{worker_id_prefix(index)}"
+
+def spill_uri_worker(uri: Any) -> Optional[int]:
+    """Index of the worker that created a spill resource URI."""
+    return id_worker(uri, URI_SCHEME)
+
+def shared_buffer(shm: shared_memory.SharedMemory) -> memoryview:
+    """Buffer of an open shared memory block."""
+    if shm.buf is None:
+        raise ValueError(f"Shared memory block {shm.name} is closed")
+    return shm.buf
+
+class WorkerServer(Server):
+    """Server running in a worker process; its messages go to the supervisor."""
+
+    def __init__(self, conn: Connection) -> None:
+        """Initialize the server for a supervisor connection."""
+        super().__init__()
+        self.conn = conn
+        self._send_lock = threading.Lock()
+        self.shm_min_bytes = config.get("worker_shm_min_bytes", 64 * 1024)
+
+    def _send_encoded(self, message: Dict[str, Any], data: bytes) -> None:
+        """Send an encoded message to the supervisor, through shared memory if it is large."""
+        is_response = "method" not in message
+        request_id = message.get("id") if is_response else None
+
+        if len(data) < self.shm_min_bytes:
+            with self._send_lock:
+                self.conn.send((is_response, request_id, "inline", data))
+            return
+
+        shm = shared_memory.SharedMemory(create=True, size=len(data))
+        try:
+            shared_buffer(shm)[:len(data)] = data
+        except BaseException:
+            shm.close()
+            shm.unlink()
+            raise
+        name = shm.name
+        shm.close()
+        # The supervisor unlinks the block once it has written it out
+        with self._send_lock:
+            self.conn.send((is_response, request_id, "shm", (name, len(data))))
+
+def worker_main(conn: Connection, index: int, count: int) -> None:
+    """Entry point of a worker process."""
+    from mcp_git_server.main import setup_server
+
+    server = WorkerServer(conn)
+    setup_server(server, index, count)
+    spill_store.uri_prefix = spill_uri_prefix(index)
+    subscriptions.id_prefix = worker_id_prefix(index)
+    logger.info(f"Worker {index} started")
+
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            break
+        if request is None:
+            break
+        if request.get("method") == "mcp.execute_function":
+            server._schedule_request(request)
+            continue
+        response = server.handle_request(request)
+        # Requests without an ID are notifications and get no response
+        if "id" in request:
+            server._write_message(response)
+
+    if server.scheduler is not None:
+        server.scheduler.drain()
+    logger.info(f"Worker {index} stopped")
+
+class WorkerProcess:
+    """A worker process and the requests sent to it that have not been answered."""
+
+    def __init__(self, index: int, process: Any, conn: Connection) -> None:
+        """Initialize the handle of a started worker."""
+        self.index = index
+        self.process = process
+        self.conn = conn
+        # Request ID -> number of unanswered requests with that ID
+        self.pending: Dict[Any, int] = {}
+
+class WorkerPool:
+    """Worker processes that function calls are sharded over by repository."""
+
+    def __init__(
+        self,
+        count: int,
+        repo_key: Callable[[str], Optional[str]],
+        writer: Callable[[Union[bytes, memoryview]], None]
+    ) -> None:
+        """Start the workers.
+
+        repo_key maps a repo_path argument to the key calls are sharded by;
+        writer writes one encoded message to the client.
+        """
+        self.repo_key = repo_key
+        self.writer = writer
+        self.count = count
+        self.context = multiprocessing.get_context(START_METHOD)
+        self._cond = threading.Condition()
+        self._stopping = False
+        self.workers: List[WorkerProcess] = [self._start_worker(index) for index in range(count)]
+        logger.info(f"Started {count} worker processes")
+
+    def _start_worker(self, index: int) -> WorkerProcess:
+        """Start a worker process and the thread that reads its messages."""
+        parent_conn, child_conn = self.context.Pipe()
+        process = self.context.Process(
+            target=worker_main, args=(child_conn, index, self.count), name=f"mcp-git-worker-{index}", daemon=True
+        )
+        process.start()
+        child_conn.close()
+        worker = WorkerProcess(index, process, parent_conn)
+        reader = threading.Thread(target=self._read_messages, args=(worker,), name=f"worker-{index}-reader", daemon=True)
+        reader.start()
+        return worker
+
+    def _valid_index(self, index: Any) -> int:
+        """A worker index from a request, or 0 if it names no worker."""
+        if isinstance(index, int) and not isinstance(index, bool) and 0 <= index < len(self.workers):
+            return index
+        return 0
+
+    def shard(self, request: Dict[str, Any]) -> int:
+        """Choose the worker for a request.
+
+        Calls are sharded by repository. Spill URIs and subscription IDs carry
+        the index of the worker that owns them; admin functions name their
+        worker with a `worker` parameter, which is removed from the request.
+        """
+        params = request.get("params") or {}
+        if request.get("method") == "resources/read":
+            return self._valid_index(spill_uri_worker(params.get("uri")))
+
+        function_params = params.get("parameters") or {}
+        if not isinstance(function_params, dict):
+            function_params = {}
+        name = params.get("name")
+        if name == "git_unsubscribe":
+            return self._valid_index(id_worker(function_params.get("subscription_id")))
+        if name in WORKER_PARAMETER_FUNCTIONS:
+            return self._valid_index(function_params.pop("worker", 0))
+
+        repo_path = function_params.get("repo_path")
+        key = ""
+        if isinstance(repo_path, str) and repo_path:
+            try:
+                key = self.repo_key(repo_path) or repo_path
+            except Exception:
+                key = repo_path
+        return shard_index(key, len(self.workers))
+
+    def submit(self, request: Dict[str, Any]) -> None:
+        """Send a request to its worker; the response is written when it arrives."""
+        index = self.shard(request)
+        has_id = "id" in request
+        request_id = request.get("id")
+        with self._cond:
+            worker = self.workers[index]
+            if has_id:
+                worker.pending[request_id] = worker.pending.get(request_id, 0) + 1
+            try:
+                worker.conn.send(request)
+                return
+            except (OSError, ValueError) as e:
+                logger.error(f"Could not send request to worker {index}: {str(e)}")
+                if has_id:
+                    self._forget(worker, request_id)
+        # The reader thread restarts the worker; this request is lost with it
+        if has_id:
+            self._write_worker_error(request_id)
+
+    def initialize(self) -> None:
+        """Forward initialize to every worker, each of which warms up the repositories it handles."""
+        with self._cond:
+            for worker in self.workers:
+                try:
+                    worker.conn.send({"jsonrpc": "2.0", "method": "initialize"})
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Could not forward initialize to worker {worker.index}: {str(e)}")
+
+    def _forget(self, worker: WorkerProcess, request_id: Any) -> None:
+        """Mark one request with the ID as answered; the caller holds the lock."""
+        count = worker.pending.get(request_id, 0)
+        if count > 1:
+            worker.pending[request_id] = count - 1
+        else:
+            worker.pending.pop(request_id, None)
+        self._cond.notify_all()
+
+    def _write_worker_error(self, request_id: Any) -> None:
+        """Answer a request whose worker exited before responding."""
+        self.writer(json.dumps({
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "error": {
+                "code": -32603,
+                "message": "Internal error: worker process exited while handling the request"
+            }
+        }).encode("utf-8"))
+
+    def _read_messages(self, worker: WorkerProcess) -> None:
+        """Write a worker's messages to the client until it exits, then restart it."""
+        while True:
+            try:
+                is_response, request_id, kind, payload = worker.conn.recv()
+            except (EOFError, OSError):
+                break
+
+            if kind == "shm":
+                name, size = payload
+                shm = shared_memory.SharedMemory(name=name)
+                try:
+                    with shared_buffer(shm)[:size] as data:
+                        self.writer(data)
+                finally:
+                    shm.close()
+                    shm.unlink()
+            else:
+                self.writer(payload)
+
+            if is_response:
+                with self._cond:
+                    self._forget(worker, request_id)
+
+        worker.process.join()
+        with self._cond:
+            lost = [request_id for request_id, count in worker.pending.items() for _ in range(count)]
+            worker.pending.clear()
+            self._cond.notify_all()
+            restart = not self._stopping
+            if restart:
+                logger.error(f"Worker {worker.index} exited with code {worker.process.exitcode}, restarting it")
+                self.workers[worker.index] = self._start_worker(worker.index)
+        for request_id in lost:
+            self._write_worker_error(request_id)
+
+    def drain(self) -> None:
+        """Wait until every request sent to a worker has been answered."""
+        with self._cond:
+            while any(worker.pending for worker in self.workers):
+                self._cond.wait()
+
+    def stop(self) -> None:
+        """Let the workers finish their calls, then stop them."""
+        with self._cond:
+            self._stopping = True
+            workers = list(self.workers)
+        for worker in workers:
+            try:
+                worker.conn.send(None)
+            except (OSError, ValueError):
+                pass
+        for worker in workers:
+            worker.process.join(STOP_TIMEOUT)
+            if worker.process.is_alive():
+                logger.warning(f"Worker {worker.index} did not stop, terminating it")
+                worker.process.terminate()
+                worker.process.join()
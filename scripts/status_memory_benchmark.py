@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+"""Measure peak memory of git_status on a repository with many changed files.
+
+Creates a repository with --files files (200,000 by default), commits them
+and modifies every one, or leaves them untracked with --untracked. It then
+runs git_status --repeat times with each read backend in a fresh process,
+keeping every result alive like the snapshot cache does, encodes the last
+response, and reports the peak RSS of each run.
+
+Example:
+    python scripts/status_memory_benchmark.py --files 200000 --backend cli --backend pygit2
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import subprocess
+from typing import Any, Dict, List, Optional
+
+FILES_PER_DIRECTORY = 1000
+
+def run_git(repo: str, *args: str) -> None:
+    """Run a git command in the benchmark repository."""
+    subprocess.run(
+        ["git", "-c", "user.name=Benchmark", "-c", "user.email=benchmark@example.com", *args],
+        cwd=repo, check=True, stdout=subprocess.DEVNULL
+    )
+
+def create_repository(repo: str, files: int, untracked: bool) -> None:
+    """Create a repository where every one of `files` files shows up in git status."""
+    run_git(repo, "init", "-q")
+    paths = []
+    for i in range(files):
+        directory = os.path.join(repo, "src", f"module_{i // FILES_PER_DIRECTORY:04d}")
+        if i % FILES_PER_DIRECTORY == 0:
+            os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"file_{i:07d}.txt")
+        with open(path, "w") as f:
+            f.write(f"line {i}\n")
+        paths.append(path)
+    if untracked:
+        return
+
+    run_git(repo, "add", "-A")
+    run_git(repo, "commit", "-q", "-m", "Add files")
+    for path in paths:
+        with open(path, "a") as f:
+            f.write("changed\n")
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def measure(repo: str, repeat: int) -> Dict[str, Any]:
+    """Run git_status in this process and report time and memory."""
+    from mcp_git_server.git_operations import GitOperations
+    from mcp_git_server.results import to_json
+
+    baseline = peak_rss_mb()
+    started = time.monotonic()
+    results = [GitOperations.git_status(repo) for _ in range(repeat)]
+    status_seconds = time.monotonic() - started
+    status_peak = peak_rss_mb()
+
+    started = time.monotonic()
+    encoded = json.dumps({"jsonrpc": "2.0", "id": 1, "result": results[-1]}, default=to_json)
+    encode_seconds = time.monotonic() - started
+    peak = peak_rss_mb()
+
+    status = to_json(results[-1]) if not isinstance(results[-1], dict) else results[-1]
+    files = sum(len(status[key]) for key in ("changed_files", "staged_files", "untracked_files"))
+    return {
+        "files": files,
+        "baseline_rss_mb": round(baseline, 1),
+        "status_peak_rss_mb": round(status_peak, 1),
+        "peak_rss_mb": round(peak, 1),
+        "status_seconds": round(status_seconds / repeat, 3),
+        "encode_seconds": round(encode_seconds, 3),
+        "response_bytes": len(encoded)
+    }
+
+def run_measurement(repo: str, backend: str, repeat: int) -> Dict[str, Any]:
+    """Measure one backend in a fresh process with its own configuration."""
+    config_dir = tempfile.mkdtemp(prefix="mcp-git-bench-config-")
+    try:
+        with open(os.path.join(config_dir, "config.json"), "w") as f:
+            json.dump({"read_backend": backend, "log_level": "WARNING"}, f)
+        env = dict(os.environ, MCP_GIT_CONFIG_DIR=config_dir)
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [root, env.get("PYTHONPATH")]))
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--measure", repo, "--repeat", str(repeat)],
+            env=env, check=True, capture_output=True, text=True
+        ).stdout
+        return json.loads(output.strip().splitlines()[-1])
+    finally:
+        shutil.rmtree(config_dir, ignore_errors=True)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Entry point of the benchmark."""
+    parser = argparse.ArgumentParser(description="Measure peak memory of git_status on a large repository")
+    parser.add_argument("--files", type=int, default=200000, help="Number of changed files")
+    parser.add_argument("--untracked", action="store_true", help="Leave the files untracked instead of modified")
+    parser.add_argument("--backend", action="append", help="Read backend to measure; may be repeated (default: cli)")
+    parser.add_argument("--repeat", type=int, default=3, help="git_status calls per run, all kept alive")
+    parser.add_argument("--repo", help="Use an existing repository instead of creating one")
+    parser.add_argument("--keep", action="store_true", help="Keep the created repository")
+    parser.add_argument("--measure", metavar="REPO", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.measure:
+        print(json.dumps(measure(args.measure, args.repeat)))
+        return
+
+    repo = args.repo
+    if repo is None:
+        repo = tempfile.mkdtemp(prefix="mcp-git-bench-repo-")
+        started = time.monotonic()
+        create_repository(repo, args.files, args.untracked)
+        print(f"Created {args.files} files in {repo} in {time.monotonic() - started:.1f}s")
+
+    try:
+        header = f"{'backend':<10}{'files':>9}{'peak MB':>10}{'status s':>10}{'encode s':>10}{'response MB':>13}"
+        print(header)
+        print("-" * len(header))
+        for backend in args.backend or ["cli"]:
+            result = run_measurement(repo, backend, args.repeat)
+            print(
+                f"{backend:<10}{result['files']:>9}{result['peak_rss_mb']:>10.1f}"
+                f"{result['status_seconds']:>10.2f}{result['encode_seconds']:>10.2f}"
+                f"{result['response_bytes'] / (1024 * 1024):>13.1f}"
+            )
+    finally:
+        if args.repo is None and not args.keep:
+            shutil.rmtree(repo, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
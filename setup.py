@@ -9,9 +9,14 @@ setup(
         "pydantic>=2.0.0",
         "jsonschema>=4.0.0"
     ],
+    extras_require={
+        "pygit2": ["pygit2>=1.9.0"],
+        "dulwich": ["dulwich>=0.21.0"]
+    },
     entry_points={
         "console_scripts": [
             "mcp-git-server=mcp_git_server.main:main",
+            "mcp-git-replay=mcp_git_server.replay:main",
         ],
     },
     author="Your Name",
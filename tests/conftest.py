@@ -0,0 +1,41 @@
+"""Shared fixtures for the MCP Git Server tests."""
+
+import os
+import subprocess
+import tempfile
+
+import pytest
+
+# Keep the tests away from the user's configuration; set before the package is imported
+os.environ["MCP_GIT_CONFIG_DIR"] = tempfile.mkdtemp(prefix="mcp-git-test-config-")
+
+from mcp_git_server.config import config  # noqa: E402
+
+def run_git(repo, *args):
+    """Run a git command in a test repository and return its output."""
+    return subprocess.run(
+        ["git", "-c", "user.name=Test", "-c", "user.email=test@example.com", *args],
+        cwd=repo, check=True, capture_output=True, text=True
+    ).stdout.strip()
+
+def write_file(repo, path, content):
+    """Write a file in a test repository, creating its directories."""
+    full_path = os.path.join(repo, path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    with open(full_path, "w") as f:
+        f.write(content)
+
+@pytest.fixture
+def repo(tmp_path):
+    """An empty repository with a main branch."""
+    path = str(tmp_path / "repo")
+    os.makedirs(path)
+    run_git(path, "init", "-q", "-b", "main")
+    return path
+
+@pytest.fixture
+def set_config(monkeypatch):
+    """Override configuration values for one test."""
+    def set_value(key, value):
+        monkeypatch.setitem(config.config, key, value)
+    return set_value
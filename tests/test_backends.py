@@ -0,0 +1,112 @@
+"""Parity tests: every read backend must answer like the git command line."""
+
+import os
+import logging
+
+import git
+import pytest
+
+from tests.conftest import run_git, write_file
+from mcp_git_server.backends import BACKENDS, CliBackend, available_backends
+from mcp_git_server.results import to_json
+
+LIBRARY_BACKENDS = [
+    pytest.param(name, marks=pytest.mark.skipif(name not in available_backends(), reason=f"{name} is not installed"))
+    for name in ("pygit2", "dulwich")
+]
+
+def open_backends(path, name):
+    """Open the command line backend and a library backend on a repository."""
+    repo = git.Repo(path)
+    return CliBackend(repo), BACKENDS[name](repo)
+
+@pytest.fixture
+def no_fallback(caplog):
+    """Fail a test if a library backend handed a call to the command line."""
+    caplog.set_level(logging.DEBUG, logger="mcp_git_server.backends")
+    yield
+    assert "falling back to git" not in caplog.text
+
+@pytest.fixture
+def history(repo):
+    """A repository with a few commits touching files in nested directories."""
+    for i in range(1, 4):
+        write_file(repo, f"src/d1/f{i}.py", "".join(f"line {n}\n" for n in range(50)))
+    write_file(repo, "README.md", "readme\n")
+    write_file(repo, "tool.sh", "#!/bin/sh\n")
+    run_git(repo, "add", "-A")
+    run_git(repo, "commit", "-q", "-m", "Initial commit")
+
+    write_file(repo, "src/d1/f2.py", "changed\n")
+    write_file(repo, "src/d2/new.py", "new\n")
+    os.remove(os.path.join(repo, "src/d1/f3.py"))
+    os.chmod(os.path.join(repo, "tool.sh"), 0o755)
+    run_git(repo, "add", "-A")
+    run_git(repo, "commit", "-q", "-m", "Second commit\n\nWith a body")
+    return repo
+
+@pytest.mark.parametrize("name", LIBRARY_BACKENDS)
+def test_status_matches_cli(history, name, no_fallback):
+    run_git(history, "mv", "src/d1/f1.py", "src/d1/moved.py")
+    write_file(history, "src/d2/new.py", "staged\n")
+    run_git(history, "add", "src/d2/new.py")
+    write_file(history, "src/d2/new.py", "staged and changed\n")
+    write_file(history, "src/d3/added.py", "added\n")
+    run_git(history, "add", "src/d3/added.py")
+    run_git(history, "rm", "-q", "README.md")
+    os.remove(os.path.join(history, "src/d1/f2.py"))
+    write_file(history, "untracked/deep/file.txt", "untracked\n")
+
+    cli, backend = open_backends(history, name)
+    assert to_json(backend.status()) == to_json(cli.status())
+
+@pytest.mark.parametrize("name", [pytest.param("cli")] + LIBRARY_BACKENDS)
+def test_staged_rename_reports_both_paths(history, name):
+    run_git(history, "mv", "src/d1/f1.py", "src/d1/moved.py")
+
+    status = BACKENDS[name](git.Repo(history)).status()
+    assert status.staged_files == ("src/d1/f1.py", "src/d1/moved.py")
+    assert status.changed_files == ()
+
+@pytest.mark.parametrize("name", LIBRARY_BACKENDS)
+def test_status_on_detached_head_matches_cli(history, name, no_fallback):
+    run_git(history, "checkout", "-q", "--detach", "HEAD~1")
+
+    cli, backend = open_backends(history, name)
+    assert to_json(backend.status()) == to_json(cli.status())
+
+@pytest.mark.parametrize("name", LIBRARY_BACKENDS)
+def test_log_matches_cli(history, name, no_fallback):
+    first = run_git(history, "rev-parse", "HEAD~1")
+
+    cli, backend = open_backends(history, name)
+    assert to_json(backend.log(max_count=10)) == to_json(cli.log(max_count=10))
+    assert to_json(backend.log(max_count=1)) == to_json(cli.log(max_count=1))
+    assert to_json(backend.log(exclude=[first])) == to_json(cli.log(exclude=[first]))
+
+@pytest.mark.parametrize("name", LIBRARY_BACKENDS)
+def test_diff_trees_matches_cli(history, name, no_fallback):
+    old_tree = run_git(history, "rev-parse", "HEAD~1^{tree}")
+    new_tree = run_git(history, "rev-parse", "HEAD^{tree}")
+
+    cli, backend = open_backends(history, name)
+    expected = cli.diff_trees(old_tree, new_tree)
+    assert {change["status"] for change in expected} == {"A", "D", "M"}
+    assert backend.diff_trees(old_tree, new_tree) == expected
+    assert backend.diff_trees(new_tree, old_tree) == cli.diff_trees(new_tree, old_tree)
+
+@pytest.mark.parametrize("name", LIBRARY_BACKENDS)
+def test_objects_match_cli(history, name):
+    cli, backend = open_backends(history, name)
+    for ref in ("HEAD", "HEAD~1", "main"):
+        assert backend.resolve_ref(ref) == cli.resolve_ref(ref)
+
+    blob_sha = run_git(history, "rev-parse", "HEAD:src/d1/f2.py")
+    assert backend.read_blob(blob_sha) == cli.read_blob(blob_sha)
+    assert b"".join(backend.show_stream("HEAD:src/d1/f2.py")) == b"".join(cli.show_stream("HEAD:src/d1/f2.py"))
+
+@pytest.mark.parametrize("name", LIBRARY_BACKENDS)
+def test_invalid_revision_raises_like_cli(history, name):
+    _cli, backend = open_backends(history, name)
+    with pytest.raises(ValueError, match="Invalid revision"):
+        backend.resolve_ref("no-such-branch")
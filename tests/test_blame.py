@@ -0,0 +1,36 @@
+"""Tests for git_blame hunks built from incremental blame output."""
+
+from tests.conftest import run_git, write_file
+from mcp_git_server.git_operations import GitOperations
+
+def commit(repo, content, message):
+    """Commit new contents of notes.txt."""
+    write_file(repo, "notes.txt", content)
+    run_git(repo, "add", "-A")
+    run_git(repo, "commit", "-q", "-m", message)
+    return run_git(repo, "rev-parse", "HEAD")
+
+def test_lines_are_grouped_into_hunks_in_file_order(repo):
+    first = commit(repo, "a\nb\nc\nd\n", "First")
+    second = commit(repo, "a\nB\nc\nd\ne\r\nlast", "Second")
+
+    result = GitOperations.git_blame(repo, "notes.txt")
+    assert list(result["commits"]) == [first, second]
+    assert result["commits"][second]["summary"] == "Second"
+    assert [(h["commit"], h["start_line"], h["original_start_line"], h["lines"]) for h in result["hunks"]] == [
+        (first, 1, 1, ["a"]),
+        (second, 2, 2, ["B"]),
+        (first, 3, 3, ["c", "d"]),
+        (second, 5, 5, ["e\r", "last"])
+    ]
+
+def test_line_range_limits_hunks(repo):
+    first = commit(repo, "a\nb\nc\n", "First")
+    second = commit(repo, "z\na\nb\nc\n", "Second")
+
+    result = GitOperations.git_blame(repo, "notes.txt", start_line=1, end_line=2)
+    assert list(result["commits"]) == [second, first]
+    assert [(h["start_line"], h["original_start_line"], h["lines"]) for h in result["hunks"]] == [
+        (1, 1, ["z"]),
+        (2, 1, ["a"])
+    ]
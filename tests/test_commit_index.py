@@ -0,0 +1,67 @@
+"""Tests for streaming and indexing commit history."""
+
+import git
+import pytest
+
+from tests.conftest import run_git, write_file
+from mcp_git_server import commit_index
+from mcp_git_server.git_operations import GitOperations
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 65536])
+def test_numstat_log_keeps_characters_split_across_chunks(repo, monkeypatch, chunk_size):
+    write_file(repo, "docs/übersicht.md", "größe\n")
+    run_git(repo, "add", "-A")
+    run_git(repo, "commit", "-q", "-m", "Überarbeitung der Größenangaben 📏\n\n日本語の説明")
+    monkeypatch.setattr(commit_index, "READ_CHUNK_SIZE", chunk_size)
+
+    commits = list(commit_index.iter_numstat_log(git.Repo(repo), ["HEAD"]))
+
+    assert len(commits) == 1
+    fields, numstat = commits[0]
+    assert fields[5].strip() == "Überarbeitung der Größenangaben 📏\n\n日本語の説明"
+    assert numstat == [(1, 0, "docs/übersicht.md")]
+
+def commit(repo, message, author="Test <test@example.com>"):
+    """Commit one new file with the given message and author."""
+    write_file(repo, f"{len(run_git(repo, 'ls-files').split())}.txt", message)
+    run_git(repo, "add", "-A")
+    run_git(repo, "commit", "-q", "-m", message, f"--author={author}")
+
+def messages(result):
+    """Subjects of the commits in a search result; commits made within one second tie on date."""
+    return sorted(found["message"] for found in result["commits"])
+
+def test_commits_that_become_unreachable_are_pruned(repo):
+    commit(repo, "Initial work")
+    run_git(repo, "checkout", "-q", "-b", "feature")
+    commit(repo, "Feature work")
+    assert messages(GitOperations.git_search_commits(repo, query="work")) == ["Feature work", "Initial work"]
+
+    run_git(repo, "checkout", "-q", "main")
+    run_git(repo, "branch", "-q", "-D", "feature")
+    assert messages(GitOperations.git_search_commits(repo, query="work")) == ["Initial work"]
+
+    run_git(repo, "commit", "-q", "--amend", "-m", "Rewritten work")
+    assert messages(GitOperations.git_search_commits(repo, query="work")) == ["Rewritten work"]
+
+def test_author_wildcards_are_matched_literally(repo):
+    commit(repo, "First", author="A_B <ab@example.com>")
+    commit(repo, "Second", author="AxB <axb@example.com>")
+    commit(repo, "Third", author="Half%Done <half@example.com>")
+
+    assert messages(GitOperations.git_search_commits(repo, author="A_B")) == ["First"]
+    assert messages(GitOperations.git_search_commits(repo, author="f%D")) == ["Third"]
+
+def test_search_falls_back_to_git_log_without_fts5(repo, monkeypatch):
+    monkeypatch.setattr(commit_index, "SCHEMA", commit_index.SCHEMA.replace("fts5", "missing_module"))
+    commit(repo, "Fix parser crash", author="A_B <ab@example.com>")
+    commit(repo, "Add \"quoted\" parser option")
+    commit(repo, "Unrelated")
+
+    assert commit_index.get_index(repo) is None
+    assert messages(GitOperations.git_search_commits(repo, query="parser")) == ["Add \"quoted\" parser option", "Fix parser crash"]
+    assert messages(GitOperations.git_search_commits(repo, query="parser crash")) == ["Fix parser crash"]
+    assert messages(GitOperations.git_search_commits(repo, author="A_B")) == ["Fix parser crash"]
+    page = GitOperations.git_search_commits(repo, query="parser", limit=1)
+    assert page["next_offset"] == 1
+    assert page["commits"][0]["stats"] == {"files": 1, "insertions": 1, "deletions": 0}
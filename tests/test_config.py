@@ -0,0 +1,68 @@
+"""Tests for enforcing the repository allowlist."""
+
+import json
+import os
+
+import pytest
+
+from mcp_git_server import config as config_module
+from mcp_git_server.config import config
+from mcp_git_server.git_operations import GitOperations
+
+@pytest.fixture
+def allowlist(tmp_path, set_config):
+    """An allowlist holding one directory, with a second directory outside it."""
+    allowed = tmp_path / "allowed"
+    other = tmp_path / "other"
+    allowed.mkdir()
+    other.mkdir()
+    allowed_repos = [str(allowed)]
+    set_config("allowed_repos", allowed_repos)
+    return allowed_repos, str(allowed), str(other)
+
+def test_in_place_edit_of_allowlist_applies(allowlist):
+    allowed_repos, allowed, other = allowlist
+    assert config.is_repo_allowed(allowed)
+    assert not config.is_repo_allowed(other)
+
+    allowed_repos.append(other)
+    assert config.is_repo_allowed(other)
+    allowed_repos.remove(allowed)
+    assert not config.is_repo_allowed(allowed)
+
+def test_edit_of_config_file_applies(allowlist, monkeypatch, tmp_path):
+    _allowed_repos, allowed, other = allowlist
+    monkeypatch.setattr(config, "config_path", str(tmp_path / "config.json"))
+    monkeypatch.setattr(config, "_config_mtime", None)
+    assert not config.is_repo_allowed(other)
+
+    with open(config.config_path, "w") as f:
+        json.dump({"allowed_repos": [other]}, f)
+
+    assert config.is_repo_allowed(other)
+    assert not config.is_repo_allowed(allowed)
+
+def test_retargeted_symlink_is_checked_again(allowlist):
+    _allowed_repos, allowed, other = allowlist
+    link = os.path.join(allowed, "link")
+    os.symlink(allowed, link)
+    assert config.is_repo_allowed(link)
+
+    os.remove(link)
+    os.symlink(other, link)
+    assert not config.is_repo_allowed(link)
+
+def test_validate_repo_path_resolves_the_path_once(repo, monkeypatch, set_config):
+    set_config("allowed_repos", [repo])
+    assert config.is_repo_allowed(repo)
+    calls = []
+    resolve_path = config_module.resolve_path
+
+    def counting_resolve_path(path):
+        calls.append(path)
+        return resolve_path(path)
+
+    monkeypatch.setattr("mcp_git_server.config.resolve_path", counting_resolve_path)
+    monkeypatch.setattr("mcp_git_server.git_operations.resolve_path", counting_resolve_path)
+    GitOperations.validate_repo_path(os.path.join(repo, "missing", ".."))
+    assert len(calls) == 1
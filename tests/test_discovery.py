@@ -0,0 +1,51 @@
+"""Tests for mapping paths to repositories through the discovery index."""
+
+import json
+import os
+import shutil
+
+import pytest
+
+from tests.conftest import run_git, write_file
+from mcp_git_server.discovery import RepositoryDiscovery
+
+@pytest.fixture
+def nested(repo):
+    """A repository with another repository initialized inside it."""
+    inner = os.path.join(repo, "inner")
+    os.makedirs(inner)
+    run_git(inner, "init", "-q", "-b", "main")
+    write_file(inner, "src/file.txt", "inner\n")
+    return repo, inner
+
+@pytest.fixture
+def discovery(tmp_path):
+    """A discovery index persisted in a temporary directory."""
+    return RepositoryDiscovery(str(tmp_path / "repo_index.json"))
+
+def test_nested_repository_wins_over_indexed_parent(nested, discovery):
+    outer, inner = nested
+
+    assert discovery.find_repo_root(outer) == outer
+    assert discovery.find_repo_root(inner) == inner
+    assert discovery.find_repo_root(os.path.join(inner, "src", "file.txt")) == inner
+    assert discovery.find_repo_root(os.path.join(outer, "inner-sibling")) == outer
+
+def test_replaced_git_directory_is_revalidated(nested, discovery):
+    outer, inner = nested
+    assert discovery.find_repo_root(inner) == inner
+
+    shutil.rmtree(os.path.join(inner, ".git"))
+    assert discovery.find_repo_root(inner) == outer
+    assert inner not in discovery.repos
+
+def test_lookups_are_persisted_once_flushed(nested, discovery):
+    outer, inner = nested
+    discovery.find_repo_root(outer)
+    discovery.find_repo_root(inner)
+    assert not os.path.exists(discovery.index_path)
+
+    discovery.flush()
+    with open(discovery.index_path) as f:
+        assert set(json.load(f)["repos"]) == {outer, inner}
+    assert set(RepositoryDiscovery(discovery.index_path).repos) == {outer, inner}
@@ -0,0 +1,52 @@
+"""Tests for incremental git_log results."""
+
+import pytest
+
+from tests.conftest import run_git, write_file
+from mcp_git_server.git_operations import GitOperations
+from mcp_git_server.results import to_json
+
+def commit(repo, name):
+    """Commit one new file."""
+    write_file(repo, f"{name}.txt", f"{name}\n")
+    run_git(repo, "add", "-A")
+    run_git(repo, "commit", "-q", "-m", name)
+
+def hashes(commits):
+    """Commit hashes of a log result."""
+    return [entry["hash"] for entry in to_json(commits)]
+
+@pytest.fixture
+def logged(repo):
+    """A repository with two commits and the token of a log taken at its HEAD."""
+    commit(repo, "first")
+    commit(repo, "second")
+    return repo, GitOperations.git_log(repo, since_token="")["snapshot_token"]
+
+def test_new_commits_are_added(logged):
+    repo, token = logged
+    commit(repo, "third")
+
+    result = GitOperations.git_log(repo, since_token=token)
+    assert hashes(result["added"]) == [run_git(repo, "rev-parse", "HEAD")]
+
+def test_merge_returns_full_log(logged):
+    repo, _token = logged
+    run_git(repo, "checkout", "-q", "-b", "side", "HEAD~1")
+    commit(repo, "side")
+    run_git(repo, "checkout", "-q", "main")
+    token = GitOperations.git_log(repo, since_token="")["snapshot_token"]
+    run_git(repo, "merge", "-q", "--no-ff", "-m", "merge", "side")
+
+    result = GitOperations.git_log(repo, since_token=token)
+    assert "added" not in result
+    assert hashes(result["commits"]) == hashes(GitOperations.git_log(repo))
+
+def test_garbage_collected_head_returns_full_log(logged):
+    repo, token = logged
+    run_git(repo, "commit", "-q", "--amend", "-m", "rewritten")
+    run_git(repo, "reflog", "expire", "--expire=now", "--all")
+    run_git(repo, "gc", "-q", "--prune=now")
+
+    result = GitOperations.git_log(repo, since_token=token)
+    assert hashes(result["commits"]) == hashes(GitOperations.git_log(repo))
@@ -0,0 +1,45 @@
+"""Tests for reading spilled outputs in ranges."""
+
+import os
+
+import pytest
+
+from mcp_git_server.spill import SpillStore
+
+TEXT = "diff: größe 日本 📏 end\n"
+
+@pytest.fixture
+def spilled(set_config):
+    """A store holding one spilled output, and its URI."""
+    set_config("max_diff_size", 1)
+    store = SpillStore()
+    result = store.collect([TEXT.encode("utf-8")])
+    return store, result["resource"]["uri"]
+
+@pytest.mark.parametrize("length", [1, 2, 3, 5])
+def test_short_reads_always_progress_and_reassemble(spilled, length):
+    store, uri = spilled
+    size = len(TEXT.encode("utf-8"))
+    offset = 0
+    parts = []
+    while offset < size:
+        result = store.read(uri, offset, length)
+        assert result["length"] > 0
+        parts.append(result["contents"][0]["text"])
+        offset += result["length"]
+    assert "".join(parts) == TEXT
+
+def test_read_at_lead_byte_returns_whole_character(spilled):
+    store, uri = spilled
+    offset = TEXT.encode("utf-8").index("📏".encode("utf-8"))
+
+    result = store.read(uri, offset, 1)
+    assert result["contents"][0]["text"] == "📏"
+    assert result["length"] == 4
+
+def test_read_of_concurrently_deleted_output_reports_expiry(spilled):
+    store, uri = spilled
+    os.unlink(store.entries[uri].path)
+
+    with pytest.raises(KeyError, match="not found or expired"):
+        store.read(uri, 0, 10)
@@ -0,0 +1,87 @@
+"""Tests for anonymized request traces."""
+
+import os
+import sys
+import gzip
+import json
+import hashlib
+import subprocess
+
+from tests.conftest import run_git, write_file
+from mcp_git_server.trace_format import WRITE_FUNCTIONS
+from mcp_git_server.tracing import TraceRecorder
+
+def call(name, parameters):
+    """An execute_function request."""
+    return {"jsonrpc": "2.0", "id": 1, "method": "mcp.execute_function", "params": {"name": name, "parameters": parameters}}
+
+def record(tmp_path, requests, name="trace"):
+    """Record requests to a new trace and return the traced parameters."""
+    trace_path = tmp_path / f"{name}.jsonl.gz"
+    recorder = TraceRecorder(str(trace_path))
+    for request in requests:
+        recorder.record(request)
+    recorder.close()
+    with gzip.open(trace_path, "rt") as f:
+        return [json.loads(line)["request"]["params"]["parameters"] for line in f.readlines()[1:]]
+
+def test_free_text_is_hashed(repo, tmp_path):
+    traced = record(tmp_path, [
+        call("git_grep", {"repo_path": repo, "pattern": "secret token"}),
+        call("git_search_commits", {"repo_path": repo, "query": "fix leak", "author": "Jane Doe"}),
+        call("git_commit", {"repo_path": repo, "message": "Confidential change"})
+    ])
+
+    assert traced[0]["repo_path"] == "$REPO0"
+    assert traced[0]["pattern"].startswith("redacted-")
+    assert traced[1]["query"].startswith("redacted-")
+    assert traced[1]["author"].startswith("redacted-")
+    assert traced[2]["message"].startswith("redacted-")
+    assert "secret" not in json.dumps(traced) and "leak" not in json.dumps(traced)
+
+def test_repository_names_are_kept_unless_configured(repo, tmp_path, set_config):
+    write_file(repo, "src/app.py", "app\n")
+    run_git(repo, "add", "-A")
+    run_git(repo, "commit", "-q", "-m", "Add app")
+    requests = [
+        call("git_blame", {"repo_path": repo, "file_path": "src/app.py", "revision": "main"}),
+        call("git_add", {"repo_path": repo, "files": ["src/app.py"]}),
+        call("git_compare_refs", {"repo_path": repo, "pairs": [{"base": "main", "head": "feature/x"}]})
+    ]
+
+    kept = record(tmp_path, requests)
+    assert kept[0]["file_path"] == "src/app.py" and kept[0]["revision"] == "main"
+    assert kept[1]["files"] == ["src/app.py"]
+    assert kept[2]["pairs"] == [{"base": "main", "head": "feature/x"}]
+
+    set_config("trace_redact_paths", True)
+    redacted = record(tmp_path, requests, "redacted")
+    assert redacted[0]["repo_path"] == "$REPO0"
+    assert redacted[0]["file_path"].startswith("redacted-") and redacted[0]["revision"].startswith("redacted-")
+    assert redacted[1]["files"][0].startswith("redacted-")
+    assert redacted[2]["pairs"][0]["head"].startswith("redacted-")
+
+def test_hashes_are_keyed_per_recording(repo, tmp_path):
+    requests = [call("git_grep", {"repo_path": repo, "pattern": "secret"}) for _ in range(2)]
+
+    first = record(tmp_path, requests)
+    second = record(tmp_path, requests, "second")
+    assert first[0]["pattern"] == first[1]["pattern"]
+    assert first[0]["pattern"] != second[0]["pattern"]
+    assert hashlib.sha1(b"secret").hexdigest()[:12] not in first[0]["pattern"]
+
+def test_write_functions_match_registrations():
+    from mcp_git_server.main import register_functions
+    from mcp_git_server.mcp import Server
+
+    server = Server()
+    register_functions(server)
+    assert {f.name for f in server.function_registry.functions if f.writes} == WRITE_FUNCTIONS
+
+def test_replay_does_not_load_the_server(tmp_path):
+    env = dict(os.environ, MCP_GIT_CONFIG_DIR=str(tmp_path / "config"))
+    code = "import sys, mcp_git_server.replay; print(sorted(m for m in sys.modules if m.startswith('mcp_git_server')))"
+    loaded = subprocess.run([sys.executable, "-c", code], env=env, check=True, capture_output=True, text=True).stdout
+
+    assert "mcp_git_server.main" not in loaded and "mcp_git_server.config" not in loaded
+    assert not (tmp_path / "config").exists()
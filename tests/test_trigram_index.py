@@ -0,0 +1,98 @@
+"""Tests that trigram-indexed git_grep finds exactly what a plain search finds."""
+
+import pytest
+
+from tests.conftest import run_git, write_file
+from mcp_git_server.git_operations import GitOperations
+from mcp_git_server import trigram_index
+from mcp_git_server.trigram_index import _literal_runs
+
+FILES = {
+    "greeting.txt": "say\thello world\nHello again\n",
+    "src/main.py": "def function_name():\n    return colour\n",
+    "src/util.py": "def funcname():\n    return color\n",
+    "docs/notes.md": "a.bcd and abcd\nhelllo there\nwordy words\n",
+    "docs/braces.txt": "xxyzw\nfoo(bar)\n",
+    "other/empty.txt": "nothing to see\n"
+}
+
+PATTERNS = [
+    "hello",
+    "[[:space:]]hello",
+    "[[:alpha:]]+ again",
+    "[=h=]ello",
+    "hel+o",
+    "colou?r",
+    "function|funcname",
+    "func(tion_)?name",
+    "\\bwords?\\b",
+    "\\<word",
+    "a\\.bcd",
+    "x{2}yzw",
+    "foo\\(bar\\)",
+    "^def [a-z_]+\\(\\)",
+    "[^a]bcd"
+]
+
+@pytest.fixture
+def search_repo(repo):
+    """A repository with a few text files committed."""
+    for path, content in FILES.items():
+        write_file(repo, path, content)
+    run_git(repo, "add", "-A")
+    run_git(repo, "commit", "-q", "-m", "Add files")
+    return repo
+
+@pytest.mark.parametrize("pattern", PATTERNS)
+@pytest.mark.parametrize("ignore_case", [False, True])
+def test_indexed_grep_matches_plain_grep(search_repo, pattern, ignore_case):
+    plain = GitOperations.git_grep(search_repo, pattern, revision="HEAD", ignore_case=ignore_case)
+    indexed = GitOperations.git_grep(search_repo, pattern, ignore_case=ignore_case, use_index=True)
+
+    assert plain["matches"], f"{pattern} should match something"
+    assert indexed["matches"] == plain["matches"]
+
+@pytest.mark.parametrize("pattern", ["[[:space:]]hello", "[=a=]bc", "[.a.]bc", "\\bword", "\\<word\\>", "\\wabc", "foo|bar"])
+def test_patterns_that_cannot_be_narrowed(pattern):
+    assert _literal_runs(pattern, False) is None
+
+@pytest.mark.parametrize("pattern, runs", [
+    ("hello world", ["hello world"]),
+    ("colou?r", ["colo"]),
+    ("hel+o there", ["hel", "o there"]),
+    ("a\\.bcd", ["a.bcd"]),
+    ("func(tion)?name", ["func", "name"]),
+    ("abc[^]x]defg", ["abc", "defg"])
+])
+def test_literal_runs(pattern, runs):
+    assert _literal_runs(pattern, False) == runs
+
+@pytest.mark.parametrize("paths", [
+    ["src"],
+    ["*.py"],
+    [":!docs"],
+    [":(exclude)docs/*"],
+    [":(glob)src/*.py"],
+    ["src", ":^src/util.py"],
+    [":(icase)SRC"]
+])
+def test_indexed_grep_applies_pathspecs_like_git(search_repo, paths):
+    plain = GitOperations.git_grep(search_repo, "return|hello", revision="HEAD", paths=paths)
+    indexed = GitOperations.git_grep(search_repo, "ret.rn", paths=paths, use_index=True)
+
+    expected = [match for match in plain["matches"] if "return" in match["text"]]
+    assert expected, f"{paths} should select a file with a match"
+    assert indexed["index"]["candidates"] is not None
+    assert indexed["matches"] == expected
+
+def test_search_of_other_revision_leaves_head_index(search_repo):
+    first_tree = run_git(search_repo, "rev-parse", "HEAD^{tree}")
+    write_file(search_repo, "src/main.py", "def function_name():\n    return color\n")
+    run_git(search_repo, "commit", "-q", "-am", "Spell color the same way")
+    head_tree = run_git(search_repo, "rev-parse", "HEAD^{tree}")
+    GitOperations.git_grep(search_repo, "colour", use_index=True)
+
+    older = GitOperations.git_grep(search_repo, "colour", revision="HEAD~1", use_index=True)
+    assert older["index"] == {"tree": first_tree, "candidates": None}
+    assert [match["path"] for match in older["matches"]] == ["src/main.py"]
+    assert trigram_index.get_index(search_repo).tree_sha == head_tree